@@ -0,0 +1,94 @@
+"""Benchmark de estrés de las colisiones bala-enemigo y del daño por contacto, sin ventana.
+
+Compara la comprobación de antes (groupcollide de todas las balas contra todos los enemigos y
+spritecollideany del jugador contra todo el grupo) con la rejilla dinámica Game.enemy_index,
+incluyendo en el "después" lo que cuesta re-ubicar a los enemigos en la rejilla cada tick.
+Los enemigos se mueven un poco en cada tick, como en una partida.
+
+Uso:
+    python benchmark_colisiones.py [--ticks 300] [--enemigos 100 1000 5000] [--balas 200]
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import random
+import sys
+import time
+
+import juego_simple as juego
+
+
+def populate(game, enemies, bullets, rng):
+    """LEVEL_DATA[0] plus `enemies` patrol enemies and `bullets` bullets scattered over the level."""
+    game.load_level_from_dict(juego.LEVEL_DATA[0])
+    for _ in range(enemies):
+        game._add_level_sprite(juego.PatrolEnemy(rng.randrange(game.level_width), rng.randrange(game.level_height), game.PATROL_ENEMY_COLOR))
+    for _ in range(bullets):
+        bullet = juego.Bullet(rng.randrange(game.level_width), rng.randrange(game.level_height), 1, 0, "normal", game_instance=game)
+        game.all_sprites.add(bullet)
+        game.bullets.add(bullet)
+
+
+def jitter(game, rng):
+    """Move every enemy a couple of pixels, as their update would."""
+    for enemy in game.enemies:
+        enemy.rect.move_ip(rng.randint(-2, 2), rng.randint(-2, 2))
+
+
+def groupcollide_checks(game):
+    """Previous hit detection: every bullet against every enemy, and the player against the whole group."""
+    hits = juego.pygame.sprite.groupcollide(game.bullets, game.enemies, False, False)
+    contact = juego.pygame.sprite.spritecollideany(game.player, game.enemies)
+    return hits, contact
+
+
+def grid_checks(game):
+    for enemy in game.enemies:
+        game.enemy_index.update(enemy)
+    hits = game._bullet_enemy_hits()
+    contact = game.enemy_index.query_rect(game.player.rect)
+    return hits, contact
+
+
+def time_ticks(game, check, ticks, seed):
+    """Milliseconds per call of check(game), moving the enemies (untimed) before each one."""
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(ticks):
+        jitter(game, rng)
+        start = time.perf_counter()
+        check(game)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {"media": sum(samples) / len(samples), "p95": samples[int(len(samples) * 0.95) - 1]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide la detección de impactos bala-enemigo con groupcollide y con la rejilla dinámica.")
+    parser.add_argument("--ticks", type=int, default=300, help="Ticks medidos por caso")
+    parser.add_argument("--enemigos", type=int, nargs="+", default=[100, 1000, 5000], help="Cantidades de enemigos a probar")
+    parser.add_argument("--balas", type=int, default=200, help="Balas en vuelo durante la medida")
+    args = parser.parse_args(argv)
+
+    game = juego.Game(headless=True)
+    game.game_state = juego.GAME_STATE_PLAYING
+
+    print(f"{args.ticks} ticks, {args.balas} balas")
+    for enemies in args.enemigos:
+        # Same level, same enemy walk for both cases
+        populate(game, enemies, args.balas, random.Random(enemies))
+        old_hits, _ = groupcollide_checks(game)
+        new_hits, _ = grid_checks(game)
+        assert {b: set(e) for b, e in old_hits.items()} == {b: set(e) for b, e in new_hits.items()}, "la rejilla no encuentra los mismos impactos"
+        before = time_ticks(game, groupcollide_checks, args.ticks, seed=1)
+        populate(game, enemies, args.balas, random.Random(enemies))
+        after = time_ticks(game, grid_checks, args.ticks, seed=1)
+        print(f"  {len(game.enemies):>6} enemigos: groupcollide media {before['media']:8.3f} ms p95 {before['p95']:8.3f} ms | "
+              f"rejilla media {after['media']:8.3f} ms p95 {after['p95']:8.3f} ms | {before['media'] / after['media']:.1f}x")
+    juego.pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
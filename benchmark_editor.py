@@ -0,0 +1,94 @@
+"""Benchmark del tiempo por fotograma del editor, sin ventana.
+
+Compara el dibujo de la cuadrícula línea a línea (como se hacía antes, una llamada a
+pygame.draw.line por columna y fila en cada fotograma) con la capa pre-renderizada que se
+desplaza con un único blit, tanto aislado como dentro de draw_editor_screen completo.
+La cámara se desplaza en cada fotograma para que el coste de panear también cuente.
+
+Uso:
+    python benchmark_editor.py [--fotogramas 600] [--elementos 0] [--zoom 1.0]
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import random
+import sys
+import time
+
+import juego_simple as juego
+
+
+def draw_grid_lines(game):
+    """The previous draw_grid_editor: one draw.line per visible column and row, every frame.
+
+    The canvas background is filled here too, as the old full-screen fill did before the layer replaced it.
+    """
+    game.screen.fill(game.EDITOR_BACKGROUND_COLOR, (game.editor_panel.rect.right, 0, juego.WIDTH - game.editor_panel.rect.right, juego.HEIGHT))
+    spacing = game.GRID_SIZE * game.editor_zoom
+    first_x = game.editor_camera_offset_x + juego.math.ceil((game.editor_panel.rect.right + 1 - game.editor_camera_offset_x) / spacing) * spacing
+    first_y = game.editor_camera_offset_y + juego.math.ceil(-game.editor_camera_offset_y / spacing) * spacing
+    for i in range(int((juego.WIDTH - first_x) // spacing) + 1):
+        line_x = round(first_x + i * spacing)
+        juego.pygame.draw.line(game.screen, game.GRID_COLOR, (line_x, 0), (line_x, juego.HEIGHT), 1)
+    for i in range(int((juego.HEIGHT - first_y) // spacing) + 1):
+        line_y = round(first_y + i * spacing)
+        juego.pygame.draw.line(game.screen, game.GRID_COLOR, (game.editor_panel.rect.right, line_y), (juego.WIDTH, line_y), 1)
+
+
+def time_frames(game, draw, frames):
+    """Milliseconds per call of draw(), panning the camera a few pixels before each one."""
+    samples = []
+    for frame in range(frames):
+        game.editor_camera_offset_x = -(frame * 7 % 1000)
+        game.editor_camera_offset_y = -(frame * 3 % 600)
+        start = time.perf_counter()
+        draw()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {"media": sum(samples) / len(samples), "p95": samples[int(len(samples) * 0.95) - 1]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el tiempo por fotograma del editor con la cuadrícula antigua y la nueva.")
+    parser.add_argument("--fotogramas", type=int, default=600, help="Fotogramas medidos por caso")
+    parser.add_argument("--elementos", type=int, default=0, help="Plataformas aleatorias añadidas al primer nivel por defecto")
+    parser.add_argument("--zoom", type=float, default=1.0, choices=juego.EDITOR_ZOOM_LEVELS, help="Zoom del editor durante la medida")
+    args = parser.parse_args(argv)
+
+    game = juego.Game(headless=True)
+    game.load_level_from_dict(juego.LEVEL_DATA[0])
+    game.game_state = juego.GAME_STATE_EDITOR
+    game.editor_zoom = args.zoom
+    rng = random.Random(0)
+    for _ in range(args.elementos):
+        game._add_level_sprite(juego.Platform(rng.randrange(0, game.level_width, game.GRID_SIZE), rng.randrange(0, game.level_height, game.GRID_SIZE),
+                                              game.GRID_SIZE * 2, 20, game.PLATFORM_COLOR))
+
+    layered_grid = game.draw_grid_editor
+    game.draw_grid_editor() # Build the layer outside the measurement; it is only rebuilt on resize/GRID_SIZE/zoom
+    cases = [
+        ("cuadrícula, línea a línea (antes)", lambda: draw_grid_lines(game)),
+        ("cuadrícula, capa pre-renderizada (después)", layered_grid),
+    ]
+    results = {name: time_frames(game, draw, args.fotogramas) for name, draw in cases}
+
+    # Whole editor frame with each grid implementation
+    game.draw_grid_editor = lambda: draw_grid_lines(game)
+    results["fotograma completo (antes)"] = time_frames(game, game.draw_editor_screen, args.fotogramas)
+    game.draw_grid_editor = layered_grid
+    results["fotograma completo (después)"] = time_frames(game, game.draw_editor_screen, args.fotogramas)
+
+    print(f"{args.fotogramas} fotogramas, {len(game.all_sprites) - 1} elementos, zoom {args.zoom}, ventana {juego.WIDTH}x{juego.HEIGHT}")
+    for name, result in results.items():
+        print(f"  {name:<45} media {result['media']:7.3f} ms   p95 {result['p95']:7.3f} ms")
+    for what in ("cuadrícula", "fotograma completo"):
+        before = results[next(name for name in results if name.startswith(what) and "antes" in name)]["media"]
+        after = results[next(name for name in results if name.startswith(what) and "después" in name)]["media"]
+        print(f"  {what}: {before / after:.1f}x más rápido")
+    juego.pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Benchmark de escalado del motor con niveles sintéticos, sin ventana.
+
+Genera niveles con el esquema de LEVEL_DATA repitiendo LEVEL_DATA[0] en una rejilla de copias:
+cada categoría (plataformas y pinchos, enemigos, coleccionables, puertas con sus llaves) se
+repite tantas veces como indique su multiplicador, y se mantienen en vuelo las balas pedidas.
+Cada escenario simula N ticks con el mismo Game.step que la partida normal y una entrada
+guionizada (andar, saltar, disparar), dibujando cada fotograma, y mide ticks por segundo,
+tiempo por fotograma p50/p99 y pico de memoria (RSS). Cada escenario corre en un proceso
+nuevo, para que el pico de memoria sea sólo suyo.
+
+Uso:
+    python benchmark_niveles.py [--escalas 1 10 100] [--ticks 600] [--balas 20] [--salida benchmark_niveles.json]
+    python benchmark_niveles.py --escalas 10 --enemigos 100 --balas 500   # multiplicadores por categoría
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource # Not available on Windows: peak RSS is then not reported
+except ImportError:
+    resource = None
+
+import juego_simple as juego
+
+BASE_LEVEL = juego.LEVEL_DATA[0]
+CATEGORIES = ("plataformas", "enemigos", "coleccionables", "puertas")
+
+
+def generate_level(copies):
+    """A LEVEL_DATA-schema level with `copies[category]` copies of each category of LEVEL_DATA[0].
+
+    Copies are laid out on a grid of tiles the size of the base level; copy k of every category goes
+    to tile k, so tile 0 is the original level and enemies still stand on their own platforms.
+    Keys and doors get a per-copy suffix in their IDs so every door keeps its own key.
+    """
+    tiles = max(1, max(copies.get(category, 0) for category in CATEGORIES))
+    columns = math.ceil(math.sqrt(tiles))
+    tile_width, tile_height = BASE_LEVEL["level_width"], BASE_LEVEL["level_height"]
+
+    def offset(k):
+        return (k % columns) * tile_width, (k // columns) * tile_height
+
+    def moved(pos, k):
+        dx, dy = offset(k)
+        return (pos[0] + dx, pos[1] + dy) + tuple(pos[2:])
+
+    level = {
+        "level_width": columns * tile_width,
+        "level_height": math.ceil(tiles / columns) * tile_height,
+        "player_start": BASE_LEVEL["player_start"],
+        "platforms": [], "enemies": [], "collectibles": [], "obstacles": [], "keys": [], "doors": [],
+        "exit": BASE_LEVEL["exit"],
+    }
+    for k in range(copies.get("plataformas", 0)):
+        level["platforms"] += [moved(p, k) for p in BASE_LEVEL["platforms"]]
+        level["obstacles"] += [dict(o, pos=moved(o["pos"], k)) for o in BASE_LEVEL["obstacles"]]
+    for k in range(copies.get("enemigos", 0)):
+        level["enemies"] += [dict(e, pos=moved(e["pos"], k)) for e in BASE_LEVEL["enemies"]]
+    for k in range(copies.get("coleccionables", 0)):
+        level["collectibles"] += [dict(c, pos=moved(c["pos"], k)) for c in BASE_LEVEL["collectibles"]]
+    for k in range(copies.get("puertas", 0)):
+        level["keys"] += [dict(key, id=f"{key['id']}_{k}", pos=moved(key["pos"], k)) for key in BASE_LEVEL["keys"]]
+        for door in BASE_LEVEL["doors"]:
+            door = dict(door, id=f"{door['id']}_{k}", pos=moved(door["pos"], k))
+            if door.get("required_key_id"):
+                door["required_key_id"] = f"{door['required_key_id']}_{k}"
+            level["doors"].append(door)
+    return level
+
+
+class ScriptedInput:
+    """Game.input for the benchmark: walks right and left, jumps and shoots on a fixed schedule."""
+    def __init__(self):
+        self.pressed = juego.pygame.key.ScancodeWrapper((False,) * juego.SCANCODE_COUNT)
+        self.mouse_pos = (juego.WIDTH * 3 // 4, juego.HEIGHT // 3)
+
+    def next_tick(self, tick):
+        """Set the held keys for `tick` and return its events."""
+        pressed = [False] * juego.SCANCODE_COUNT
+        pressed[juego.pygame.KSCAN_D if (tick // 120) % 2 == 0 else juego.pygame.KSCAN_A] = True
+        self.pressed = juego.pygame.key.ScancodeWrapper(pressed)
+        self.mouse_pos = (juego.WIDTH * 3 // 4 if (tick // 120) % 2 == 0 else juego.WIDTH // 4, juego.HEIGHT // 3)
+        events = []
+        if tick % 45 == 0:
+            events.append(juego.pygame.event.Event(juego.pygame.KEYDOWN, key=juego.pygame.K_SPACE, unicode=" ", mod=0, scancode=0))
+        if tick % 20 == 0:
+            events.append(juego.pygame.event.Event(juego.pygame.MOUSEBUTTONDOWN, button=1, pos=self.mouse_pos))
+        elif tick % 20 == 1:
+            events.append(juego.pygame.event.Event(juego.pygame.MOUSEBUTTONUP, button=1, pos=self.mouse_pos))
+        return events
+
+    def get_pressed(self):
+        return self.pressed
+
+    def get_mouse_pos(self):
+        return self.mouse_pos
+
+
+def top_up_bullets(game, count, rng):
+    """Spawn bullets at random points of the level until `count` are in flight."""
+    for _ in range(count - len(game.bullets)):
+        bullet = juego.Bullet(rng.randrange(game.level_width), rng.randrange(game.level_height),
+                              rng.uniform(-1, 1), rng.uniform(-1, 1), "normal", game_instance=game)
+        game.all_sprites.add(bullet)
+        game.bullets.add(bullet)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KiB on Linux
+
+
+def percentile(sorted_samples, fraction):
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+
+def frame_stats(samples):
+    """Throughput and mean/p50/p99 of per-tick milliseconds, plus this process' peak RSS so far."""
+    total_ms = sum(samples)
+    samples = sorted(samples)
+    rss = peak_rss_mb()
+    return {
+        "ticks": len(samples),
+        "ticks_por_segundo": round(len(samples) / (total_ms / 1000), 1),
+        "media_ms": round(total_ms / len(samples), 4),
+        "p50_ms": round(percentile(samples, 0.50), 4),
+        "p99_ms": round(percentile(samples, 0.99), 4),
+        "rss_pico_mb": None if rss is None else round(rss, 1),
+    }
+
+
+def run_scenario(level, bullets, ticks, draw=True, seed=0):
+    """Simulate `ticks` ticks of `level` with `bullets` in flight, headless through Game.step; returns the measurements.
+
+    Only step() and draw() are timed. Bullet top-ups and restarts after dying or finishing the
+    level happen between measurements.
+    """
+    game = juego.Game(headless=True, game_clock=juego.VirtualClock())
+    game.input = ScriptedInput()
+    rng = random.Random(seed)
+
+    start = time.perf_counter()
+    game.load_level_from_dict(level)
+    load_ms = (time.perf_counter() - start) * 1000
+    game.game_state = juego.GAME_STATE_PLAYING
+    counts = {"plataformas": len(game.platforms), "enemigos": len(game.enemies), "coleccionables": len(game.collectibles),
+              "puertas": len(game.doors), "balas": bullets, "sprites": len(game.all_sprites)}
+
+    samples = []
+    restarts = 0
+    for tick in range(ticks):
+        game.game_clock.advance(1000 / game.FPS)
+        events = game.input.next_tick(tick)
+        top_up_bullets(game, bullets, rng)
+        start = time.perf_counter()
+        game.step(events)
+        if draw:
+            game.draw()
+        samples.append((time.perf_counter() - start) * 1000)
+        if game.game_state != juego.GAME_STATE_PLAYING: # Died or reached the exit: same level again
+            restarts += 1
+            game.load_level_from_dict(level)
+            game.game_state = juego.GAME_STATE_PLAYING
+
+    result = frame_stats(samples)
+    result.update({"carga_ms": round(load_ms, 3), "reinicios": restarts, "elementos": counts})
+    juego.pygame.quit()
+    return result
+
+
+def run_isolated(function, *args):
+    """Run function(*args) in a fresh process, so peak RSS and caches start from zero."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(function, *args).result()
+
+
+def environment():
+    """Where the numbers come from: commit, versions and machine."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "pygame": juego.pygame.version.ver, "maquina": platform.platform()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide cómo escala el motor con niveles sintéticos de 1x a 100x LEVEL_DATA[0].")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[1, 10, 100], help="Copias de LEVEL_DATA[0] en cada escenario")
+    for category in CATEGORIES:
+        parser.add_argument(f"--{category}", type=int, default=None, help=f"Copias de {category} (por defecto, la escala)")
+    parser.add_argument("--balas", type=int, default=20, help="Balas en vuelo por cada copia del nivel")
+    parser.add_argument("--ticks", type=int, default=600, help="Ticks simulados por escenario")
+    parser.add_argument("--sin-dibujo", action="store_true", help="Mide sólo la simulación, sin Game.draw")
+    parser.add_argument("--salida", default="benchmark_niveles.json", help="Archivo JSON con los resultados")
+    args = parser.parse_args(argv)
+
+    results = {"entorno": environment(), "ticks": args.ticks, "dibujo": not args.sin_dibujo, "escenarios": {}}
+    for scale in args.escalas:
+        copies = {category: scale if getattr(args, category) is None else getattr(args, category) for category in CATEGORIES}
+        name = f"x{scale}"
+        result = run_isolated(run_scenario, generate_level(copies), args.balas * scale, args.ticks, not args.sin_dibujo)
+        result["copias"] = copies
+        results["escenarios"][name] = result
+        rss = "n/d" if result["rss_pico_mb"] is None else f"{result['rss_pico_mb']:.0f} MB"
+        print(f"  {name:>6}: {result['elementos']['sprites']:>7} sprites, {result['ticks_por_segundo']:>8.1f} ticks/s, "
+              f"p50 {result['p50_ms']:8.3f} ms, p99 {result['p99_ms']:8.3f} ms, carga {result['carga_ms']:8.1f} ms, RSS pico {rss}")
+
+    with open(args.salida, 'w') as f:
+        json.dump(results, f, indent=4)
+    print(f"Resultados guardados en '{args.salida}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Control de regresiones de rendimiento contra una línea base guardada, sin ventana.
+
+Ejecuta unos escenarios con nombre (sólo movimiento, lluvia de balas, enjambre de enemigos,
+editor con 10.000 elementos y carga de nivel) varias veces, cada repetición en un proceso
+nuevo, y compara cada métrica con la de la línea base. Una métrica sólo se marca como
+regresión si la mediana empeora más que el umbral y, además, la mejor repetición actual es
+peor que la peor de la línea base: así el ruido entre ejecuciones no da falsos avisos.
+Sale con código 1 si hay alguna regresión.
+
+Uso:
+    python comparar_benchmarks.py --guardar base.json [--repeticiones 5]   # crear la línea base
+    python comparar_benchmarks.py --base base.json [--umbral 10]           # medir ahora y comparar
+    python comparar_benchmarks.py --base base.json --actual otra.json      # comparar dos archivos
+
+Con --actual también se comparan dos salidas de benchmark_niveles.py entre sí (escenarios x1,
+x10...), pero no una de ellas con las medidas de esta herramienta: los escenarios son otros.
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+import juego_simple as juego
+import benchmark_niveles as niveles
+
+# Metric: True if higher is better
+METRICS = {
+    "ticks_por_segundo": True,
+    "media_ms": False,
+    "p50_ms": False,
+    "p99_ms": False,
+    "carga_ms": False,
+    "rss_pico_mb": False,
+}
+
+
+def run_editor_scenario(elements, frames, seed=0):
+    """Editor frames with `elements` random platforms: hover picking through Game.step plus draw, panning as it goes."""
+    game = juego.Game(headless=True, game_clock=juego.VirtualClock())
+    game.input = niveles.ScriptedInput()
+    rng = random.Random(seed)
+    game.load_level_from_dict(juego.LEVEL_DATA[0])
+    game.game_state = juego.GAME_STATE_EDITOR
+    for _ in range(elements):
+        game._add_level_sprite(juego.Platform(rng.randrange(0, game.level_width * 4, game.GRID_SIZE), rng.randrange(0, game.level_height * 4, game.GRID_SIZE),
+                                              game.GRID_SIZE * 2, 20, game.PLATFORM_COLOR))
+    samples = []
+    for frame in range(frames):
+        game.game_clock.advance(1000 / game.FPS)
+        game.editor_camera_offset_x = -(frame * 7 % 2000)
+        game.editor_camera_offset_y = -(frame * 3 % 1200)
+        game.input.mouse_pos = (300 + frame * 13 % (juego.WIDTH - 300), frame * 11 % juego.HEIGHT)
+        events = [juego.pygame.event.Event(juego.pygame.MOUSEMOTION, pos=game.input.mouse_pos, rel=(0, 0), buttons=(0, 0, 0))]
+        start = time.perf_counter()
+        game.step(events)
+        game.draw()
+        samples.append((time.perf_counter() - start) * 1000)
+    result = niveles.frame_stats(samples)
+    result["elementos"] = {"sprites": len(game.all_sprites)}
+    juego.pygame.quit()
+    return result
+
+
+def run_load_scenario(level, loads):
+    """Milliseconds per load_level_from_dict of `level`, `loads` times in a row."""
+    game = juego.Game(headless=True, game_clock=juego.VirtualClock())
+    samples = []
+    for _ in range(loads):
+        start = time.perf_counter()
+        game.load_level_from_dict(level)
+        samples.append((time.perf_counter() - start) * 1000)
+    result = niveles.frame_stats(samples)
+    del result["ticks_por_segundo"] # Loads, not ticks
+    result["carga_ms"] = result.pop("media_ms")
+    result["elementos"] = {"sprites": len(game.all_sprites)}
+    juego.pygame.quit()
+    return result
+
+
+# {name: ticks -> (function, args)}; every repetition runs in its own process
+SCENARIOS = {
+    "solo_movimiento": lambda ticks: (niveles.run_scenario, (niveles.generate_level({"plataformas": 10}), 0, ticks)),
+    "lluvia_de_balas": lambda ticks: (niveles.run_scenario, (niveles.generate_level({category: 1 for category in niveles.CATEGORIES}), 2000, ticks)),
+    "enjambre_de_enemigos": lambda ticks: (niveles.run_scenario, (niveles.generate_level({"plataformas": 10, "enemigos": 50}), 0, ticks)),
+    "editor_10k": lambda ticks: (run_editor_scenario, (10000, ticks)),
+    "carga_de_nivel": lambda ticks: (run_load_scenario, (niveles.generate_level({category: 100 for category in niveles.CATEGORIES}), 10)),
+}
+
+
+def measure(names, ticks, repetitions):
+    results = {"entorno": niveles.environment(), "ticks": ticks, "repeticiones": repetitions, "escenarios": {}}
+    for name in names:
+        function, args = SCENARIOS[name](ticks)
+        runs = []
+        for repetition in range(repetitions):
+            runs.append(niveles.run_isolated(function, *args))
+            print(f"  {name}: repetición {repetition + 1}/{repetitions} hecha")
+        results["escenarios"][name] = {"resultados": runs}
+    return results
+
+
+def metric_samples(scenario, metric):
+    # benchmark_niveles.py writes one result per scenario; this tool writes a list of repetitions
+    runs = scenario["resultados"] if "resultados" in scenario else [scenario]
+    return [run[metric] for run in runs if run.get(metric) is not None]
+
+
+def compare(baseline, current, threshold):
+    """Rows of (scenario, metric, baseline median, current median, change %, regression) for metrics in both."""
+    rows = []
+    for name, current_scenario in current["escenarios"].items():
+        if name not in baseline["escenarios"]:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before = metric_samples(baseline["escenarios"][name], metric)
+            after = metric_samples(current_scenario, metric)
+            if not before or not after:
+                continue
+            before_median, after_median = statistics.median(before), statistics.median(after)
+            change = (after_median - before_median) / before_median * 100 if before_median else 0.0
+            if higher_is_better:
+                worse_by = -change
+                consistently_worse = max(after) < min(before)
+            else:
+                worse_by = change
+                consistently_worse = min(after) > max(before)
+            rows.append((name, metric, before_median, after_median, change, worse_by > threshold and consistently_worse))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara el rendimiento actual con una línea base y avisa de las regresiones.")
+    parser.add_argument("--base", help="JSON de la línea base (de esta herramienta, o de benchmark_niveles.py si --actual también lo es)")
+    parser.add_argument("--actual", help="Compara con este JSON en lugar de medir ahora")
+    parser.add_argument("--guardar", help="Guarda aquí las medidas de esta ejecución")
+    parser.add_argument("--escenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS), help="Escenarios a medir")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Ejecuciones de cada escenario, cada una en un proceso nuevo")
+    parser.add_argument("--ticks", type=int, default=300, help="Ticks (o fotogramas del editor) por ejecución")
+    parser.add_argument("--umbral", type=float, default=10.0, help="Empeoramiento máximo tolerado, en %%")
+    args = parser.parse_args(argv)
+
+    if not args.base and not args.guardar:
+        parser.error("indica --base para comparar, --guardar para crear una línea base, o ambos")
+
+    if args.actual:
+        with open(args.actual, 'r') as f:
+            current = json.load(f)
+    else:
+        current = measure(args.escenarios, args.ticks, args.repeticiones)
+    if args.guardar:
+        with open(args.guardar, 'w') as f:
+            json.dump(current, f, indent=4)
+        print(f"Medidas guardadas en '{args.guardar}'.")
+    if not args.base:
+        return 0
+
+    with open(args.base, 'r') as f:
+        baseline = json.load(f)
+    rows = compare(baseline, current, args.umbral)
+    if not rows:
+        print(f"No hay escenarios en común con la línea base: {', '.join(baseline['escenarios']) or 'ninguno'} "
+              f"contra {', '.join(current['escenarios']) or 'ninguno'}.")
+        return 1
+    print(f"Línea base {baseline.get('entorno', {}).get('commit')} contra {current.get('entorno', {}).get('commit')}, umbral {args.umbral:g}%")
+    for name, metric, before, after, change, regression in rows:
+        print(f"  {'REGRESIÓN' if regression else 'ok':<9} {name:<22} {metric:<18} {before:12.3f} -> {after:12.3f}  ({change:+6.1f}%)")
+    regressions = sum(row[5] for row in rows)
+    print(f"{regressions} regresiones." if regressions else "Sin regresiones.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
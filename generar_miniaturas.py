@@ -0,0 +1,80 @@
+"""Renderizador de miniaturas de niveles, por lotes y sin ventana.
+
+Dibuja una vista general reducida de cada nivel de la carpeta 'levels' en Surfaces en memoria,
+repartiendo los niveles en un pool de procesos, y la guarda en la caché
+THUMBNAIL_CACHE_DIR con el hash del contenido del archivo como nombre. El menú de carga del
+editor sólo tiene que buscar la imagen y dibujarla.
+
+Uso:
+    python generar_miniaturas.py [--carpeta levels] [--procesos N] [--forzar] [--limpiar]
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+
+import juego_simple as juego
+
+
+def render_thumbnail(level_path, thumbnail_path, size=juego.THUMBNAIL_SIZE):
+    # Same drawing the game uses when it saves a level (juego.render_level_overview)
+    try:
+        with open(level_path, 'r') as f:
+            level_data = json.load(f)
+        juego.write_level_thumbnail(level_data, thumbnail_path, size)
+    except (OSError, json.JSONDecodeError, KeyError, IndexError, TypeError, ValueError, pygame.error) as e:
+        return level_path, None, f"{e!r}"
+    return level_path, thumbnail_path, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera las miniaturas del menú de carga de niveles.")
+    parser.add_argument("--carpeta", default="levels", help="Carpeta con los niveles .json")
+    parser.add_argument("--procesos", type=int, default=None, help="Número de procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument("--forzar", action="store_true", help="Vuelve a generar también las miniaturas que ya están en caché")
+    parser.add_argument("--limpiar", action="store_true", help="Borra las miniaturas de la caché que ya no corresponden a ningún nivel")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.carpeta):
+        print(f"No existe la carpeta '{args.carpeta}'.")
+        return 1
+    cache_dir = os.path.join(args.carpeta, os.path.basename(juego.THUMBNAIL_CACHE_DIR))
+    os.makedirs(cache_dir, exist_ok=True)
+
+    jobs = {}
+    wanted = set()
+    for filename in sorted(f for f in os.listdir(args.carpeta) if f.endswith('.json')):
+        level_path = os.path.join(args.carpeta, filename)
+        thumbnail_path = os.path.join(cache_dir, os.path.basename(juego.level_thumbnail_path(level_path)))
+        wanted.add(thumbnail_path)
+        if args.forzar or not os.path.exists(thumbnail_path):
+            jobs[level_path] = thumbnail_path
+        else:
+            print(f"'{filename}': miniatura en caché.")
+
+    failures = 0
+    if jobs:
+        with ProcessPoolExecutor(max_workers=args.procesos) as pool:
+            for level_path, thumbnail_path, error in pool.map(render_thumbnail, jobs.keys(), jobs.values()):
+                if error:
+                    failures += 1
+                    print(f"'{os.path.basename(level_path)}': no se pudo generar la miniatura: {error}")
+                else:
+                    print(f"'{os.path.basename(level_path)}': miniatura generada en {thumbnail_path}")
+
+    if args.limpiar:
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            if name.endswith('.png') and path not in wanted:
+                os.remove(path)
+                print(f"Miniatura obsoleta eliminada: {path}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,52 @@
+import time
+STARTUP_ORIGIN = time.perf_counter() # Start-up timings (--tiempos-arranque) count from here, before pygame is imported
 import pygame
 import sys
 import math
 import random
 import json
 import os # Importar para manejar directorios y archivos
+import hashlib
+import threading
+import contextlib
+import queue
+import functools
+import struct
+import collections
+import gc
+import cProfile
+import pstats
+import io
+import tracemalloc
 
 # --- Constantes del Juego ---
 # Modificado para permitir redimensionamiento
 WIDTH, HEIGHT = 1200, 900
-SCREEN = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE | pygame.SCALED)
-pygame.display.set_caption("Juego Plataformero Detallado con IA y Niveles")
+SCREEN = None # Lo crea open_display() al construir el Game: importar el módulo no abre ninguna ventana
+WINDOW_TITLE = "Juego Plataformero Detallado con IA y Niveles"
+
+def open_display(headless=False):
+    # Window surface, created on first use. Headless runs use SDL's dummy driver: no window, but
+    # drawing, events and key state keep working, so the same code paths run in tools and benchmarks
+    global SCREEN
+    if SCREEN is None:
+        if headless:
+            # SDL reads the driver when the display starts; restore it after, so it does not leak
+            # into the rest of the process (child processes, a later real window)
+            previous_driver = os.environ.get("SDL_VIDEODRIVER")
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            try:
+                pygame.display.init()
+                SCREEN = pygame.display.set_mode((WIDTH, HEIGHT))
+            finally:
+                if previous_driver is None:
+                    del os.environ["SDL_VIDEODRIVER"]
+                else:
+                    os.environ["SDL_VIDEODRIVER"] = previous_driver
+        else:
+            SCREEN = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE | pygame.SCALED)
+            pygame.display.set_caption(WINDOW_TITLE)
+    return SCREEN
 
 # --- Constantes de Físicas ---
 GRAVITY = 0.5
@@ -44,7 +81,26 @@ PURPLE_ARC_MAX_HEIGHT = 200 # Altura máxima del arco del proyectil violeta
 PURPLE_ARC_SPEED_FACTOR = 0.05 # Factor para la velocidad horizontal del proyectil violeta
 PURPLE_HOOK_RANGE_CELLS = 6 # Rango del gancho en número de celdas
 PURPLE_HOOK_PULL_SPEED = 25 # Velocidad de arrastre del gancho
-PURPLE_HOOK_DETECTION_SIZE = 30 # Tamaño del cuadrado de detección para el gancho (aumentado)
+PURPLE_HOOK_DETECTION_SIZE = 30 # Lado de la caja que recorre la línea del gancho: alcanza la mitad de esto a cada lado y más allá del final
+PURPLE_SHRAPNEL_COUNT = 8 # Fragmentos de metralla por explosión
+PURPLE_SHRAPNEL_SPEED = 15
+PURPLE_SHRAPNEL_BOUNCES = 2 # Rebotes de cada fragmento antes de desaparecer
+PURPLE_EXPLOSION_RADIUS = 120 # Radio del daño de área de la explosión
+PURPLE_EXPLOSION_DAMAGE = 3
+# Velocidad inicial de cada fragmento, calculada una sola vez
+PURPLE_SHRAPNEL_VELOCITIES = [(math.cos(2 * math.pi * i / PURPLE_SHRAPNEL_COUNT) * PURPLE_SHRAPNEL_SPEED,
+                               math.sin(2 * math.pi * i / PURPLE_SHRAPNEL_COUNT) * PURPLE_SHRAPNEL_SPEED)
+                              for i in range(PURPLE_SHRAPNEL_COUNT)]
+
+# --- Constantes de Daño y Puntuación ---
+# Con 100 de vida: cinco pinchos o diez contactos con enemigos; los pinchos de muerte
+# instantánea y los bloques mortales quitan toda la vida. Tras cada golpe el jugador es
+# invulnerable un momento (Player.take_damage), así que quedarse encima no la vacía de golpe.
+SPIKE_DAMAGE = 20
+ENEMY_CONTACT_DAMAGE = 10
+HEALTH_PICKUP_AMOUNT = 25 # Un cuarto de la vida máxima
+SCORE_PICKUP_POINTS = 100
+ENEMY_KILL_POINTS = 50
 
 # --- Estados del Juego ---
 GAME_STATE_MENU = 0
@@ -57,29 +113,674 @@ GAME_STATE_EDITING_PROPERTIES = 6 # Nuevo estado para editar propiedades de elem
 GAME_STATE_LOAD_LEVEL_MENU = 7 # Nuevo estado para el menú de carga de niveles
 GAME_STATE_PLAYING_FROM_EDITOR = 8 # Nuevo estado para jugar un nivel desde el editor
 
+# --- Modo en reposo (menús y editor) ---
+IDLE_GAME_STATES = (GAME_STATE_MENU, GAME_STATE_EDITOR, GAME_STATE_SAVING_LEVEL_INPUT, GAME_STATE_EDITING_PROPERTIES, GAME_STATE_LOAD_LEVEL_MENU)
+IDLE_WAIT_TIMEOUT = 100 # ms que se bloquea esperando eventos antes de revisar la recarga en caliente y el cursor
+CARET_BLINK_INTERVAL = 500 # ms que el cursor de texto pasa visible y oculto
+
+# --- Recarga en caliente de niveles ---
+LEVEL_WATCH_INTERVAL = 0.5 # Segundos entre sondeos de la carpeta 'levels'
+
+# --- Miniaturas de niveles (generadas sin ventana por generar_miniaturas.py) ---
+THUMBNAIL_CACHE_DIR = os.path.join("levels", ".miniaturas")
+THUMBNAIL_SIZE = (88, 50)
+THUMBNAIL_SUPERSAMPLE = 2 # Drawn at twice the size and smoothscaled down, so thin platforms stay visible
+LOAD_LEVEL_ITEM_HEIGHT = 60 # Alto de cada fila del menú de carga, con miniatura
+
+def level_thumbnail_path(level_path):
+    # Cache key is the file content, so an edited level simply has no thumbnail until it is re-rendered
+    with open(level_path, 'rb') as f:
+        content_hash = hashlib.sha1(f.read()).hexdigest()
+    return os.path.join(THUMBNAIL_CACHE_DIR, f"{content_hash}.png")
+
+def render_level_overview(level_data, size):
+    # Simplified rectangles for every element in the Game palette, scaled to fit `size` keeping the aspect ratio
+    level = normalize_level_data(level_data)
+    rects = [pygame.Rect(p[0], p[1], p[2], p[3]) for p in level["platforms"]]
+    rects += [pygame.Rect(d["pos"]) for d in level["doors"]]
+    if level["exit"]:
+        rects.append(pygame.Rect(level["exit"]))
+    bounds = pygame.Rect(0, 0, level["level_width"], level["level_height"]).unionall(rects) if rects else \
+        pygame.Rect(0, 0, level["level_width"], level["level_height"])
+
+    width, height = size[0] * THUMBNAIL_SUPERSAMPLE, size[1] * THUMBNAIL_SUPERSAMPLE
+    scale = min(width / bounds.width, height / bounds.height)
+    offset_x = (width - bounds.width * scale) / 2 - bounds.x * scale
+    offset_y = (height - bounds.height * scale) / 2 - bounds.y * scale
+
+    def to_surface(x, y, w=0, h=0):
+        # At least one pixel, so small elements do not vanish
+        return pygame.Rect(offset_x + x * scale, offset_y + y * scale, max(1, w * scale), max(1, h * scale))
+
+    def marker(pos, color, radius=3):
+        pygame.draw.circle(surface, color, (offset_x + pos[0] * scale, offset_y + pos[1] * scale), radius * THUMBNAIL_SUPERSAMPLE // 2)
+
+    surface = new_surface((width, height))
+    surface.fill(Game.BACKGROUND_COLOR)
+    for p in level["platforms"]:
+        rect = to_surface(*p[:4])
+        pygame.draw.rect(surface, Game.DEATH_COLOR if p[5] else Game.PLATFORM_COLOR, rect)
+        if p[6]:
+            pygame.draw.rect(surface, Game.PURPLE_HOOK_COLOR, rect, 1)
+    for d in level["doors"]:
+        pygame.draw.rect(surface, Game.DEATH_COLOR if d["dies_on_touch"] else d["color"], to_surface(*d["pos"]))
+    for o in level["obstacles"]:
+        pygame.draw.rect(surface, Game.DEATH_COLOR if o["instant_kill"] else Game.SPIKE_COLOR, to_surface(o["pos"][0], o["pos"][1], 30, 20))
+    for c in level["collectibles"]:
+        marker(c["pos"], Game.COLLECTIBLE_COLOR, 2)
+    for k in level["keys"]:
+        marker(k["pos"], k["color"], 3)
+    for e in level["enemies"]:
+        marker(e["pos"], Game.CHASER_ENEMY_COLOR if e["type"] == "chaser" else Game.PATROL_ENEMY_COLOR, 3)
+    if level["exit"]:
+        pygame.draw.rect(surface, Game.EXIT_COLOR, to_surface(*level["exit"]))
+    marker(level["player_start"], Game.PLAYER_COLOR, 4)
+
+    return pygame.transform.smoothscale(surface, size)
+
+def write_level_thumbnail(level_data, thumbnail_path, size=THUMBNAIL_SIZE):
+    os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+    thumbnail = render_level_overview(level_data, size)
+    # Write to a temporary name first so the game never sees a half-written PNG
+    temporary_path = f"{thumbnail_path}.{os.getpid()}.tmp.png"
+    pygame.image.save(thumbnail, temporary_path)
+    os.replace(temporary_path, thumbnail_path)
+
+
+# --- Reloj del juego ---
+class VirtualClock:
+    # Game milliseconds that only move when advance() is called: Game.run feeds it the wall time of each
+    # frame, headless drivers a fixed step per tick, so live play and simulation share the same timing code
+    def __init__(self, start_ms=0):
+        self.ms = start_ms
+
+    def get_ticks(self):
+        return int(self.ms)
+
+    def advance(self, ms):
+        self.ms += ms
+
+# --- Entrada del jugador y repeticiones ---
+# Repetición: cabecera y, por tick, el reloj del juego, el ratón, las teclas pulsadas y los eventos
+REPLAY_MAGIC = b"JREP"
+REPLAY_VERSION = 2
+REPLAY_HEADER = struct.Struct("<4sHIHH8s") # magic, version, random seed, window width, height, levels digest
+REPLAY_TICK = struct.Struct("<IhhHH") # game clock ms, mouse x, y, pressed scancode count, event count
+REPLAY_EVENT = struct.Struct("<BiIHhh") # event kind, key/button, unicode, mod, x/w, y/h
+REPLAY_EVENT_TYPES = (pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP,
+                      pygame.MOUSEMOTION, pygame.MOUSEWHEEL, pygame.VIDEORESIZE) # Only what the game reacts to
+REPLAY_EVENT_KINDS = {event_type: kind for kind, event_type in enumerate(REPLAY_EVENT_TYPES)}
+SCANCODE_COUNT = 512 # Length of pygame.key.get_pressed()
+
+def levels_digest(levels):
+    # Short hash of the loaded levels' data: a replay only plays back the same on the same levels
+    encoded = json.dumps([entry["data"] for entry in levels], sort_keys=True).encode()
+    return hashlib.sha256(encoded).digest()[:8] # The "8s" of REPLAY_HEADER
+
+class LiveInput:
+    # Keyboard and mouse state straight from pygame; the default Game.input
+    def get_pressed(self):
+        return pygame.key.get_pressed()
+
+    def get_mouse_pos(self):
+        return pygame.mouse.get_pos()
+
+
+class ReplayRecorder:
+    # Appends the per-tick input of Game.run (clock, mouse, held scancodes, handled events) to a binary replay file
+    def __init__(self, path, seed, size, levels_hash):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, seed, size[0], size[1], levels_hash))
+        self.ticks = 0
+
+    def record_tick(self, ms, pressed, mouse_pos, events):
+        scancodes = [scancode for scancode, down in enumerate(pressed) if down]
+        recorded = [event for event in events if event.type in REPLAY_EVENT_KINDS]
+        self.file.write(REPLAY_TICK.pack(ms, mouse_pos[0], mouse_pos[1], len(scancodes), len(recorded)))
+        if scancodes:
+            self.file.write(struct.pack(f"<{len(scancodes)}H", *scancodes))
+        for event in recorded:
+            self.file.write(self._pack_event(event))
+        self.ticks += 1
+
+    @staticmethod
+    def _pack_event(event):
+        kind = REPLAY_EVENT_KINDS[event.type]
+        if event.type == pygame.KEYDOWN:
+            return REPLAY_EVENT.pack(kind, event.key, ord(event.unicode) if len(event.unicode) == 1 else 0, event.mod, 0, 0)
+        if event.type == pygame.KEYUP:
+            return REPLAY_EVENT.pack(kind, event.key, 0, event.mod, 0, 0)
+        if event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            return REPLAY_EVENT.pack(kind, event.button, 0, 0, event.pos[0], event.pos[1])
+        if event.type == pygame.MOUSEMOTION:
+            return REPLAY_EVENT.pack(kind, 0, 0, 0, event.pos[0], event.pos[1])
+        if event.type == pygame.MOUSEWHEEL:
+            return REPLAY_EVENT.pack(kind, 0, 0, 0, event.x, event.y)
+        if event.type == pygame.VIDEORESIZE:
+            return REPLAY_EVENT.pack(kind, 0, 0, 0, event.w, event.h)
+        return REPLAY_EVENT.pack(kind, 0, 0, 0, 0, 0)
+
+    def close(self):
+        self.file.close()
+
+
+class ReplayInput:
+    # Game.input fed from a replay file, one recorded tick at a time
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        if len(self.data) < REPLAY_HEADER.size:
+            raise ValueError(f"'{path}' no es un archivo de repetición.")
+        magic, version, self.seed, width, height, self.levels_hash = REPLAY_HEADER.unpack_from(self.data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"'{path}' no es un archivo de repetición (versión {REPLAY_VERSION}).")
+        self.size = (width, height)
+        self.offset = REPLAY_HEADER.size
+        self.pressed = pygame.key.ScancodeWrapper((False,) * SCANCODE_COUNT)
+        self.mouse_pos = (0, 0)
+
+    def next_tick(self):
+        # Loads the next tick's key and mouse state; (game clock ms, events), or None at the end
+        if self.offset + REPLAY_TICK.size > len(self.data):
+            return None
+        ms, mouse_x, mouse_y, pressed_count, event_count = REPLAY_TICK.unpack_from(self.data, self.offset)
+        self.offset += REPLAY_TICK.size
+        pressed = [False] * SCANCODE_COUNT
+        for scancode in struct.unpack_from(f"<{pressed_count}H", self.data, self.offset):
+            pressed[scancode] = True
+        self.offset += 2 * pressed_count
+        self.pressed = pygame.key.ScancodeWrapper(pressed)
+        self.mouse_pos = (mouse_x, mouse_y)
+        events = []
+        for _ in range(event_count):
+            events.append(self._unpack_event(*REPLAY_EVENT.unpack_from(self.data, self.offset)))
+            self.offset += REPLAY_EVENT.size
+        return ms, events
+
+    @staticmethod
+    def _unpack_event(kind, key, unicode, mod, x, y):
+        event_type = REPLAY_EVENT_TYPES[kind]
+        if event_type == pygame.KEYDOWN:
+            return pygame.event.Event(event_type, key=key, unicode=chr(unicode) if unicode else "", mod=mod, scancode=0)
+        if event_type == pygame.KEYUP:
+            return pygame.event.Event(event_type, key=key, unicode="", mod=mod, scancode=0)
+        if event_type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            return pygame.event.Event(event_type, button=key, pos=(x, y))
+        if event_type == pygame.MOUSEMOTION:
+            return pygame.event.Event(event_type, pos=(x, y), rel=(0, 0), buttons=(0, 0, 0))
+        if event_type == pygame.MOUSEWHEEL:
+            return pygame.event.Event(event_type, x=x, y=y, flipped=False)
+        if event_type == pygame.VIDEORESIZE:
+            return pygame.event.Event(event_type, w=x, h=y, size=(x, y))
+        return pygame.event.Event(event_type)
+
+    def get_pressed(self):
+        return self.pressed
+
+    def get_mouse_pos(self):
+        return self.mouse_pos
+
+# --- Diagnóstico de rendimiento ---
+FRAME_PHASES = ("handle_events", "update", "draw", "hud", "overlay", "flip") # In the order Game.run goes through them
+PERF_HISTORY_FRAMES = 120 # Fotogramas en la gráfica del overlay (F3)
+PERF_GRAPH_SIZE = (240, 60)
+PERF_GRAPH_MAX_MS = 2 * 1000 / 60 # Alto de la gráfica: dos fotogramas a 60 FPS
+PERF_OVERLAY_BACKGROUND = (0, 0, 0, 170)
+PROFILE_FRAMES = 300 # Fotogramas que captura el perfilador con F4
+PROFILE_DIR = "perfiles" # Carpeta de las capturas .prof y sus resúmenes
+PROFILE_TOP_FUNCTIONS = 30 # Funciones en el resumen de texto
+MEMORY_TRACE_DEPTH = 1 # Marcos de pila por reserva en modo --memoria; cada marco más hace el juego bastante más lento
+MEMORY_TOP_LINES = 10 # Líneas de código con más memoria nueva en cada informe
+
+class FramePhases:
+    # Milliseconds per frame phase, marked by Game.run, step() and draw(); a mark is one attribute check while off
+    def __init__(self, history=PERF_HISTORY_FRAMES):
+        self.enabled = False
+        self.users = set()
+        self.current = {}
+        self.history = collections.deque(maxlen=history) # (total ms, {phase: ms}) of finished frames
+        self._last = 0.0
+
+    def acquire(self, user):
+        self.users.add(user)
+        if not self.enabled: # Turned on mid-frame: measure from here
+            self.current = {}
+            self._last = time.perf_counter()
+        self.enabled = True
+
+    def release(self, user):
+        self.users.discard(user)
+        self.enabled = bool(self.users)
+
+    def begin(self):
+        if self.enabled:
+            self.current = {}
+            self._last = time.perf_counter()
+
+    def mark(self, phase):
+        # Time since the previous mark goes to `phase`; marking a phase twice adds up
+        if self.enabled:
+            now = time.perf_counter()
+            self.current[phase] = self.current.get(phase, 0.0) + (now - self._last) * 1000
+            self._last = now
+
+    def end(self):
+        # Closes the frame: (total ms, {phase: ms}), or None when nothing was measured
+        if self.enabled and self.current:
+            frame = (sum(self.current.values()), self.current)
+            self.history.append(frame)
+            return frame
+        return None
+
+
+class SurfaceAllocations:
+    # Surfaces made through new_surface() or the game's fonts, counted only while someone is watching
+    def __init__(self):
+        self.enabled = False
+        self.count = 0
+        self.users = set()
+
+    def acquire(self, user):
+        self.users.add(user)
+        self.enabled = True
+
+    def release(self, user):
+        self.users.discard(user)
+        self.enabled = bool(self.users)
+
+SURFACE_ALLOCATIONS = SurfaceAllocations()
+
+
+def new_surface(size, flags=0):
+    # Every Surface the game makes goes through here, so SURFACE_ALLOCATIONS can count them
+    if SURFACE_ALLOCATIONS.enabled:
+        SURFACE_ALLOCATIONS.count += 1
+    return pygame.Surface(size, flags)
+
+
+class GameFont(pygame.font.Font):
+    # pygame.font.Font whose render() counts towards SURFACE_ALLOCATIONS
+    def render(self, *args, **kwargs):
+        if SURFACE_ALLOCATIONS.enabled:
+            SURFACE_ALLOCATIONS.count += 1
+        return super().render(*args, **kwargs)
+
+
+class PerformanceOverlay:
+    # F3: rolling frame-time graph, per-phase breakdown and live entity and Surface counts
+    def __init__(self, game):
+        self.game = game
+        self.visible = False
+        self.background = None # Built on first show and reused
+        self.counted_surfaces = 0 # SURFACE_ALLOCATIONS.count after the previous overlay draw
+
+    def toggle(self):
+        self.visible = not self.visible
+        if self.visible:
+            self.game.frame_phases.acquire(self)
+            SURFACE_ALLOCATIONS.acquire(self)
+            self.counted_surfaces = SURFACE_ALLOCATIONS.count
+        else:
+            self.game.frame_phases.release(self)
+            SURFACE_ALLOCATIONS.release(self)
+        self.game.needs_redraw = True
+
+    def draw(self, screen):
+        # Everything counted since the last overlay draw was allocated by this frame
+        surfaces = SURFACE_ALLOCATIONS.count - self.counted_surfaces
+        game = self.game
+        history = game.frame_phases.history
+        font = game.font_tiny
+        last_total, last_phases = history[-1] if history else (0.0, {})
+        average_total = sum(total for total, _ in history) / len(history) if history else 0.0
+
+        # (label, value) rows; values go in their own column since the font is not monospaced
+        rows = [(f"{game.clock.get_fps():.1f} FPS", f"{last_total:6.2f} ms   media {average_total:6.2f}")]
+        for phase in FRAME_PHASES:
+            average = sum(phases.get(phase, 0.0) for _, phases in history) / len(history) if history else 0.0
+            rows.append((phase, f"{last_phases.get(phase, 0.0):6.2f} ms   media {average:6.2f}"))
+        # Enemies on screen while playing; the editor does not update them at all
+        if game.game_state in (GAME_STATE_PLAYING, GAME_STATE_PLAYING_FROM_EDITOR):
+            view = pygame.Rect(game.camera_offset_x, game.camera_offset_y, screen.get_width(), screen.get_height())
+            active_enemies = len(game.enemy_index.query_rect(view))
+        else:
+            active_enemies = 0
+        rows.append(("sprites", f"{len(game.all_sprites)}   balas {len(game.bullets)}   enemigos {active_enemies}/{len(game.enemies)}"))
+        rows.append(("surfaces", f"{surfaces} en este fotograma"))
+
+        graph_width, graph_height = PERF_GRAPH_SIZE
+        line_height = font.get_linesize()
+        width, height = 360, graph_height + line_height * len(rows) + 30
+        if self.background is None or self.background.get_size() != (width, height):
+            self.background = new_surface((width, height), pygame.SRCALPHA)
+            self.background.fill(PERF_OVERLAY_BACKGROUND)
+        # Bottom-right corner, clear of the HUD
+        left, top = screen.get_width() - width - 10, screen.get_height() - height - 10
+        screen.blit(self.background, (left, top))
+
+        # Frame-time graph: one bar per frame, newest on the right, with the 60 FPS budget as a line
+        graph_bottom = top + 10 + graph_height
+        bar_width = graph_width / history.maxlen
+        for i, (total, _) in enumerate(history):
+            bar_height = min(graph_height, total / PERF_GRAPH_MAX_MS * graph_height)
+            color = (0, 200, 0) if total <= 1000 / 60 else (230, 60, 40)
+            x = left + 10 + graph_width - (len(history) - i) * bar_width
+            pygame.draw.rect(screen, color, (x, graph_bottom - bar_height, max(1, bar_width), bar_height))
+        budget_y = graph_bottom - graph_height / 2
+        pygame.draw.line(screen, (200, 200, 200), (left + 10, budget_y), (left + 10 + graph_width, budget_y))
+
+        y = graph_bottom + 10
+        for label, value in rows:
+            screen.blit(font.render(label, True, (230, 230, 230)), (left + 10, y))
+            screen.blit(font.render(value, True, (230, 230, 230)), (left + 130, y))
+            y += line_height
+        self.counted_surfaces = SURFACE_ALLOCATIONS.count # Leave the overlay's own text out of the next count
+
+
+class MetricsSink:
+    # --metricas: a JSON Lines record every `every` frames (phase means, worst frame, counts, gc), written off the main thread
+    def __init__(self, game, path, every=1):
+        self.game = game
+        self.path = path
+        self.every = max(1, every)
+        self.frames = 0
+        self.records = 0
+        self._phase_sums = {}
+        self._max_ms = 0.0
+        self._gc_counts = [0, 0, 0]
+        self._gc_ms = 0.0
+        self._gc_start = None
+        self._queue = queue.SimpleQueue()
+        self._file = open(path, 'a', buffering=1 << 16)
+        self._thread = threading.Thread(target=self._run, name="MetricsSink", daemon=True)
+        self._thread.start()
+        game.frame_phases.acquire(self)
+        gc.callbacks.append(self._on_gc)
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            self._gc_counts[info["generation"]] += 1
+            self._gc_ms += (time.perf_counter() - self._gc_start) * 1000
+            self._gc_start = None
+
+    def record(self, frame):
+        # Accounts one finished frame (FramePhases.end()); queues a record every `every` frames
+        self.frames += 1
+        if frame:
+            total, phases = frame
+            for phase, ms in phases.items():
+                self._phase_sums[phase] = self._phase_sums.get(phase, 0.0) + ms
+            self._max_ms = max(self._max_ms, total)
+        if self.frames % self.every:
+            return
+        game = self.game
+        self._queue.put({
+            "tick": self.frames,
+            "reloj_ms": game.game_clock.get_ticks(),
+            "estado": game.game_state,
+            "nivel": game.current_level_idx,
+            "pos": game.player.rect.topleft,
+            "fases_ms": {phase: round(ms / self.every, 3) for phase, ms in self._phase_sums.items()},
+            "max_ms": round(self._max_ms, 3),
+            "sprites": len(game.all_sprites),
+            "balas": len(game.bullets),
+            "enemigos": len(game.enemies),
+            "gc": self._gc_counts,
+            "gc_ms": round(self._gc_ms, 3),
+        })
+        self.records += 1
+        self._phase_sums = {}
+        self._max_ms = 0.0
+        self._gc_counts = [0, 0, 0] # The queued record keeps the old list
+        self._gc_ms = 0.0
+
+    def _run(self):
+        encoder = json.JSONEncoder(separators=(",", ":"))
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while True: # Whatever else is already queued goes in the same write
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch: # close() was called: write what came before it and stop
+                batch = batch[:batch.index(None)]
+                running = False
+            self._file.write("".join(encoder.encode(record) + "\n" for record in batch))
+        self._file.close()
+
+    def close(self):
+        if gc.callbacks.count(self._on_gc):
+            gc.callbacks.remove(self._on_gc)
+        self.game.frame_phases.release(self)
+        self._queue.put(None)
+        self._thread.join()
+
+
+class ProfileCapture:
+    # cProfile over the next `frames` frames of Game.run, saved as a timestamped .prof plus a text summary
+    def __init__(self, frames, directory=PROFILE_DIR):
+        self.frames_left = frames
+        self.frames = 0
+        self.directory = directory
+        self.started = time.perf_counter()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def frame_done(self):
+        # True once the capture has all its frames
+        self.frames += 1
+        self.frames_left -= 1
+        return self.frames_left <= 0
+
+    def finish(self):
+        # Stops profiling and writes perfil_<fecha>.prof and .txt; returns the .prof path
+        self.profiler.disable()
+        elapsed = time.perf_counter() - self.started
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, f"perfil_{time.strftime('%Y%m%d-%H%M%S')}")
+        self.profiler.dump_stats(f"{base}.prof")
+
+        summary = io.StringIO()
+        summary.write(f"{self.frames} fotogramas en {elapsed:.2f} s ({elapsed * 1000 / max(1, self.frames):.2f} ms por fotograma)\n")
+        stats = pstats.Stats(self.profiler, stream=summary).strip_dirs()
+        for order in ("cumulative", "tottime"):
+            summary.write(f"\n--- Funciones por tiempo {'acumulado' if order == 'cumulative' else 'propio'} ---\n")
+            stats.sort_stats(order).print_stats(PROFILE_TOP_FUNCTIONS)
+        with open(f"{base}.txt", 'w') as f:
+            f.write(summary.getvalue())
+        return f"{base}.prof"
+
+
+class StartupTimer:
+    # Milliseconds of each start-up stage, counted from STARTUP_ORIGIN (module import)
+    def __init__(self):
+        self.stages = [] # [(stage, ms)]
+        self.background_stages = [] # [(stage, ms)] of work finished on another thread, timed on its own
+        self.reported = False
+        self._last = STARTUP_ORIGIN
+
+    def mark(self, stage):
+        # Time since the previous mark goes to `stage`
+        now = time.perf_counter()
+        self.stages.append((stage, (now - self._last) * 1000))
+        self._last = now
+
+    def report(self):
+        elapsed = 0.0
+        print("Tiempos de arranque:")
+        for stage, ms in self.stages:
+            elapsed += ms
+            print(f"  {stage:<34} {ms:8.1f} ms   (a los {elapsed:7.1f} ms)")
+        for stage, ms in self.background_stages:
+            print(f"  {stage:<34} {ms:8.1f} ms")
+        self.reported = True
+
+    def background_done(self, stage, ms):
+        # Called from the thread that did the work; once the report is out, it gets its own line
+        self.background_stages.append((stage, ms))
+        if self.reported:
+            print(f"  {stage:<34} {ms:8.1f} ms")
+
+
+def surface_bytes_by_owner():
+    # {class name: [surfaces, bytes]} for Surfaces held by live objects, one level into containers; each counted once
+    seen = set()
+    tally = {}
+    for obj in gc.get_objects():
+        attributes = getattr(obj, "__dict__", None)
+        if type(attributes) is not dict or isinstance(obj, type(sys)):
+            continue
+        owner = type(obj).__name__
+        for value in attributes.values():
+            if isinstance(value, dict):
+                items = value.values()
+            elif isinstance(value, (list, tuple)):
+                items = value
+            else:
+                items = (value,)
+            for item in items:
+                if isinstance(item, pygame.Surface) and id(item) not in seen:
+                    seen.add(id(item))
+                    entry = tally.setdefault(owner, [0, 0])
+                    entry[0] += 1
+                    entry[1] += item.get_pitch() * item.get_height()
+    return tally
+
+
+class MemoryDiagnostics:
+    # --memoria: tracemalloc reports around level loads and play sessions, Surface bytes by owner, sprites retained after clears
+    def __init__(self):
+        tracemalloc.start(MEMORY_TRACE_DEPTH)
+        self.load_snapshot = None
+        self.session_snapshot = None
+        self.playing = False
+        self.clear_cycles = 0
+        self.retained_history = [] # Retained sprite total after each clear
+
+    @staticmethod
+    def _snapshot():
+        gc.collect() # Only live memory: garbage waiting for a collection would look like a leak
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def _report(self, title, before):
+        after = self._snapshot()
+        differences = after.compare_to(before, "lineno")
+        growth = sum(stat.size_diff for stat in differences)
+        print(f"[memoria] {title}: {growth / 1024:+.1f} KiB, {sum(stat.size for stat in after.statistics('filename')) / 1024:.0f} KiB trazados")
+        for stat in differences[:MEMORY_TOP_LINES]:
+            if stat.size_diff:
+                frame = stat.traceback[0]
+                print(f"[memoria]   {stat.size_diff / 1024:+9.1f} KiB {stat.count_diff:+6d} bloques  {os.path.basename(frame.filename)}:{frame.lineno}")
+        self.report_surfaces()
+
+    def report_surfaces(self):
+        tally = surface_bytes_by_owner()
+        total = sum(size for _, size in tally.values())
+        print(f"[memoria]   Surfaces vivas: {sum(count for count, _ in tally.values())}, {total / 1024 / 1024:.1f} MiB")
+        for owner, (count, size) in sorted(tally.items(), key=lambda item: -item[1][1]):
+            print(f"[memoria]     {owner:<20} {count:6d} surfaces {size / 1024:10.1f} KiB")
+
+    def before_load(self):
+        self.load_snapshot = self._snapshot()
+
+    def after_load(self):
+        if self.load_snapshot is not None:
+            self._report("carga de nivel", self.load_snapshot)
+            self.load_snapshot = None
+
+    def check_session(self, game):
+        # A play session starts when a playing state is entered and ends when it is left
+        playing = game.game_state in (GAME_STATE_PLAYING, GAME_STATE_PLAYING_FROM_EDITOR)
+        if playing and not self.playing:
+            self.session_snapshot = self._snapshot()
+        elif self.playing and not playing and self.session_snapshot is not None:
+            self._report("partida", self.session_snapshot)
+            self.session_snapshot = None
+        self.playing = playing
+
+    def after_clear(self, game):
+        self.clear_cycles += 1
+        gc.collect()
+        pooled = {id(shrapnel) for shrapnel in game.shrapnel_pool}
+        retained = {}
+        for obj in gc.get_objects():
+            if isinstance(obj, pygame.sprite.Sprite) and obj is not game.player and not obj.alive() and id(obj) not in pooled:
+                retained[type(obj).__name__] = retained.get(type(obj).__name__, 0) + 1
+        total = sum(retained.values())
+        previous = self.retained_history[-1] if self.retained_history else 0
+        self.retained_history.append(total)
+        detail = ", ".join(f"{name} {count}" for name, count in sorted(retained.items(), key=lambda item: -item[1]))
+        print(f"[memoria] _clear_all_sprites nº {self.clear_cycles}: {total} sprites retenidos ({total - previous:+d}){': ' + detail if detail else ''}"
+              f", {len(pooled)} de metralla en reserva")
+        recent = self.retained_history[-3:]
+        if len(recent) == 3 and recent[0] < recent[1] < recent[2]:
+            print("[memoria]   Los sprites retenidos crecen en cada ciclo: posible fuga.")
+
+    def stop(self):
+        if self.session_snapshot is not None: # Quit while playing: the session ends here
+            self._report("partida", self.session_snapshot)
+            self.session_snapshot = None
+        print("[memoria] Al salir:")
+        self.report_surfaces()
+        tracemalloc.stop()
+
 # --- Gestor de Sonidos ---
+# {name: (frequency, duration, decay_factor)} of the synthesized sounds
+SOUND_SPECS = {
+    "jump": (440, 0.1),
+    "shoot": (880, 0.05),
+    "charged_shoot": (1200, 0.1, 0.9), # Sonido para disparo cargado
+    "hit": (220, 0.1, 0.5),
+    "collect": (1000, 0.08),
+    "level_complete": (600, 0.3, 0.8),
+    "game_over": (150, 0.5, 0.2),
+    "dash": (1200, 0.07),
+    "health_pickup": (700, 0.1),
+    "speed_pickup": (1500, 0.1),
+    "charge_powerup_pickup": (1800, 0.1), # Sonido para power-up de carga
+    "spike_hit": (100, 0.1, 0.3),
+    "reload": (300, 0.2),
+    "weapon_pickup": (1600, 0.1), # Sonido para recoger arma
+    "explosion": (100, 0.2, 0.1), # Sonido para explosión
+    "hook_attach": (900, 0.05, 0.7), # Sonido para gancho
+    "hook_pull": (1100, 0.03, 0.8), # Sonido para arrastre de gancho
+}
+
 class SoundManager:
-    def __init__(self):
-        pygame.mixer.init()
-        self.sounds = {
-            "jump": pygame.mixer.Sound(self.create_simple_sound(440, 0.1)),
-            "shoot": pygame.mixer.Sound(self.create_simple_sound(880, 0.05)),
-            "charged_shoot": pygame.mixer.Sound(self.create_simple_sound(1200, 0.1, 0.9)), # Sonido para disparo cargado
-            "hit": pygame.mixer.Sound(self.create_simple_sound(220, 0.1, 0.5)),
-            "collect": pygame.mixer.Sound(self.create_simple_sound(1000, 0.08)),
-            "level_complete": pygame.mixer.Sound(self.create_simple_sound(600, 0.3, 0.8)),
-            "game_over": pygame.mixer.Sound(self.create_simple_sound(150, 0.5, 0.2)),
-            "dash": pygame.mixer.Sound(self.create_simple_sound(1200, 0.07)),
-            "health_pickup": pygame.mixer.Sound(self.create_simple_sound(700, 0.1)),
-            "speed_pickup": pygame.mixer.Sound(self.create_simple_sound(1500, 0.1)),
-            "charge_powerup_pickup": pygame.mixer.Sound(self.create_simple_sound(1800, 0.1)), # Sonido para power-up de carga
-            "spike_hit": pygame.mixer.Sound(self.create_simple_sound(100, 0.1, 0.3)),
-            "reload": pygame.mixer.Sound(self.create_simple_sound(300, 0.2)),
-            "weapon_pickup": pygame.mixer.Sound(self.create_simple_sound(1600, 0.1)), # Sonido para recoger arma
-            "explosion": pygame.mixer.Sound(self.create_simple_sound(100, 0.2, 0.1)), # Sonido para explosión
-            "hook_attach": pygame.mixer.Sound(self.create_simple_sound(900, 0.05, 0.7)), # Sonido para gancho
-            "hook_pull": pygame.mixer.Sound(self.create_simple_sound(1100, 0.03, 0.8)) # Sonido para arrastre de gancho
-        }
+    def __init__(self, enabled=True, deferred=False):
+        # deferred=True leaves the mixer and the sounds for open_mixer()/synthesize(), called after the menu is up
+        self.sounds = {}
+        if not enabled: # Headless: no audio device, nothing synthesized, play_sound does nothing
+            return
+        if not deferred and self.open_mixer():
+            self.synthesize()
+
+    def open_mixer(self):
+        try:
+            pygame.mixer.init()
+        except pygame.error as e:
+            print(f"No se pudo abrir el audio, el juego irá sin sonido: {e}")
+            return False
+        return True
+
+    def synthesize(self, background=False, on_done=None):
+        # Sounds not synthesized yet are simply not played; on_done gets the milliseconds it took
+        if background:
+            threading.Thread(target=self.synthesize, kwargs={"on_done": on_done}, name="SoundManager", daemon=True).start()
+            return
+        start = time.perf_counter()
+        for name, spec in SOUND_SPECS.items():
+            self.sounds[name] = self.create_simple_sound(*spec)
+        if on_done:
+            on_done((time.perf_counter() - start) * 1000)
 
     def create_simple_sound(self, frequency, duration, decay_factor=1.0):
         sample_rate = 44100
@@ -101,23 +802,28 @@ class SoundManager:
 # --- Clases de Sprites ---
 
 class Player(pygame.sprite.Sprite):
+    WIDTH = 35 # Hitbox size and walking speed; validar_niveles.py reads them too
+    HEIGHT = 45
+    SPEED = 5
+
     def __init__(self, player_color, game_instance): # Add game_instance
         super().__init__()
         self.game = game_instance # Store game instance
+        self.sound_manager = game_instance.sound_manager # The hook code in update/start_charge plays its sounds through this
         self.player_color = player_color
         self.secondary_color = (200, 200, 200)
 
-        self.width = 35
-        self.height = 45 
-        self.image = pygame.Surface([self.width, self.height], pygame.SRCALPHA)
+        self.width = self.WIDTH
+        self.height = self.HEIGHT
+        self.image = new_surface([self.width, self.height], pygame.SRCALPHA)
         self.rect = self.image.get_rect()
 
-        self.speed_horizontal = 5
-        self.original_speed_horizontal = 5 
+        self.speed_horizontal = self.SPEED
+        self.original_speed_horizontal = self.SPEED
         self.velocity_y = 0
         self.on_ground = False
         self.jump_count = 0
-        self.last_shot_time = pygame.time.get_ticks()
+        self.last_shot_time = self.game.game_clock.get_ticks()
         self.shoot_delay = 250
 
         self.health = 100
@@ -265,8 +971,8 @@ class Player(pygame.sprite.Sprite):
         pygame.draw.rect(self.image, self.secondary_color, (self.width * 3 // 4 - leg_width + 5, self.height - leg_height, leg_width, leg_height), border_radius=3)
 
 
-    def update(self, platforms, doors): # Added doors to update parameters
-        keys = pygame.key.get_pressed()
+    def update(self, solids): # SpatialHash of platforms and closed doors (Game.solid_index)
+        keys = self.game.input.get_pressed()
         
         current_speed = self.speed_horizontal
         if self.is_dashing:
@@ -287,8 +993,8 @@ class Player(pygame.sprite.Sprite):
         # Player movement is no longer clamped to level_width/height.
         # It's only limited by collision with platforms/doors.
 
-        # Horizontal collision with platforms and CLOSED doors
-        for obj in list(platforms) + [d for d in doors if not d.is_open]:
+        # Horizontal collision with platforms and CLOSED doors (anything between the old and new position)
+        for obj in solids.query_rect(self.rect.union((original_x, self.rect.y, self.rect.width, self.rect.height))):
             if self.rect.colliderect(obj.rect):
                 if self.rect.x < original_x: # Moving left
                     self.rect.left = obj.rect.right
@@ -304,7 +1010,7 @@ class Player(pygame.sprite.Sprite):
 
         self.on_ground = False
         # Vertical collision with platforms and CLOSED doors
-        for obj in list(platforms) + [d for d in doors if not d.is_open]:
+        for obj in solids.query_rect(self.rect.union((self.rect.x, original_y, self.rect.width, self.rect.height))):
             if self.rect.colliderect(obj.rect):
                 if self.velocity_y > 0: # Falling
                     self.rect.bottom = obj.rect.top
@@ -315,7 +1021,7 @@ class Player(pygame.sprite.Sprite):
                     self.rect.top = obj.rect.bottom
                     self.velocity_y = 0
         
-        now = pygame.time.get_ticks()
+        now = self.game.game_clock.get_ticks()
         
         if self.invulnerable:
             if now - self.invulnerable_timer > INVULNERABILITY_DURATION:
@@ -343,10 +1049,11 @@ class Player(pygame.sprite.Sprite):
                 # Dash movement is handled by adding to rect.x directly
                 # Ensure dash doesn't push player through walls
                 dash_move_x = self.current_horizontal_direction * (DASH_SPEED_MULTIPLIER * self.speed_horizontal - self.speed_horizontal)
+                dash_start_rect = self.rect.copy()
                 self.rect.x += dash_move_x
                 
                 # Re-check collisions after dash movement
-                for obj in list(platforms) + [d for d in doors if not d.is_open]:
+                for obj in solids.query_rect(self.rect.union(dash_start_rect)):
                     if self.rect.colliderect(obj.rect):
                         if dash_move_x > 0: # Dashing right
                             self.rect.right = obj.rect.left
@@ -423,37 +1130,24 @@ class Player(pygame.sprite.Sprite):
         elif self.is_grappling and not self.grapple_attached_sprite:
             # If not attached, but still "grappling" (hook is flying)
             # Check for attachment
-            mouse_x, mouse_y = pygame.mouse.get_pos()
+            mouse_x, mouse_y = self.game.input.get_mouse_pos()
             # Convert mouse pos to world coords
             mouse_x_world = mouse_x + self.game.camera_offset_x
             mouse_y_world = mouse_y + self.game.camera_offset_y
 
-            # Calculate the hook's current "visual" end point (limited by range)
-            player_center_world = pygame.math.Vector2(self.rect.centerx, self.rect.centery)
-            mouse_world_vec = pygame.math.Vector2(mouse_x_world, mouse_y_world)
-            
-            direction_vec = (mouse_world_vec - player_center_world)
-            if direction_vec.length() > PURPLE_HOOK_RANGE_CELLS * self.game.GRID_SIZE:
-                direction_vec.scale_to_length(PURPLE_HOOK_RANGE_CELLS * self.game.GRID_SIZE)
-            
-            hook_end_point_world = player_center_world + direction_vec
-            
-            # Create a small rect at the hook's end for collision detection
-            # CORRECCIÓN: Aumentar el tamaño del rectángulo de detección del gancho
-            hook_rect = pygame.Rect(hook_end_point_world.x - PURPLE_HOOK_DETECTION_SIZE // 2, 
-                                    hook_end_point_world.y - PURPLE_HOOK_DETECTION_SIZE // 2, 
-                                    PURPLE_HOOK_DETECTION_SIZE, PURPLE_HOOK_DETECTION_SIZE)
-
-            # Check for collision with hookable sprites
-            found_hookable = False
-            for sprite in self.game.platforms.sprites() + self.game.doors.sprites():
-                if hasattr(sprite, 'is_hookable') and sprite.is_hookable and hook_rect.colliderect(sprite.rect):
-                    self.grapple_attached_sprite = sprite
-                    self.grapple_target_pos = hook_end_point_world # Attach to the point where it hit
-                    self.grapple_pull_timer = now
-                    self.sound_manager.play_sound("hook_attach")
-                    found_hookable = True
-                    break
+            # Cast the detection box along the drawn hook line (limited by range) and attach to the first
+            # hookable surface it touches: the old square's reach around the line's end, plus anything on the way
+            dx = mouse_x_world - self.rect.centerx
+            dy = mouse_y_world - self.rect.centery
+            hook_length = min(math.hypot(dx, dy), PURPLE_HOOK_RANGE_CELLS * self.game.GRID_SIZE)
+            hit = self.game.solid_index.raycast(self.rect.center, (dx, dy), hook_length, accept=lambda sprite: sprite.is_hookable,
+                                                radius=PURPLE_HOOK_DETECTION_SIZE // 2)
+            if hit:
+                distance, sprite, hit_point = hit
+                self.grapple_attached_sprite = sprite
+                self.grapple_target_pos = hit_point # Attach to the point of the surface the box touched
+                self.grapple_pull_timer = now
+                self.sound_manager.play_sound("hook_attach")
             
             # If hook is active but not attached and time runs out, or mouse released (handled in handle_events)
             # For now, if not attached, it will just draw the line and wait for attachment or mouse release.
@@ -476,7 +1170,7 @@ class Player(pygame.sprite.Sprite):
                 self.grapple_target_pos = None
 
     def shoot(self, target_x, target_y, sound_manager, click_type="left"):
-        now = pygame.time.get_ticks()
+        now = self.game.game_clock.get_ticks()
         current_weapon_data = self.weapon_data[self.current_weapon]
 
         if self.is_reloading:
@@ -521,7 +1215,7 @@ class Player(pygame.sprite.Sprite):
         return False
 
     def start_dash(self, sound_manager):
-        now = pygame.time.get_ticks()
+        now = self.game.game_clock.get_ticks()
         if not self.is_dashing and (now - self.last_dash_time > DASH_COOLDOWN):
             self.is_dashing = True
             self.dash_timer = now
@@ -536,7 +1230,7 @@ class Player(pygame.sprite.Sprite):
         return False
 
     def start_reload(self, sound_manager):
-        now = pygame.time.get_ticks()
+        now = self.game.game_clock.get_ticks()
         current_weapon_data = self.weapon_data[self.current_weapon]
         # Only allow reload if reload_duration exists for the current weapon
         if "reload_duration" in current_weapon_data and \
@@ -555,7 +1249,7 @@ class Player(pygame.sprite.Sprite):
             if self.has_charge_powerup: # Special power-up charge shot
                 if not self.is_charging_powerup_shot:
                     self.is_charging_powerup_shot = True
-                    self.charge_powerup_start_time = pygame.time.get_ticks()
+                    self.charge_powerup_start_time = self.game.game_clock.get_ticks()
             elif self.current_weapon == "purple": # Purple weapon grappling hook
                 if not self.is_grappling:
                     self.is_grappling = True
@@ -565,11 +1259,11 @@ class Player(pygame.sprite.Sprite):
             if self.current_weapon == "red" and self.weapon_data["red"]["current_ammo"] > 0:
                 if not self.is_charging_red_weapon:
                     self.is_charging_red_weapon = True
-                    self.red_charge_start_time = pygame.time.get_ticks()
+                    self.red_charge_start_time = self.game.game_clock.get_ticks()
             elif self.current_weapon == "purple" and self.weapon_data["purple"]["current_ammo"] > 0:
                 if not self.is_charging_purple_shot:
                     self.is_charging_purple_shot = True
-                    self.purple_charge_start_time = pygame.time.get_ticks()
+                    self.purple_charge_start_time = self.game.game_clock.get_ticks()
 
     def stop_charge(self, click_type="right"):
         if click_type == "right":
@@ -596,7 +1290,7 @@ class Player(pygame.sprite.Sprite):
 
     def activate_speed_boost(self):
         self.speed_boost_active = True
-        self.speed_boost_timer = pygame.time.get_ticks()
+        self.speed_boost_timer = self.game.game_clock.get_ticks()
 
     def heal(self, amount):
         self.health += amount
@@ -608,7 +1302,7 @@ class Player(pygame.sprite.Sprite):
             self.health -= amount
             sound_manager.play_sound("hit")
             self.invulnerable = True
-            self.invulnerable_timer = pygame.time.get_ticks()
+            self.invulnerable_timer = self.game.game_clock.get_ticks()
             if self.health <= 0:
                 self.health = 0
                 return True
@@ -627,11 +1321,12 @@ class Bullet(pygame.sprite.Sprite):
         self.is_shrapnel = False
         self.bounces_remaining = 0
         self.is_arc_projectile = False # For purple weapon's arc shot
+        self.hit_sprite = None # Solid the last update ran into (Game opens weapon doors with it)
 
         if self.weapon_type == "red": # Sniper weapon
             self.speed = RED_BULLET_BASE_SPEED + (RED_BULLET_MAX_SPEED - RED_BULLET_BASE_SPEED) * self.charge_level
             self.damage = RED_BULLET_BASE_DAMAGE + (RED_BULLET_MAX_DAMAGE - RED_BULLET_BASE_DAMAGE) * self.charge_level
-            self.original_image = pygame.Surface([20, 10], pygame.SRCALPHA)
+            self.original_image = new_surface([20, 10], pygame.SRCALPHA)
             self.blink_timer = 0
             self._draw_charged_bullet_image(CHARGED_BULLET_COLOR_PRIMARY, CHARGED_BULLET_COLOR_SECONDARY)
         elif self.weapon_type == "purple": # Explosive weapon (arc shot)
@@ -640,20 +1335,20 @@ class Bullet(pygame.sprite.Sprite):
             # Speed and damage will be determined by charge_level and arc physics
             self.speed = 0 # Initial speed is calculated in Game.shoot
             self.damage = 0 # Main projectile does no direct damage
-            self.original_image = pygame.Surface([18, 18], pygame.SRCALPHA)
+            self.original_image = new_surface([18, 18], pygame.SRCALPHA)
             pygame.draw.circle(self.original_image, (150, 0, 255), (9, 9), 9) # Purple circle
             pygame.draw.circle(self.original_image, (255, 255, 0), (9, 9), 4) # Yellow core
         elif self.weapon_type == "shrapnel": # Shrapnel from purple explosion
             self.is_shrapnel = True
-            self.speed = 15 # Shrapnel speed
+            self.speed = PURPLE_SHRAPNEL_SPEED
             self.damage = 1
-            self.bounces_remaining = 2 # Shrapnel can bounce a few times
-            self.original_image = pygame.Surface([6, 6], pygame.SRCALPHA)
+            self.bounces_remaining = PURPLE_SHRAPNEL_BOUNCES # Shrapnel can bounce a few times
+            self.original_image = new_surface([6, 6], pygame.SRCALPHA)
             pygame.draw.circle(self.original_image, (255, 255, 0), (3, 3), 3) # Small yellow yellow circle
         else: # Normal or Blue weapon
             self.speed = 20 if self.weapon_type == "normal" else 25 # Speed for normal/blue
             self.damage = 1 if self.weapon_type == "normal" else 0.5 # Damage for normal/blue
-            self.original_image = pygame.Surface([10, 5], pygame.SRCALPHA)
+            self.original_image = new_surface([10, 5], pygame.SRCALPHA)
             self.original_image.fill((255, 255, 50) if self.weapon_type == "normal" else (0, 100, 255)) # Yellow or Blue
 
         self.image = self.original_image.copy()
@@ -671,53 +1366,66 @@ class Bullet(pygame.sprite.Sprite):
         
         self.angle = math.degrees(math.atan2(-self.vel_y, self.vel_x))
 
+    def rearm(self, x, y, vel_x, vel_y):
+        # Pooled shrapnel is reset and reused instead of building a new sprite and Surface per fragment
+        self.rect.center = (x, y)
+        self.vel_x = vel_x
+        self.vel_y = vel_y
+        self.bounces_remaining = PURPLE_SHRAPNEL_BOUNCES
+        self.hit_sprite = None
+
+    def kill(self):
+        # Dead shrapnel goes back to the game's pool for the next explosion
+        if self.is_shrapnel and self.game and self.alive():
+            self.game.shrapnel_pool.append(self)
+        super().kill()
+
     def _draw_charged_bullet_image(self, fill_color, outline_color):
         self.original_image.fill((0, 0, 0, 0)) # Clear for redraw
         pygame.draw.ellipse(self.original_image, fill_color, self.original_image.get_rect(), 0) # Fill
         pygame.draw.ellipse(self.original_image, outline_color, self.original_image.get_rect(), 2) # Outline
 
-    def update(self, platforms):
+    def update(self, solids): # SpatialHash of platforms and closed doors (Game.solid_index)
         self.vel_y += BULLET_GRAVITY_EFFECT
-        self.rect.x += self.vel_x
-        self.rect.y += self.vel_y
-        
+        self.hit_sprite = None
+
+        # Sweep the whole step instead of testing the end position: at up to RED_BULLET_MAX_SPEED px per
+        # frame a bullet would jump over a 20 px platform. Shrapnel bounces off the face it actually hit
+        # and spends the rest of the step in the reflected direction.
+        remaining = 1.0
+        while remaining > 0:
+            dx, dy = self.vel_x * remaining, self.vel_y * remaining
+            hit = solids.sweep(self.rect, dx, dy)
+            if hit is None:
+                self.rect.x += dx
+                self.rect.y += dy
+                break
+            time_of_impact, self.hit_sprite, (normal_x, normal_y) = hit
+            self.rect.move_ip(int(dx * time_of_impact), int(dy * time_of_impact)) # Truncated, so it stops short of the face
+            if self.is_explosive:
+                return "explode" # Signal for explosion
+            if not (self.is_shrapnel and self.bounces_remaining > 0):
+                self.kill() # Remove bullet if it hits a platform and is not explosive/shrapnel or no bounces left
+                return None
+            if normal_x:
+                self.vel_x *= -1
+            if normal_y:
+                self.vel_y *= -1
+            self.bounces_remaining -= 1
+            remaining *= 1 - time_of_impact
+
         self.angle = math.degrees(math.atan2(-self.vel_y, self.vel_x))
         
         if self.weapon_type == "red": # Charged bullet blink
-            now = pygame.time.get_ticks()
+            now = self.game.game_clock.get_ticks() if self.game else pygame.time.get_ticks()
             if (now // CHARGED_BULLET_BLINK_INTERVAL) % 2 == 0:
                 self._draw_charged_bullet_image(CHARGED_BULLET_COLOR_PRIMARY, CHARGED_BULLET_COLOR_SECONDARY)
             else:
                 self._draw_charged_bullet_image(CHARGED_BULLET_COLOR_SECONDARY, CHARGED_BULLET_COLOR_PRIMARY)
             
-        self.image = pygame.transform.rotate(self.original_image, self.angle)
-        self.rect = self.image.get_rect(center=self.rect.center)
-
-        hits_platforms = pygame.sprite.spritecollide(self, platforms, False)
-        if hits_platforms:
-            if self.is_explosive:
-                # Signal for explosion
-                return "explode"
-            elif self.is_shrapnel and self.bounces_remaining > 0:
-                # Simple bounce logic for shrapnel
-                for platform in hits_platforms:
-                    # Determine collision side and reverse velocity component
-                    if self.vel_x > 0 and self.rect.right > platform.rect.left and self.rect.left < platform.rect.left:
-                        self.vel_x *= -1
-                        self.rect.right = platform.rect.left -1 # Move out of collision
-                    elif self.vel_x < 0 and self.rect.left < platform.rect.right and self.rect.right > platform.rect.right:
-                        self.vel_x *= -1
-                        self.rect.left = platform.rect.right + 1
-
-                    if self.vel_y > 0 and self.rect.bottom > platform.rect.top and self.rect.top < platform.rect.top:
-                        self.vel_y *= -1
-                        self.rect.bottom = platform.rect.top - 1
-                    elif self.vel_y < 0 and self.rect.top < platform.rect.bottom and self.rect.bottom > platform.rect.bottom:
-                        self.vel_y *= -1
-                        self.rect.top = platform.rect.bottom + 1
-                self.bounces_remaining -= 1
-            else:
-                self.kill() # Remove bullet if it hits a platform and is not explosive/shrapnel or no bounces left
+        if not self.is_shrapnel: # Shrapnel is round: rotating it would only allocate a new Surface
+            self.image = pygame.transform.rotate(self.original_image, self.angle)
+            self.rect = self.image.get_rect(center=self.rect.center)
 
         # Remove if off-screen (using game's level dimensions - though camera moves freely, bullets should still be culled)
         # We'll use a large arbitrary boundary if no specific level_width/height is set to prevent infinite bullets
@@ -734,7 +1442,7 @@ class Bullet(pygame.sprite.Sprite):
 class ChaserEnemy(pygame.sprite.Sprite):
     def __init__(self, x, y, enemy_color):
         super().__init__()
-        self.image = pygame.Surface([40, 40], pygame.SRCALPHA)
+        self.image = new_surface([40, 40], pygame.SRCALPHA)
         pygame.draw.ellipse(self.image, enemy_color, (0, 0, 40, 40))
         pygame.draw.circle(self.image, (255, 255, 255), (15, 15), 5)
         pygame.draw.circle(self.image, (255, 255, 255), (25, 15), 5)
@@ -795,7 +1503,7 @@ class ChaserEnemy(pygame.sprite.Sprite):
 class PatrolEnemy(pygame.sprite.Sprite):
     def __init__(self, x, y, enemy_color, patrol_range=100):
         super().__init__()
-        self.image = pygame.Surface([35, 35], pygame.SRCALPHA)
+        self.image = new_surface([35, 35], pygame.SRCALPHA)
         pygame.draw.circle(self.image, enemy_color, (17, 17), 17)
         pygame.draw.circle(self.image, (255, 255, 255), (17, 17), 5)
         pygame.draw.circle(self.image, (0, 0, 0), (17, 17), 2)
@@ -856,14 +1564,14 @@ class Platform(pygame.sprite.Sprite):
         self.orientation = orientation
         self.dies_on_touch = dies_on_touch # New property
         self.is_hookable = is_hookable # New property
-        self.image = pygame.Surface([width, height])
+        self.image = new_surface([width, height])
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
         self._draw_image()
 
     def _draw_image(self):
-        self.image = pygame.Surface([self.rect.width, self.rect.height])
+        self.image = new_surface([self.rect.width, self.rect.height])
         self.image.fill(self.platform_color)
         if self.dies_on_touch: # Add a visual indicator for death blocks
             pygame.draw.rect(self.image, (255, 0, 0), self.image.get_rect(), 3) # Red border
@@ -910,38 +1618,38 @@ class Collectible(pygame.sprite.Sprite):
 
     def _create_image(self, collectible_type, colors):
         if collectible_type == "score":
-            image = pygame.Surface([20, 20])
+            image = new_surface([20, 20])
             image.fill(colors.COLLECTIBLE_COLOR)
         elif collectible_type == "health":
-            image = pygame.Surface([25, 25])
+            image = new_surface([25, 25])
             image.fill(colors.PLAYER_COLOR)
             pygame.draw.rect(image, colors.WHITE, image.get_rect(), 2)
             pygame.draw.line(image, colors.WHITE, (image.get_width() // 2, 5), (image.get_width() // 2, image.get_height() - 5), 3)
             pygame.draw.line(image, colors.WHITE, (5, image.get_height() // 2), (image.get_width() - 5, image.get_height() // 2), 3)
         elif collectible_type == "speed":
-            image = pygame.Surface([25, 25])
+            image = new_surface([25, 25])
             image.fill(colors.BULLET_COLOR)
             points = [(12, 0), (24, 12), (18, 12), (24, 24), (0, 12), (6, 12), (0, 0)]
             pygame.draw.polygon(image, colors.WHITE, points)
         elif collectible_type == "charge_powerup":
-            image = pygame.Surface([25, 25], pygame.SRCALPHA)
+            image = new_surface([25, 25], pygame.SRCALPHA)
             pygame.draw.circle(image, (255, 100, 0), (12, 12), 10) # Orange core
             pygame.draw.circle(image, (255, 200, 0), (12, 12), 12, 2) # Yellow outline
             pygame.draw.line(image, (255, 255, 255), (5, 12), (20, 12), 2) # Plus sign horizontal
             pygame.draw.line(image, (255, 255, 255), (12, 5), (12, 20), 2) # Plus sign vertical
         elif collectible_type == "blue_weapon_powerup":
-            image = pygame.Surface([25, 25], pygame.SRCALPHA)
+            image = new_surface([25, 25], pygame.SRCALPHA)
             pygame.draw.rect(image, (0, 100, 255), (5, 10, 15, 5)) # Blue rectangle
             pygame.draw.circle(image, (0, 100, 255), (20, 12), 3) # Barrel
             pygame.draw.polygon(image, (200, 200, 200), [(5,10), (0,15), (5,20)]) # Handle
         elif collectible_type == "red_weapon_powerup":
-            image = pygame.Surface([25, 25], pygame.SRCALPHA)
+            image = new_surface([25, 25], pygame.SRCALPHA)
             pygame.draw.rect(image, (255, 50, 0), (5, 10, 18, 5)) # Red rectangle
             pygame.draw.circle(image, (255, 50, 0), (23, 12), 4) # Barrel
             pygame.draw.line(image, (200, 200, 200), (5, 10), (0, 15), 3) # Handle
             pygame.draw.line(image, (200, 200, 200), (0, 15), (5, 20), 3)
         elif collectible_type == "purple_weapon_powerup":
-            image = pygame.Surface([25, 25], pygame.SRCALPHA)
+            image = new_surface([25, 25], pygame.SRCALPHA)
             pygame.draw.circle(image, (150, 0, 255), (12, 12), 10) # Purple circle
             pygame.draw.circle(image, (255, 255, 0), (12, 12), 4) # Yellow core
             pygame.draw.line(image, (200, 200, 200), (5, 12), (20, 12), 2) # Plus sign horizontal
@@ -960,7 +1668,7 @@ class Key(pygame.sprite.Sprite):
         super().__init__()
         self.key_id = key_id
         self.key_color = key_color
-        self.image = pygame.Surface([20, 20], pygame.SRCALPHA)
+        self.image = new_surface([20, 20], pygame.SRCALPHA)
         self._draw_key_image()
         self.rect = self.image.get_rect(center=(x, y))
 
@@ -990,7 +1698,7 @@ class Door(pygame.sprite.Sprite):
         self.door_color = door_color
         self.dies_on_touch = dies_on_touch # New property
         self.is_hookable = is_hookable # New property
-        self.image = pygame.Surface([width, height])
+        self.image = new_surface([width, height])
         self.rect = self.image.get_rect(topleft=(x, y))
         self.is_open = False
         self._draw_image()
@@ -1040,7 +1748,7 @@ class Spike(pygame.sprite.Sprite):
         self.width = 30
         self.height = 20
         self.instant_kill = instant_kill # New property
-        self.image = pygame.Surface([self.width, self.height], pygame.SRCALPHA)
+        self.image = new_surface([self.width, self.height], pygame.SRCALPHA)
         # Draw a triangle pointing upwards
         points = [(0, self.height), (self.width // 2, 0), (self.width, self.height)]
         pygame.draw.polygon(self.image, spike_color, points)
@@ -1070,7 +1778,7 @@ class Spike(pygame.sprite.Sprite):
 class LevelExit(pygame.sprite.Sprite):
     def __init__(self, x, y, width, height, color):
         super().__init__()
-        self.image = pygame.Surface([width, height])
+        self.image = new_surface([width, height])
         self.image.fill(color)
         pygame.draw.rect(self.image, (255, 255, 255), (0, 0, width, height), 3) # White border
         self.rect = self.image.get_rect(topleft=(x, y))
@@ -1220,6 +1928,75 @@ LEVEL_DATA = [
     }
     # Add more levels here
 ]
+
+# --- Level Schema ---
+# Shared by load_level_from_dict and the offline tools (validar_niveles.py) so both read levels the same way.
+WEAPON_TYPES = ("normal", "blue", "red", "purple")
+COLLECTIBLE_TYPES = ("score", "health", "speed", "charge_powerup", "blue_weapon_powerup", "red_weapon_powerup", "purple_weapon_powerup")
+ENEMY_TYPES = ("chaser", "patrol")
+
+def normalize_level_data(level_data):
+    # Copy of level_data with every optional field filled in; KeyError, IndexError, TypeError or ValueError if off-schema
+    level = {
+        "level_width": level_data.get("level_width", WIDTH * 2),
+        "level_height": level_data.get("level_height", HEIGHT * 2),
+        "player_start": tuple(level_data["player_start"][:2]),
+        "platforms": [],
+        "enemies": [],
+        "collectibles": [],
+        "obstacles": [],
+        "keys": [],
+        "doors": [],
+        "exit": None
+    }
+
+    for p_data in level_data["platforms"]:
+        level["platforms"].append((p_data[0], p_data[1], p_data[2], p_data[3],
+                                   p_data[4] if len(p_data) > 4 else "horizontal",
+                                   p_data[5] if len(p_data) > 5 else False, # dies_on_touch
+                                   p_data[6] if len(p_data) > 6 else False)) # is_hookable
+
+    for e_data in level_data["enemies"]:
+        if e_data["type"] not in ENEMY_TYPES:
+            raise ValueError(f"Tipo de enemigo desconocido: {e_data['type']}")
+        enemy = {"type": e_data["type"], "pos": tuple(e_data["pos"][:2])}
+        if e_data["type"] == "patrol":
+            enemy["range"] = e_data.get("range", 100)
+        level["enemies"].append(enemy)
+
+    for c_data in level_data["collectibles"]:
+        if c_data["type"] not in COLLECTIBLE_TYPES:
+            raise ValueError(f"Tipo de coleccionable desconocido: {c_data['type']}")
+        level["collectibles"].append({"type": c_data["type"], "pos": tuple(c_data["pos"][:2])})
+
+    for o_data in level_data.get("obstacles", []):
+        if o_data["type"] == "spike":
+            level["obstacles"].append({"type": "spike", "pos": tuple(o_data["pos"][:2]), "instant_kill": o_data.get("instant_kill", False)})
+
+    for k_data in level_data.get("keys", []):
+        level["keys"].append({"id": k_data["id"], "pos": tuple(k_data["pos"][:2]), "color": tuple(k_data["color"])}) # Convert list to tuple for color
+
+    for d_data in level_data.get("doors", []):
+        door_color_val = d_data.get("color")
+        if isinstance(door_color_val, list):
+            door_color_val = tuple(door_color_val)
+        elif not isinstance(door_color_val, tuple):
+            door_color_val = (100, 100, 100) # Default if format is wrong
+        level["doors"].append({
+            "id": d_data.get("id"),
+            "pos": tuple(d_data["pos"][:4]),
+            "color": door_color_val,
+            "required_key_id": d_data.get("required_key_id"),
+            "required_weapon_type": d_data.get("required_weapon_type"),
+            "dies_on_touch": d_data.get("dies_on_touch", False),
+            "is_hookable": d_data.get("is_hookable", False)
+        })
+
+    exit_data = level_data["exit"]
+    if exit_data: # Ensure exit_data is not None
+        level["exit"] = tuple(exit_data[:4])
+    return level
+
 # --- Custom Input Box (for saving filename and editing properties) ---
 class InputBox:
     def __init__(self, x, y, w, h, font, text=''):
@@ -1291,6 +2068,9 @@ class InputBox:
             placeholder_surface = self.font.render(self.placeholder, True, (150, 150, 150))
             screen.blit(placeholder_surface, (self.rect.x + 5, self.rect.y + 5))
 
+        if self.caret_visible():
+            pygame.draw.rect(screen, (255, 255, 255), self.caret_rect())
+
         # Draw dropdown if active
         if self.show_dropdown and self.dropdown_options:
             dropdown_y = self.rect.bottom + 5
@@ -1304,6 +2084,20 @@ class InputBox:
                 screen.blit(option_surface, (option_rect.x + 5, option_rect.y + 5))
                 dropdown_y += self.rect.height + 2
 
+    def caret_visible(self):
+        return self.active and not self.show_dropdown and (pygame.time.get_ticks() // CARET_BLINK_INTERVAL) % 2 == 0
+
+    def caret_rect(self):
+        return pygame.Rect(self.rect.x + 6 + self.txt_surface.get_width(), self.rect.y + 8, 2, self.rect.height - 16)
+
+    def draw_caret(self, screen, background_color):
+        # Repaints only the caret cell, for dirty-rect updates while nothing else changes
+        caret_rect = self.caret_rect()
+        screen.fill(background_color, caret_rect)
+        if self.caret_visible():
+            pygame.draw.rect(screen, (255, 255, 255), caret_rect)
+        return caret_rect
+
     def get_text(self):
         return self.text
     
@@ -1333,12 +2127,15 @@ class EditorPanel:
     def __init__(self, x, y, width, height, game_instance):
         self.rect = pygame.Rect(x, y, width, height)
         self.game = game_instance
-        self.font = pygame.font.Font(None, 24)
         self.button_height = 30
         self.padding = 5
         self.buttons = []
         self._create_buttons()
 
+    @property
+    def font(self):
+        return self.game.font_tiny # Same size; loaded on first draw rather than at startup
+
     def _create_buttons(self):
         # Define buttons with their tool type and display text
         button_data = [
@@ -1390,7 +2187,7 @@ class EditorPanel:
             if button["rect"].collidepoint(pos):
                 if button["tool_type"] == "load_level":
                     self.game.game_state = GAME_STATE_LOAD_LEVEL_MENU # Change state to load menu
-                    self.game.available_levels_for_load = self.game._get_level_filenames_from_folder() # Refresh list
+                    self.game._refresh_load_level_menu() # Refresh list and cached thumbnails
                     print("Abriendo menú de carga de niveles.")
                 elif button["tool_type"] == "test_level":
                     self.game._save_current_editor_state()
@@ -1406,38 +2203,364 @@ class EditorPanel:
         return False
 
 
+# --- Spatial Index (editor hit-testing, triggers and level collision) ---
+EDITOR_INDEX_CELL_SIZE = 100 # World pixels per bucket; two grid cells keeps buckets small for typical elements
+
+EDITOR_UNDO_LIMIT = 100 # Editor actions kept for Ctrl+Z
+EDITOR_ZOOM_LEVELS = [1.0, 0.5, 0.25] # Chunk size times each zoom must be a whole number of pixels
+EDITOR_CHUNK_SIZE = EDITOR_INDEX_CELL_SIZE * 4 # World pixels per cached chunk bitmap when zoomed out
+
+# Level sprite groups from bottom to top: a sprite's position here is its pick/draw layer in the editor
+EDITOR_PICK_LAYERS = ["platforms", "enemies", "obstacles", "collectibles", "keys", "doors", "level_exit"]
+LEVEL_SPRITE_GROUPS = {Platform: "platforms", ChaserEnemy: "enemies", PatrolEnemy: "enemies", Collectible: "collectibles",
+                       Spike: "obstacles", Key: "keys", Door: "doors", LevelExit: "level_exit"}
+# Static elements that react when the player touches them; platforms and doors only when dies_on_touch
+TRIGGER_TYPES = (Collectible, Key, Spike, LevelExit)
+
+class SpatialHash:
+    # Uniform grid of buckets over sprite rects; z key (layer, insertion serial) per entry, query results in insertion order
+    def __init__(self, cell_size=EDITOR_INDEX_CELL_SIZE, track_dirty=True):
+        self.cell_size = cell_size
+        self.buckets = {} # {(cell_x, cell_y): set of sprites}
+        self.entries = {} # {sprite: (cells, z key)}
+        self.track_dirty = track_dirty # Off for indexes nothing caches on, e.g. moving enemies
+        self.dirty_cells = set() # Cells whose contents changed, for caches built on top of the index
+        self._next_serial = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, sprite):
+        return sprite in self.entries
+
+    def _cells(self, rect):
+        size = self.cell_size
+        x0, y0 = rect.left // size, rect.top // size
+        x1 = max(x0, (rect.right - 1) // size)
+        y1 = max(y0, (rect.bottom - 1) // size)
+        return tuple((cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1))
+
+    def _link(self, sprite, cells):
+        if self.track_dirty:
+            self.dirty_cells.update(cells)
+        for cell in cells:
+            bucket = self.buckets.get(cell)
+            if bucket is None:
+                bucket = self.buckets[cell] = set()
+            bucket.add(sprite)
+
+    def _unlink(self, sprite, cells):
+        if self.track_dirty:
+            self.dirty_cells.update(cells)
+        for cell in cells:
+            bucket = self.buckets[cell]
+            bucket.discard(sprite)
+            if not bucket:
+                del self.buckets[cell]
+
+    def insert(self, sprite, layer=0):
+        self.remove(sprite)
+        cells = self._cells(sprite.rect)
+        self._link(sprite, cells)
+        self.entries[sprite] = (cells, (layer, self._next_serial))
+        self._next_serial += 1
+
+    def remove(self, sprite):
+        entry = self.entries.pop(sprite, None)
+        if entry:
+            self._unlink(sprite, entry[0])
+
+    def update(self, sprite):
+        # Call after a sprite's rect moved or was resized; its z order is kept
+        entry = self.entries.get(sprite)
+        if entry is None:
+            return
+        old_cells = entry[0]
+        rect, size = sprite.rect, self.cell_size
+        x0, y0 = rect.left // size, rect.top // size
+        # Cells are ordered by column then row, so comparing the corners is enough (the per-tick case for moving enemies)
+        if old_cells[0] == (x0, y0) and old_cells[-1] == (max(x0, (rect.right - 1) // size), max(y0, (rect.bottom - 1) // size)):
+            if self.track_dirty:
+                self.dirty_cells.update(old_cells) # Same cells, but it may look different (resized, recolored)
+            return
+        cells = self._cells(rect)
+        self._unlink(sprite, old_cells)
+        self._link(sprite, cells)
+        self.entries[sprite] = (cells, entry[1])
+
+    def mark_dirty(self, sprites):
+        for sprite in sprites:
+            entry = self.entries.get(sprite)
+            if entry:
+                self.dirty_cells.update(entry[0])
+
+    def clear(self):
+        self.buckets.clear()
+        self.entries.clear()
+        self.dirty_cells.clear()
+
+    def serial(self, sprite):
+        return self.entries[sprite][1][1]
+
+    def _in_order(self, sprites):
+        # Buckets are sets hashed by id(), whose order changes between runs; callers get insertion order
+        if len(sprites) > 1:
+            sprites.sort(key=self.serial)
+        return sprites
+
+    def query_point(self, x, y):
+        bucket = self.buckets.get((x // self.cell_size, y // self.cell_size), ())
+        return self._in_order([sprite for sprite in bucket if sprite.rect.collidepoint(x, y)])
+
+    def query_rect(self, rect):
+        cells = self._cells(rect)
+        if len(cells) == 1: # Bullets and most small rects: one bucket, no de-duplication needed
+            return self._in_order([sprite for sprite in self.buckets.get(cells[0], ()) if sprite.rect.colliderect(rect)])
+        found = set()
+        if len(cells) > len(self.buckets): # Huge query over a sparse level: walk the occupied buckets instead
+            cells = set(cells)
+            for cell, bucket in self.buckets.items():
+                if cell in cells:
+                    found.update(bucket)
+        else:
+            for cell in cells:
+                found.update(self.buckets.get(cell, ()))
+        return self._in_order([sprite for sprite in found if sprite.rect.colliderect(rect)])
+
+    def sweep(self, rect, dx, dy):
+        # First sprite hit by rect moving by (dx, dy): (time 0..1, sprite, normal), or None; sprites already overlapped are ignored
+        best = None
+        for sprite in self.query_rect(rect.union(rect.move(dx, dy)).inflate(2, 2)): # Rect.move truncates floats
+            target = sprite.rect
+            if dx > 0:
+                x_entry, x_exit = (target.left - rect.right) / dx, (target.right - rect.left) / dx
+            elif dx < 0:
+                x_entry, x_exit = (target.right - rect.left) / dx, (target.left - rect.right) / dx
+            elif rect.right <= target.left or rect.left >= target.right:
+                continue
+            else:
+                x_entry, x_exit = -math.inf, math.inf
+            if dy > 0:
+                y_entry, y_exit = (target.top - rect.bottom) / dy, (target.bottom - rect.top) / dy
+            elif dy < 0:
+                y_entry, y_exit = (target.bottom - rect.top) / dy, (target.top - rect.bottom) / dy
+            elif rect.bottom <= target.top or rect.top >= target.bottom:
+                continue
+            else:
+                y_entry, y_exit = -math.inf, math.inf
+            entry = max(x_entry, y_entry)
+            if entry < 0 or entry > 1 or entry >= min(x_exit, y_exit):
+                continue
+            if best is None or entry < best[0]: # Candidates come in insertion order, so ties keep the first
+                # The axis that was entered last is the face that was hit
+                normal = (-1 if dx > 0 else 1, 0) if x_entry > y_entry else (0, -1 if dy > 0 else 1)
+                best = (entry, sprite, normal)
+        return best
+
+    @staticmethod
+    def _ray_entry(origin_x, origin_y, dir_x, dir_y, rect):
+        # Slab test: distance along a unit ray to where it enters rect (0 if it starts inside), or None
+        near, far = 0.0, math.inf
+        for origin, direction, low, high in ((origin_x, dir_x, rect.left, rect.right), (origin_y, dir_y, rect.top, rect.bottom)):
+            if direction == 0:
+                if not low <= origin < high:
+                    return None
+                continue
+            t1, t2 = (low - origin) / direction, (high - origin) / direction
+            near, far = max(near, min(t1, t2)), min(far, max(t1, t2))
+            if near > far:
+                return None
+        return near
+
+    def raycast(self, origin, direction, max_distance, accept=None, radius=0):
+        # First sprite along a ray, walking only the cells it crosses: (distance, sprite, hit point), or None; radius makes it a square
+        length = math.hypot(direction[0], direction[1])
+        if length == 0:
+            return None
+        origin_x, origin_y = origin
+        dir_x, dir_y = direction[0] / length, direction[1] / length
+        size = self.cell_size
+        cell_x, cell_y = int(origin_x // size), int(origin_y // size)
+        step_x, step_y = (1 if dir_x > 0 else -1), (1 if dir_y > 0 else -1)
+        # Ray distance to the next vertical/horizontal cell border, and between consecutive borders
+        next_x = ((cell_x + (dir_x > 0)) * size - origin_x) / dir_x if dir_x else math.inf
+        next_y = ((cell_y + (dir_y > 0)) * size - origin_y) / dir_y if dir_y else math.inf
+        delta_x = size / abs(dir_x) if dir_x else math.inf
+        delta_y = size / abs(dir_y) if dir_y else math.inf
+        # A thick ray also reaches sprites in the cells around the ones its center line crosses
+        reach = math.ceil(radius / size)
+        neighbours = [(nx, ny) for nx in range(-reach, reach + 1) for ny in range(-reach, reach + 1)]
+
+        best = None
+        tested = set() # Sprites spanning several cells are only tested once
+        travelled = 0.0
+        while travelled <= max_distance:
+            for nx, ny in neighbours:
+                for sprite in self.buckets.get((cell_x + nx, cell_y + ny), ()):
+                    if sprite in tested:
+                        continue
+                    tested.add(sprite)
+                    if accept is not None and not accept(sprite):
+                        continue
+                    distance = self._ray_entry(origin_x, origin_y, dir_x, dir_y, sprite.rect.inflate(2 * radius, 2 * radius))
+                    if distance is not None and distance <= max_distance and \
+                            (best is None or (distance, self.serial(sprite)) < (best[0], self.serial(best[1]))):
+                        best = (distance, sprite)
+            travelled = min(next_x, next_y)
+            if best and best[0] <= travelled:
+                break # Later cells only hold farther hits
+            if next_x < next_y:
+                cell_x += step_x
+                next_x += delta_x
+            else:
+                cell_y += step_y
+                next_y += delta_y
+        if best is None:
+            return None
+        distance, sprite = best
+        hit_x, hit_y = origin_x + dir_x * distance, origin_y + dir_y * distance
+        if radius:
+            hit_x = min(max(hit_x, sprite.rect.left), sprite.rect.right)
+            hit_y = min(max(hit_y, sprite.rect.top), sprite.rect.bottom)
+        return distance, sprite, (hit_x, hit_y)
+
+    def z_key(self, sprite):
+        return self.entries[sprite][1]
+
+    def topmost_at(self, x, y, accept=None):
+        hits = [sprite for sprite in self.query_point(x, y) if accept is None or accept(sprite)]
+        return max(hits, key=self.z_key, default=None)
+
+
+# --- Level File Watcher (hot reload) ---
+class LevelFileWatcher:
+    # Polls the levels folder's mtime/size signatures off the main thread; queues (filename, level_data), None data if deleted
+    def __init__(self, levels_dir="levels", interval=LEVEL_WATCH_INTERVAL):
+        self.levels_dir = levels_dir
+        self.interval = interval
+        self.changes = queue.Queue()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._signatures = self._scan() # {filename: (mtime_ns, size)}
+
+    def _scan(self):
+        signatures = {}
+        try:
+            entries = os.scandir(self.levels_dir)
+        except FileNotFoundError:
+            return signatures
+        with entries:
+            for entry in entries:
+                if entry.name.endswith('.json') and entry.is_file():
+                    stat = entry.stat()
+                    signatures[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="LevelFileWatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        with self._lock:
+            signatures = self._scan()
+            changed = [name for name, sig in signatures.items() if self._signatures.get(name) != sig]
+            removed = [name for name in self._signatures if name not in signatures]
+            self._signatures = signatures
+
+        for filename in sorted(changed):
+            try:
+                with open(os.path.join(self.levels_dir, filename), 'r') as f:
+                    level_data = json.load(f)
+                normalize_level_data(level_data) # Reject files that would break load_level_from_dict
+            except (OSError, json.JSONDecodeError) as e:
+                # Probably caught mid-write by the external editor; the next write will retry
+                print(f"Recarga en caliente: no se pudo leer '{filename}': {e}")
+                continue
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                print(f"Recarga en caliente: '{filename}' no sigue el formato de nivel: {e!r}")
+                continue
+            self.changes.put((filename, level_data))
+        for filename in removed:
+            self.changes.put((filename, None))
+
+    @contextlib.contextmanager
+    def record_own_write(self, filename):
+        # Wraps writes made by the game itself so they are not reported back as changes
+        with self._lock:
+            yield
+            try:
+                stat = os.stat(os.path.join(self.levels_dir, filename))
+                self._signatures[filename] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+
+
 # --- Game Class ---
 class Game:
-    def __init__(self):
-        pygame.init()
-        pygame.font.init()
-        self.screen = SCREEN
+    # Colors as class attributes (Metroid-like palette), so tools can read them without a Game
+    WHITE = (255, 255, 255)
+    BLACK = (0, 0, 0)
+    PLAYER_COLOR = (0, 180, 0)
+    CHASER_ENEMY_COLOR = (200, 50, 50)
+    PATROL_ENEMY_COLOR = (200, 120, 0)
+    BULLET_COLOR = (255, 215, 0) # Default bullet color (Gold)
+    GRID_COLOR = (40, 40, 40)
+    EDITOR_BACKGROUND_COLOR = (50, 50, 70)
+    BACKGROUND_COLOR = (20, 20, 30)
+    PLATFORM_COLOR = (80, 80, 90)
+    COLLECTIBLE_COLOR = (255, 215, 0)
+    EXIT_COLOR = (0, 150, 0)
+    SPIKE_COLOR = (120, 120, 120)
+    DEATH_COLOR = (255, 0, 0) # Border and cross of dies_on_touch blocks
+    AIM_CONE_COLOR = (255, 0, 0, 100)
+    LINK_HIGHLIGHT_COLOR = (255, 255, 0) # Yellow for linking
+    PURPLE_ARC_COLOR = (150, 0, 255, 100) # Purple with transparency for arc
+    PURPLE_HOOK_COLOR = (150, 0, 255) # Solid purple for hook line
+
+    def __init__(self, headless=False, game_clock=None, fast_start=False):
+        # headless=True: no window and no audio, for tools, benchmarks and simulation
+        self.headless = headless
+        # fast_start=True: build only what the menu needs; run() finishes the start-up after the first menu frame
+        self.startup_deferred = fast_start and not headless
+        self.startup = StartupTimer()
+        self.startup.mark("importar pygame y el juego")
+        # Every gameplay and editor timer reads this; pass a VirtualClock to step time explicitly
+        self.game_clock = game_clock or VirtualClock()
+        # Key and mouse state for gameplay and editor; a ReplayInput swaps in recorded input
+        self.input = LiveInput()
+        self.replay_recorder = None # ReplayRecorder while recording with start_recording()
+        self.replaying = False # True inside play_replay
+        self.frame_phases = FramePhases() # Per-phase frame timings, only measured while something shows or logs them
+        self.perf_overlay = PerformanceOverlay(self) # F3
+        self.metrics_sink = None # MetricsSink while logging with start_metrics()
+        self.profile_capture = None # ProfileCapture while F4 (or --perfilar) is capturing
+        self.memory_diagnostics = None # MemoryDiagnostics with --memoria
+        if headless or self.startup_deferred:
+            pygame.font.init() # open_display starts the video; audio waits (or never comes, headless)
+        else:
+            pygame.init()
+        self.startup.mark("pygame.init")
+        self.screen = open_display(headless)
+        self.startup.mark("ventana")
         self.clock = pygame.time.Clock()
-        self.sound_manager = SoundManager()
-
-        # Define colors as instance attributes (Metroid-like palette)
-        self.WHITE = (255, 255, 255)
-        self.BLACK = (0, 0, 0) 
-        self.PLAYER_COLOR = (0, 180, 0)
-        self.CHASER_ENEMY_COLOR = (200, 50, 50)
-        self.PATROL_ENEMY_COLOR = (200, 120, 0)
-        self.BULLET_COLOR = (255, 215, 0) # Default bullet color (Gold)
-        self.GRID_COLOR = (40, 40, 40)
-        self.BACKGROUND_COLOR = (20, 20, 30)
-        self.PLATFORM_COLOR = (80, 80, 90)
-        self.COLLECTIBLE_COLOR = (255, 215, 0)
-        self.EXIT_COLOR = (0, 150, 0)
-        self.SPIKE_COLOR = (120, 120, 120)
-        self.AIM_CONE_COLOR = (255, 0, 0, 100)
-        self.LINK_HIGHLIGHT_COLOR = (255, 255, 0) # Yellow for linking
-        self.PURPLE_ARC_COLOR = (150, 0, 255, 100) # Purple with transparency for arc
-        self.PURPLE_HOOK_COLOR = (150, 0, 255) # Solid purple for hook line
-
-        self.font_large = pygame.font.Font(None, 74)
-        self.font_medium = pygame.font.Font(None, 48)
-        self.font_small = pygame.font.Font(None, 36)
-        self.font_tiny = pygame.font.Font(None, 24)
-
+        self.sound_manager = SoundManager(enabled=not headless, deferred=True)
+        if not headless and not self.startup_deferred:
+            if self.sound_manager.open_mixer():
+                self.startup.mark("mezclador")
+                self.sound_manager.synthesize()
+                self.startup.mark(f"{len(SOUND_SPECS)} sonidos sintetizados")
 
         self.game_state = GAME_STATE_MENU
         self.score = 0
@@ -1454,6 +2577,16 @@ class Game:
         self.obstacles = pygame.sprite.Group()
         self.keys = pygame.sprite.Group() # New group for keys
         self.doors = pygame.sprite.Group() # New group for doors
+        self.editor_index = SpatialHash() # Level elements by position, for editor picking/deletion/hover
+        self.trigger_index = SpatialHash(track_dirty=False) # Pickups, keys, spikes, exit and deadly blocks; the per-frame touch check
+        self.solid_index = SpatialHash(track_dirty=False) # Platforms and closed doors, what the player collides with; doors leave it when opened
+        self.enemy_index = SpatialHash(track_dirty=False) # Enemies, re-bucketed as they move; broadphase for bullets, contact and explosions
+        self.shrapnel_pool = [] # Dead shrapnel Bullets, re-armed by the next explosion
+        self.keys_by_id = {} # {key_id: Key}
+        self.doors_by_id = {} # {door_id: Door}
+        self.doors_by_required_key = {} # {required_key_id: set of Doors}
+        self.sorted_key_ids = [] # Option lists for the property editor, rebuilt only when IDs change
+        self.sorted_door_ids = []
 
         # Default level dimensions (will be overwritten by loaded level data)
         # These are now conceptual boundaries for camera clamping, not hard player limits.
@@ -1467,18 +2600,13 @@ class Game:
         self.camera_offset_y = 0
 
         self.player_keys = {} # Dictionary to store collected keys: {key_id: True}
+        self.collected_pickups = set() # {(type, (x, y))} taken in this level, kept out of hot reloads
+        self.opened_door_ids = set() # Likewise for doors already opened
 
         self.editor_selected_tool = "platform" # Default tool for editor
         self.editor_tool_size = (100, 20) # Default size for horizontal platforms
         self.GRID_SIZE = 50 # Define grid size for snapping
 
-        # Initialize EditorPanel
-        self.editor_panel = EditorPanel(10, 10, 200, HEIGHT - 20, self) # Panel on left side
-
-        # For saving level input
-        self.filename_input_box = InputBox(WIDTH // 2 - 200, HEIGHT // 2 - 25, 400, 50, self.font_medium)
-        self.filename_input_box.set_placeholder("Nombre del nivel")
-
         # For editing properties
         self.property_input_boxes = {} # {property_name: InputBox_instance}
         self.editing_sprite = None # The sprite currently being edited
@@ -1487,13 +2615,22 @@ class Game:
 
         # Editor drag and drop variables
         self.editor_dragging = False
-        self.editor_dragged_sprite = None
+        self.editor_dragged_sprite = None # Sprite under the cursor when the drag started; snaps to the grid
+        self.editor_drag_group = [] # Everything moving with it (the whole selection)
+        self.editor_drag_start = None # Dragged sprite's topleft when the drag started
+        self.editor_drag_added = [] # Copies created by an Alt-drag, undone together with the move
         self.editor_drag_offset_x = 0
         self.editor_drag_offset_y = 0
         self.last_click_time_editor = 0 # For double click detection in editor
 
         # Editor selection and resizing variables
-        self.editor_selected_sprite = None # The sprite currently selected for rotation/resizing
+        self.editor_selected_sprite = None # The sprite currently selected for rotation/resizing (also resets editor_selection)
+        self.editor_hovered_sprite = None # Top-most element under the mouse, outlined in the editor
+        self.editor_box_select_start = None # Screen position where a Shift-drag selection box started
+        self.editor_box_select_end = None
+        self.editor_undo_stack = [] # [{"added", "removed", "moved", "delta"}], oldest first
+        self.editor_redo_stack = []
+        self.editor_saved_sprites = [] # Editor sprites while play-testing, to carry the undo history back
         self.resizing_platform = False
         self.resizing_edge = None # "left" or "right"
         self.initial_mouse_pos = None
@@ -1506,22 +2643,130 @@ class Game:
         self.editor_camera_offset_y = 0
         self.initial_editor_camera_offset_x = 0
         self.initial_editor_camera_offset_y = 0
+        self.editor_zoom = 1.0 # One of EDITOR_ZOOM_LEVELS; screen = world * zoom + camera offset
+        self.editor_chunk_cache = {} # {(chunk_x, chunk_y, zoom): downscaled Surface, or None if empty}
+        self.editor_grid_layer = None # Pre-rendered grid, one tile larger than the canvas; panned by blit offset
+        self.editor_grid_layer_key = None # (canvas size, GRID_SIZE, zoom) the layer was rendered for
 
 
         self.loaded_levels_from_files = [] # List to store level data loaded from files
+        self.using_default_levels = False # True when loaded_levels_from_files holds LEVEL_DATA fallbacks
+        self.current_level_filename = None # File of the level being played (for hot reload)
+        self.editor_level_filename = None # File the editor canvas was loaded from / saved to
         self.editor_saved_level_state = None # To store level data when testing from editor
 
         # For loading levels in editor
         self.available_levels_for_load = []
+        self.load_level_scroll = 0 # First row shown in the load menu
+        self.load_level_thumbnails = {} # {filename: Surface or None}, filled when the load menu opens
+        self.thumbnail_surface_cache = {} # {thumbnail path: Surface}, so each PNG is decoded once
         self.load_level_overlay_rect = pygame.Rect(WIDTH // 2 - 200, HEIGHT // 2 - 250, 400, 500)
 
 
-        self._load_levels_from_files() # Load levels from files at startup
+        self.needs_redraw = True # Idle screens are only redrawn after input or a state change
+        self.drawn_caret_phase = None # Caret blink phase on screen, so a blink only updates its own rect
+
+        # Watch the levels folder so externally edited files are picked up without a restart
+        self.level_watcher = LevelFileWatcher()
+        if not self.startup_deferred:
+            if not headless:
+                self._preload()
+            self._load_levels_from_files() # Load levels from files at startup
+            self.startup.mark("niveles")
+            if not headless: # Batch runs load their levels once; no thread to poll the folder
+                self.level_watcher.start()
+                self.startup.mark("vigilante de niveles")
+
+    def _preload(self):
+        # A full start builds up front what the cached properties would otherwise build on first use
+        for stage, names in (("4 fuentes", ("font_large", "font_medium", "font_small", "font_tiny")),
+                             ("panel del editor", ("editor_panel",))):
+            for name in names:
+                getattr(self, name) # The first access builds and stores it
+            self.startup.mark(stage)
+
+    def _finish_startup(self):
+        # The rest of a fast start, once the first menu frame is on screen and before any input is handled
+        if not self.loaded_levels_from_files: # start_recording may have needed them already
+            self._load_levels_from_files()
+            self.startup.mark("niveles")
+        self.level_watcher.start()
+        self.startup.mark("vigilante de niveles")
+        if self.sound_manager.open_mixer():
+            self.startup.mark("mezclador")
+            self.sound_manager.synthesize(background=True, on_done=lambda ms: self.startup.background_done(
+                f"{len(SOUND_SPECS)} sonidos (en segundo plano)", ms))
+            self.startup.mark("lanzar la síntesis de sonidos")
+        self.startup_deferred = False
+
+    # Built on first use; the menu never needs it
+    @functools.cached_property
+    def editor_panel(self):
+        return EditorPanel(10, 10, 200, HEIGHT - 20, self) # Panel on left side
+
+    # For saving level input; built when the save dialog first needs it, so its font is too
+    @functools.cached_property
+    def filename_input_box(self):
+        input_box = InputBox(WIDTH // 2 - 200, HEIGHT // 2 - 25, 400, 50, self.font_medium)
+        input_box.set_placeholder("Nombre del nivel")
+        return input_box
+
+    # Fonts are loaded on first use: a headless simulation that never draws text never pays for them
+    @functools.cached_property
+    def font_large(self):
+        return GameFont(None, 74)
+
+    @functools.cached_property
+    def font_medium(self):
+        return GameFont(None, 48)
+
+    @functools.cached_property
+    def font_small(self):
+        return GameFont(None, 36)
+
+    @functools.cached_property
+    def font_tiny(self):
+        return GameFont(None, 24)
+
+    def _refresh_load_level_menu(self):
+        self.available_levels_for_load = self._get_level_filenames_from_folder()
+        self.load_level_scroll = 0
+        self.load_level_thumbnails = {}
+        for filename in self.available_levels_for_load:
+            try:
+                thumbnail_path = level_thumbnail_path(os.path.join("levels", filename))
+            except OSError:
+                continue
+            if thumbnail_path not in self.thumbnail_surface_cache:
+                if not os.path.exists(thumbnail_path):
+                    continue # Not rendered yet; the row just shows the filename
+                try:
+                    self.thumbnail_surface_cache[thumbnail_path] = pygame.image.load(thumbnail_path)
+                except pygame.error as e:
+                    print(f"No se pudo cargar la miniatura de '{filename}': {e}")
+                    continue
+            self.load_level_thumbnails[filename] = self.thumbnail_surface_cache[thumbnail_path]
+
+    def _load_level_visible_rows(self):
+        # Between the title and the cancel button
+        return (self.load_level_overlay_rect.height - 100) // LOAD_LEVEL_ITEM_HEIGHT
+
+    def _scroll_load_level_menu(self, rows):
+        last_first_row = max(0, len(self.available_levels_for_load) - self._load_level_visible_rows())
+        self.load_level_scroll = max(0, min(self.load_level_scroll + rows, last_first_row))
+
+    def _load_level_item_rects(self):
+        item_y = self.load_level_overlay_rect.y + 50
+        visible = self.available_levels_for_load[self.load_level_scroll:self.load_level_scroll + self._load_level_visible_rows()]
+        for filename in visible:
+            yield filename, pygame.Rect(self.load_level_overlay_rect.x + 10, item_y, self.load_level_overlay_rect.width - 30, LOAD_LEVEL_ITEM_HEIGHT - 5)
+            item_y += LOAD_LEVEL_ITEM_HEIGHT
 
     def _get_level_filenames_from_folder(self):
         levels_dir = "levels"
         if not os.path.exists(levels_dir):
-            os.makedirs(levels_dir)
+            if not self.headless: # Tools and benchmarks must not leave a folder behind in the cwd
+                os.makedirs(levels_dir)
             return []
         
         json_files = [f for f in os.listdir(levels_dir) if f.endswith('.json')]
@@ -1530,10 +2775,12 @@ class Game:
 
     def _load_levels_from_files(self):
         self.loaded_levels_from_files = []
+        self.using_default_levels = True
         levels_dir = "levels"
         if not os.path.exists(levels_dir):
-            os.makedirs(levels_dir) # Create directory if it doesn't exist
-            print(f"Carpeta '{levels_dir}' creada.")
+            if not self.headless: # Tools and benchmarks must not leave a folder behind in the cwd
+                os.makedirs(levels_dir) # Create directory if it doesn't exist
+                print(f"Carpeta '{levels_dir}' creada.")
             # If no folder, no files, so use default data directly
             for i, data in enumerate(LEVEL_DATA):
                 self.loaded_levels_from_files.append({"filename": f"default_level_{i+1}.json", "data": data})
@@ -1548,6 +2795,7 @@ class Game:
                 self.loaded_levels_from_files.append({"filename": f"default_level_{i+1}.json", "data": data})
             return
 
+        self.using_default_levels = False
         for filename in json_files:
             file_path = os.path.join(levels_dir, filename)
             try:
@@ -1562,6 +2810,7 @@ class Game:
         
         if not self.loaded_levels_from_files:
             print("No se pudieron cargar niveles válidos desde la carpeta. Se usarán los niveles por defecto.")
+            self.using_default_levels = True
             for i, data in enumerate(LEVEL_DATA):
                 self.loaded_levels_from_files.append({"filename": f"default_level_{i+1}.json", "data": data})
 
@@ -1576,16 +2825,240 @@ class Game:
         self.obstacles.empty()
         self.keys.empty()
         self.doors.empty()
+        self.editor_index.clear()
+        self.trigger_index.clear()
+        self.solid_index.clear()
+        self.enemy_index.clear()
+        self.editor_chunk_cache.clear()
+        self.keys_by_id.clear()
+        self.doors_by_id.clear()
+        self.doors_by_required_key.clear()
+        self.sorted_key_ids = []
+        self.sorted_door_ids = []
+        self.editor_hovered_sprite = None
+        self.editor_selected_sprite = None
         self.all_sprites.add(self.player) # Always keep player
+        if self.memory_diagnostics:
+            self.memory_diagnostics.after_clear(self)
+
+    @property
+    def editor_selected_sprite(self):
+        return self._editor_primary_sprite
+
+    @editor_selected_sprite.setter
+    def editor_selected_sprite(self, sprite):
+        # Selecting a single sprite replaces the whole multi-selection
+        self._editor_primary_sprite = sprite
+        self.editor_selection = {sprite} if sprite else set()
+
+    def _set_editor_selection(self, sprites, primary=None):
+        self.editor_selection = set(sprites)
+        if primary is None and len(self.editor_selection) == 1:
+            primary = next(iter(self.editor_selection))
+        self._editor_primary_sprite = primary
+
+    def _add_level_sprite(self, sprite):
+        # all_sprites + its type group + the editor index
+        self.all_sprites.add(sprite)
+        group_name = LEVEL_SPRITE_GROUPS[type(sprite)]
+        getattr(self, group_name).add(sprite)
+        self.editor_index.insert(sprite, EDITOR_PICK_LAYERS.index(group_name))
+        if self._is_trigger(sprite):
+            self.trigger_index.insert(sprite)
+        if isinstance(sprite, (Platform, Door)):
+            self.solid_index.insert(sprite)
+        elif group_name == "enemies":
+            self.enemy_index.insert(sprite)
+        self._register_linked_ids(sprite)
+
+    def _remove_level_sprite(self, sprite):
+        sprite.kill()
+        self.editor_index.remove(sprite)
+        self.trigger_index.remove(sprite)
+        self.solid_index.remove(sprite)
+        self.enemy_index.remove(sprite)
+        self._unregister_linked_ids(sprite)
+        self.editor_selection.discard(sprite)
+        if self._editor_primary_sprite == sprite:
+            self._editor_primary_sprite = None
+        if self.editor_hovered_sprite == sprite:
+            self.editor_hovered_sprite = None
+
+    def _reindex_level_sprite(self, sprite):
+        # Call after a sprite moved, was resized or had its properties edited
+        self.editor_index.update(sprite)
+        self.solid_index.update(sprite)
+        self.enemy_index.update(sprite)
+        if self._is_trigger(sprite):
+            self.trigger_index.insert(sprite) # Also (re)adds blocks whose dies_on_touch was just switched on
+        else:
+            self.trigger_index.remove(sprite)
+
+    @staticmethod
+    def _is_trigger(sprite):
+        return isinstance(sprite, TRIGGER_TYPES) or getattr(sprite, "dies_on_touch", False)
+
+    def _register_linked_ids(self, sprite):
+        # Keys and doors by ID, and doors by the key they need; other sprites are ignored
+        if isinstance(sprite, Key):
+            self.keys_by_id[sprite.key_id] = sprite
+            self.sorted_key_ids = sorted(self.keys_by_id)
+        elif isinstance(sprite, Door):
+            self.doors_by_id[sprite.door_id] = sprite
+            self.sorted_door_ids = sorted(self.doors_by_id)
+            if sprite.required_key_id:
+                self.doors_by_required_key.setdefault(sprite.required_key_id, set()).add(sprite)
+
+    def _unregister_linked_ids(self, sprite):
+        # IDs are not guaranteed unique: if another sprite shares the ID it takes over the entry
+        if isinstance(sprite, Key):
+            if self.keys_by_id.get(sprite.key_id) is sprite:
+                del self.keys_by_id[sprite.key_id]
+                twin = next((k for k in self.keys if k.key_id == sprite.key_id and k is not sprite), None)
+                if twin:
+                    self.keys_by_id[twin.key_id] = twin
+                self.sorted_key_ids = sorted(self.keys_by_id)
+        elif isinstance(sprite, Door):
+            if self.doors_by_id.get(sprite.door_id) is sprite:
+                del self.doors_by_id[sprite.door_id]
+                twin = next((d for d in self.doors if d.door_id == sprite.door_id and d is not sprite), None)
+                if twin:
+                    self.doors_by_id[twin.door_id] = twin
+                self.sorted_door_ids = sorted(self.doors_by_id)
+            linked_doors = self.doors_by_required_key.get(sprite.required_key_id)
+            if linked_doors:
+                linked_doors.discard(sprite)
+                if not linked_doors:
+                    del self.doors_by_required_key[sprite.required_key_id]
+
+    def _clone_level_sprite(self, sprite):
+        # Same element at the same place; keys and doors get fresh IDs. The level exit is unique, so None
+        if isinstance(sprite, Platform):
+            return Platform(sprite.rect.x, sprite.rect.y, sprite.rect.width, sprite.rect.height, sprite.platform_color, sprite.orientation, sprite.dies_on_touch, sprite.is_hookable)
+        elif isinstance(sprite, ChaserEnemy):
+            new_sprite = ChaserEnemy(sprite.rect.centerx, sprite.rect.centery, self.CHASER_ENEMY_COLOR)
+            if hasattr(sprite, 'detection_range'):
+                new_sprite.detection_range = sprite.detection_range
+            return new_sprite
+        elif isinstance(sprite, PatrolEnemy):
+            return PatrolEnemy(sprite.rect.centerx, sprite.rect.centery, self.PATROL_ENEMY_COLOR, sprite.patrol_range)
+        elif isinstance(sprite, Collectible):
+            return Collectible(sprite.rect.centerx, sprite.rect.centery, sprite.type, self)
+        elif isinstance(sprite, Spike):
+            return Spike(sprite.rect.x, sprite.rect.y, self.SPIKE_COLOR, sprite.instant_kill)
+        elif isinstance(sprite, Key):
+            return Key(sprite.rect.centerx, sprite.rect.centery, f"key_{random.randint(1000,9999)}", sprite.key_color)
+        elif isinstance(sprite, Door):
+            return Door(sprite.rect.x, sprite.rect.y, sprite.width, sprite.height, f"door_{random.randint(1000,9999)}", sprite.door_color, sprite.required_key_id, sprite.required_weapon_type, sprite.dies_on_touch, sprite.is_hookable)
+        return None
 
-    def load_level_from_dict(self, level_data):
-        self._clear_all_sprites()
+    def _translate_level_sprites(self, sprites, dx, dy):
+        for sprite in sprites:
+            sprite.rect.move_ip(dx, dy)
+            self._reindex_level_sprite(sprite)
 
-        # Set level dimensions from data, or default to screen size if not specified
-        # These are now for camera clamping, not hard player limits.
-        self.level_width = level_data.get("level_width", WIDTH * 2) # Default to 2x screen size
-        self.level_height = level_data.get("level_height", HEIGHT * 2) # Default to 2x screen size
+    def _push_editor_action(self, added=(), removed=(), moved=(), delta=(0, 0)):
+        # One entry per user action, however many sprites it touched
+        self.editor_undo_stack.append({"added": list(added), "removed": list(removed), "moved": list(moved), "delta": delta})
+        del self.editor_undo_stack[:-EDITOR_UNDO_LIMIT]
+        self.editor_redo_stack.clear()
+
+    def _undo_editor_action(self):
+        if not self.editor_undo_stack:
+            print("No hay nada que deshacer.")
+            return
+        action = self.editor_undo_stack.pop()
+        dx, dy = action["delta"]
+        self._translate_level_sprites(action["moved"], -dx, -dy)
+        for sprite in action["added"]:
+            self._remove_level_sprite(sprite)
+        for sprite in action["removed"]:
+            self._add_level_sprite(sprite)
+        self._set_editor_selection(action["removed"] + [s for s in action["moved"] if s.alive()])
+        self.editor_redo_stack.append(action)
+        print(f"Deshecho ({len(set(action['added']) | set(action['removed']) | set(action['moved']))} elementos).")
+
+    def _redo_editor_action(self):
+        if not self.editor_redo_stack:
+            print("No hay nada que rehacer.")
+            return
+        action = self.editor_redo_stack.pop()
+        dx, dy = action["delta"]
+        for sprite in action["removed"]:
+            self._remove_level_sprite(sprite)
+        for sprite in action["added"]:
+            self._add_level_sprite(sprite)
+        self._translate_level_sprites(action["moved"], dx, dy)
+        self._set_editor_selection(action["added"] + action["moved"])
+        self.editor_undo_stack.append(action)
+        print(f"Rehecho ({len(set(action['added']) | set(action['removed']) | set(action['moved']))} elementos).")
+
+    def _delete_editor_selection(self):
+        removed = [sprite for sprite in self.editor_selection if sprite.alive()]
+        for sprite in removed:
+            self._remove_level_sprite(sprite)
+        if removed:
+            self._push_editor_action(removed=removed)
+            print(f"{len(removed)} elementos eliminados.")
+
+    def _finish_editor_drag(self):
+        # Re-bucket the moved sprites once, on drop, and record the whole drag as one action
+        anchor = self.editor_dragged_sprite
+        dx, dy = anchor.rect.x - self.editor_drag_start[0], anchor.rect.y - self.editor_drag_start[1]
+        for sprite in self.editor_drag_group:
+            self._reindex_level_sprite(sprite)
+        if dx or dy or self.editor_drag_added:
+            self._push_editor_action(added=self.editor_drag_added, moved=self.editor_drag_group if (dx or dy) else (), delta=(dx, dy))
+        self.editor_drag_group = []
+        self.editor_drag_added = []
+        self.editor_drag_start = None
+
+    def _finish_editor_box_select(self):
+        start_x, start_y = self.editor_box_select_start
+        end_x, end_y = self.editor_box_select_end
+        left, top = self._editor_screen_to_world(min(start_x, end_x), min(start_y, end_y))
+        right, bottom = self._editor_screen_to_world(max(start_x, end_x), max(start_y, end_y))
+        box = pygame.Rect(left, top, right - left + 1, bottom - top + 1)
+        self._set_editor_selection(self.editor_index.query_rect(box))
+        self.editor_box_select_start = None
+        self.editor_box_select_end = None
+        print(f"{len(self.editor_selection)} elementos seleccionados.")
+
+    def _editor_sprite_at(self, mouse_x, mouse_y):
+        # Top-most level element under a screen position, ignoring anything behind the panel
+        panel_right_world = self._editor_screen_to_world(self.editor_panel.rect.right, 0)[0]
+        world_x, world_y = self._editor_screen_to_world(mouse_x, mouse_y)
+        return self.editor_index.topmost_at(world_x, world_y, lambda sprite: sprite.rect.x >= panel_right_world)
+
+    def _editor_screen_to_world(self, x, y):
+        return (int((x - self.editor_camera_offset_x) // self.editor_zoom), int((y - self.editor_camera_offset_y) // self.editor_zoom))
+
+    def _editor_world_to_screen_rect(self, rect):
+        if self.editor_zoom == 1.0:
+            return rect.move(self.editor_camera_offset_x, self.editor_camera_offset_y)
+        zoom = self.editor_zoom
+        return pygame.Rect(round(rect.x * zoom + self.editor_camera_offset_x), round(rect.y * zoom + self.editor_camera_offset_y),
+                           max(1, round(rect.width * zoom)), max(1, round(rect.height * zoom)))
+
+    def _step_editor_zoom(self, steps, anchor):
+        # Positive steps zoom out. The world point under `anchor` (screen position) stays put
+        level = min(max(EDITOR_ZOOM_LEVELS.index(self.editor_zoom) + steps, 0), len(EDITOR_ZOOM_LEVELS) - 1)
+        zoom = EDITOR_ZOOM_LEVELS[level]
+        if zoom == self.editor_zoom:
+            return
+        world_x = (anchor[0] - self.editor_camera_offset_x) / self.editor_zoom
+        world_y = (anchor[1] - self.editor_camera_offset_y) / self.editor_zoom
+        self.editor_zoom = zoom
+        self.editor_camera_offset_x = round(anchor[0] - world_x * zoom)
+        self.editor_camera_offset_y = round(anchor[1] - world_y * zoom)
+        print(f"Zoom del editor: {int(zoom * 100)}%")
+
+    def _reset_editor_camera(self):
+        self.editor_camera_offset_x = 0
+        self.editor_camera_offset_y = 0
+        self.editor_zoom = 1.0
 
+    def _reset_player_for_level(self, level_data):
         self.player.rect.center = level_data["player_start"]
         self.player.velocity_y = 0
         self.player.on_ground = False
@@ -1603,7 +3076,7 @@ class Game:
         self.player.has_weapon_powerup = {"blue": False, "red": False, "purple": False}
 
         self.player.invulnerable = True
-        self.player.invulnerable_timer = pygame.time.get_ticks()
+        self.player.invulnerable_timer = self.game_clock.get_ticks()
         self.player._draw_player_image() 
         self.player.is_dashing = False
 
@@ -1625,64 +3098,68 @@ class Game:
         self.player.grapple_target_pos = None
 
         self.player_keys = {} # Clear collected keys for new level
+        self.collected_pickups.clear()
+        self.opened_door_ids.clear()
+
+    def load_level_from_dict(self, level_data, reset_player=True):
+        level_data = normalize_level_data(level_data) # Fills optional fields, raises on malformed data
+        if self.memory_diagnostics:
+            self.memory_diagnostics.before_load()
+        self._clear_all_sprites()
+
+        # Set level dimensions from data, or default to screen size if not specified
+        # These are now for camera clamping, not hard player limits.
+        self.level_width = level_data["level_width"]
+        self.level_height = level_data["level_height"]
+
+        # reset_player=False rebuilds the level around the current session (hot reload while playing)
+        if reset_player:
+            self._reset_player_for_level(level_data)
 
         for p_data in level_data["platforms"]:
-            # Ensure orientation, dies_on_touch, is_hookable are passed when loading from file
-            platform = Platform(p_data[0], p_data[1], p_data[2], p_data[3], self.PLATFORM_COLOR,
-                                p_data[4] if len(p_data) > 4 else "horizontal",
-                                p_data[5] if len(p_data) > 5 else False, # dies_on_touch
-                                p_data[6] if len(p_data) > 6 else False) # is_hookable
-            self.all_sprites.add(platform)
-            self.platforms.add(platform)
+            platform = Platform(p_data[0], p_data[1], p_data[2], p_data[3], self.PLATFORM_COLOR, p_data[4], p_data[5], p_data[6])
+            self._add_level_sprite(platform)
         
         for e_data in level_data["enemies"]:
             if e_data["type"] == "chaser":
                 enemy = ChaserEnemy(e_data["pos"][0], e_data["pos"][1], self.CHASER_ENEMY_COLOR)
             elif e_data["type"] == "patrol":
-                enemy = PatrolEnemy(e_data["pos"][0], e_data["pos"][1], self.PATROL_ENEMY_COLOR, e_data.get("range", 100))
-            self.all_sprites.add(enemy)
-            self.enemies.add(enemy)
+                enemy = PatrolEnemy(e_data["pos"][0], e_data["pos"][1], self.PATROL_ENEMY_COLOR, e_data["range"])
+            self._add_level_sprite(enemy)
 
         for c_data in level_data["collectibles"]:
+            if not reset_player and (c_data["type"], tuple(c_data["pos"][:2])) in self.collected_pickups:
+                continue # Already picked up in this session
             collectible = Collectible(c_data["pos"][0], c_data["pos"][1], c_data["type"], self)
-            self.all_sprites.add(collectible)
-            self.collectibles.add(collectible)
-
-        if "obstacles" in level_data:
-            for o_data in level_data["obstacles"]:
-                if o_data["type"] == "spike":
-                    # Spikes now take their topleft directly, and instant_kill property
-                    spike = Spike(o_data["pos"][0], o_data["pos"][1], self.SPIKE_COLOR, o_data.get("instant_kill", False))
-                    self.all_sprites.add(spike)
-                    self.obstacles.add(spike)
+            self._add_level_sprite(collectible)
+
+        for o_data in level_data["obstacles"]:
+            # Spikes take their topleft directly, and instant_kill property
+            spike = Spike(o_data["pos"][0], o_data["pos"][1], self.SPIKE_COLOR, o_data["instant_kill"])
+            self._add_level_sprite(spike)
         
-        if "keys" in level_data:
-            for k_data in level_data["keys"]:
-                key = Key(k_data["pos"][0], k_data["pos"][1], k_data["id"], tuple(k_data["color"])) # Convert list to tuple for color
-                self.all_sprites.add(key)
-                self.keys.add(key)
+        for k_data in level_data["keys"]:
+            if not reset_player and k_data["id"] in self.player_keys:
+                continue # Already picked up in this session
+            key = Key(k_data["pos"][0], k_data["pos"][1], k_data["id"], k_data["color"])
+            self._add_level_sprite(key)
         
-        if "doors" in level_data:
-            for d_data in level_data["doors"]:
-                door_color_val = d_data.get("color")
-                if isinstance(door_color_val, list):
-                    door_color_val = tuple(door_color_val)
-                elif not isinstance(door_color_val, tuple):
-                    door_color_val = (100, 100, 100) # Default if format is wrong
-
-                door = Door(d_data.get("pos")[0], d_data.get("pos")[1], d_data.get("pos")[2], d_data.get("pos")[3], 
-                            d_data.get("id"), door_color_val, d_data.get("required_key_id"), d_data.get("required_weapon_type"),
-                            d_data.get("dies_on_touch", False), d_data.get("is_hookable", False)) # New properties
-                self.all_sprites.add(door)
-                self.doors.add(door)
+        for d_data in level_data["doors"]:
+            if not reset_player and d_data["id"] in self.opened_door_ids:
+                continue # Already opened in this session
+            x, y, width, height = d_data["pos"]
+            door = Door(x, y, width, height, d_data["id"], d_data["color"], d_data["required_key_id"], d_data["required_weapon_type"],
+                        d_data["dies_on_touch"], d_data["is_hookable"])
+            self._add_level_sprite(door)
 
         exit_data = level_data["exit"]
         if exit_data: # Ensure exit_data is not None
             exit_obj = LevelExit(exit_data[0], exit_data[1], exit_data[2], exit_data[3], self.EXIT_COLOR)
-            self.all_sprites.add(exit_obj)
-            self.level_exit.add(exit_obj)
+            self._add_level_sprite(exit_obj)
 
         print(f"Nivel cargado desde diccionario.")
+        if self.memory_diagnostics:
+            self.memory_diagnostics.after_load()
         return True
 
     def load_level_from_file_by_name(self, filename):
@@ -1692,7 +3169,9 @@ class Game:
             with open(file_path, 'r') as f:
                 level_data = json.load(f)
                 self.load_level_from_dict(level_data)
+                self._clear_editor_history()
                 self.game_state = GAME_STATE_EDITOR # Return to editor after loading
+                self.editor_level_filename = filename
                 print(f"Nivel '{filename}' cargado para edición.")
         except json.JSONDecodeError as e:
             print(f"Error al decodificar JSON en '{filename}': {e}")
@@ -1717,50 +3196,155 @@ class Game:
         for s in self.all_sprites:
             if s == self.player:
                 continue # Player position handled separately
-            if isinstance(s, Platform):
-                current_level_data["platforms"].append((s.rect.x, s.rect.y, s.rect.width, s.rect.height, s.orientation, s.dies_on_touch, s.is_hookable))
-            elif isinstance(s, ChaserEnemy):
-                current_level_data["enemies"].append({"type": "chaser", "pos": (s.rect.centerx, s.rect.centery), "detection_range": s.detection_range})
-            elif isinstance(s, PatrolEnemy):
-                current_level_data["enemies"].append({"type": "patrol", "pos": (s.rect.centerx, s.rect.centery), "range": s.patrol_range})
-            elif isinstance(s, Collectible):
-                current_level_data["collectibles"].append({"type": s.type, "pos": (s.rect.centerx, s.rect.centery)})
-            elif isinstance(s, Spike):
-                current_level_data["obstacles"].append({"type": "spike", "pos": (s.rect.x, s.rect.y), "instant_kill": s.instant_kill})
-            elif isinstance(s, Key):
-                current_level_data["keys"].append({"id": s.key_id, "pos": (s.rect.centerx, s.rect.centery), "color": s.key_color})
-            elif isinstance(s, Door):
-                door_data = {"id": s.door_id, "pos": (s.rect.x, s.rect.y, s.rect.width, s.rect.height), "color": s.door_color}
-                if s.required_key_id:
-                    door_data["required_key_id"] = s.required_key_id
-                if s.required_weapon_type:
-                    door_data["required_weapon_type"] = s.required_weapon_type
-                door_data["dies_on_touch"] = s.dies_on_touch
-                door_data["is_hookable"] = s.is_hookable
-                current_level_data["doors"].append(door_data)
-            elif isinstance(s, LevelExit):
-                current_level_data["exit"] = (s.rect.x, s.rect.y, s.rect.width, s.rect.height)
+            entry = self._level_sprite_entry(s)
+            if entry is None:
+                continue
+            list_name, data = entry
+            if list_name == "exit":
+                current_level_data["exit"] = data
+            else:
+                current_level_data[list_name].append(data)
         return current_level_data
 
+    @staticmethod
+    def _level_sprite_entry(s):
+        # (LEVEL_DATA list, data) for one level element, as it is saved; None for bullets and the like
+        if isinstance(s, Platform):
+            return "platforms", (s.rect.x, s.rect.y, s.rect.width, s.rect.height, s.orientation, s.dies_on_touch, s.is_hookable)
+        elif isinstance(s, ChaserEnemy):
+            return "enemies", {"type": "chaser", "pos": (s.rect.centerx, s.rect.centery), "detection_range": s.detection_range}
+        elif isinstance(s, PatrolEnemy):
+            return "enemies", {"type": "patrol", "pos": (s.rect.centerx, s.rect.centery), "range": s.patrol_range}
+        elif isinstance(s, Collectible):
+            return "collectibles", {"type": s.type, "pos": (s.rect.centerx, s.rect.centery)}
+        elif isinstance(s, Spike):
+            return "obstacles", {"type": "spike", "pos": (s.rect.x, s.rect.y), "instant_kill": s.instant_kill}
+        elif isinstance(s, Key):
+            return "keys", {"id": s.key_id, "pos": (s.rect.centerx, s.rect.centery), "color": s.key_color}
+        elif isinstance(s, Door):
+            door_data = {"id": s.door_id, "pos": (s.rect.x, s.rect.y, s.rect.width, s.rect.height), "color": s.door_color}
+            if s.required_key_id:
+                door_data["required_key_id"] = s.required_key_id
+            if s.required_weapon_type:
+                door_data["required_weapon_type"] = s.required_weapon_type
+            door_data["dies_on_touch"] = s.dies_on_touch
+            door_data["is_hookable"] = s.is_hookable
+            return "doors", door_data
+        elif isinstance(s, LevelExit):
+            return "exit", (s.rect.x, s.rect.y, s.rect.width, s.rect.height)
+        return None
+
+    def _level_sprites(self):
+        return [sprite for sprite in self.all_sprites if sprite is not self.player and not isinstance(sprite, Bullet)]
+
+    def _clear_editor_history(self):
+        # Only when the editor switches to a different level; rebuilding the same one keeps it (_remap_editor_history)
+        self.editor_undo_stack.clear()
+        self.editor_redo_stack.clear()
+
+    def _remap_editor_history(self, old_sprites):
+        # Point the undo history at the sprites that replaced old_sprites when the level was rebuilt from data;
+        # matched by saved data, redo dropped, undo kept back to the first action touching an unmatched element
+        new_sprites = collections.defaultdict(collections.deque)
+        for sprite in self._level_sprites():
+            new_sprites[json.dumps(self._level_sprite_entry(sprite))].append(sprite)
+        mapping = {}
+        for sprite in old_sprites:
+            matches = new_sprites.get(json.dumps(self._level_sprite_entry(sprite)))
+            if matches:
+                mapping[sprite] = matches.popleft()
+
+        old_sprites = set(old_sprites)
+        kept = []
+        for action in reversed(self.editor_undo_stack):
+            # added and moved sprites were in the level; removed ones are detached and come back as they are
+            in_level = [sprite for sprite in action["added"] + action["moved"] if sprite in old_sprites]
+            if any(sprite not in mapping for sprite in in_level):
+                break
+            kept.append({key: [mapping.get(sprite, sprite) for sprite in value] if key != "delta" else value for key, value in action.items()})
+        self.editor_undo_stack[:] = reversed(kept)
+        self.editor_redo_stack.clear()
+
     def _save_current_editor_state(self):
         self.editor_saved_level_state = self._get_current_editor_level_data()
+        self.editor_saved_sprites = self._level_sprites() # The undo history refers to these
         print("Estado actual del editor guardado para prueba.")
 
     def _restore_editor_state(self):
         if self.editor_saved_level_state:
             self.load_level_from_dict(self.editor_saved_level_state)
+            self._remap_editor_history(self.editor_saved_sprites)
+            self.editor_saved_sprites = []
             self.editor_saved_level_state = None # Clear saved state after restoring
             self.game_state = GAME_STATE_EDITOR
             self.editor_selected_sprite = None # Clear selection
             # Reset editor camera offset when restoring state
-            self.editor_camera_offset_x = 0
-            self.editor_camera_offset_y = 0
+            self._reset_editor_camera()
             print("Estado del editor restaurado.")
         else:
             print("No hay estado de editor guardado para restaurar.")
             self.game_state = GAME_STATE_EDITOR # Just go back to empty editor if no state
 
 
+    def _apply_level_file_changes(self):
+        # Drain what the watcher thread found; parsing already happened off the main thread
+        while True:
+            try:
+                filename, level_data = self.level_watcher.changes.get_nowait()
+            except queue.Empty:
+                return
+
+            self.needs_redraw = True
+            if level_data is None:
+                self.loaded_levels_from_files = [entry for entry in self.loaded_levels_from_files if entry["filename"] != filename]
+                self._sync_current_level_idx()
+                print(f"Recarga en caliente: '{filename}' eliminado.")
+                continue
+
+            if self.using_default_levels:
+                self.loaded_levels_from_files = [] # First real file replaces the fallback levels
+                self.using_default_levels = False
+            for entry in self.loaded_levels_from_files:
+                if entry["filename"] == filename:
+                    entry["data"] = level_data
+                    break
+            else:
+                self.loaded_levels_from_files.append({"filename": filename, "data": level_data})
+                self.loaded_levels_from_files.sort(key=lambda entry: entry["filename"])
+            self._sync_current_level_idx()
+            print(f"Recarga en caliente: '{filename}' actualizado.")
+
+            if self.game_state == GAME_STATE_PLAYING and filename == self.current_level_filename:
+                # Keep position, health, weapons and score; keys, pickups and doors already taken stay gone
+                self.load_level_from_dict(level_data, reset_player=False)
+                print(f"Nivel en juego '{filename}' actualizado sin reiniciar la partida.")
+            elif self.game_state == GAME_STATE_EDITOR and filename == self.editor_level_filename:
+                # Camera, selected tool and undo history are kept; other sprite references are not valid any more
+                old_sprites = self._level_sprites()
+                self.load_level_from_dict(level_data)
+                self._remap_editor_history(old_sprites)
+                self.editor_selected_sprite = None
+                self.editor_dragging = False
+                self.editor_dragged_sprite = None
+                self.editor_drag_group = []
+                self.editor_drag_added = []
+                self.editor_box_select_start = None
+                self.resizing_platform = False
+                print(f"Nivel en edición '{filename}' actualizado.")
+
+    def _sync_current_level_idx(self):
+        # Files added or deleted shift the sorted list; the index must follow the level being played
+        filenames = [entry["filename"] for entry in self.loaded_levels_from_files]
+        if self.current_level_filename in filenames:
+            self.current_level_idx = filenames.index(self.current_level_filename)
+        elif self.current_level_filename is not None: # Its file is gone: the next level is the one after where it was
+            self.current_level_idx = sum(1 for name in filenames if name < self.current_level_filename) - 1
+
+    def _start_level(self, level_idx):
+        self.current_level_idx = level_idx
+        self.current_level_filename = self.loaded_levels_from_files[level_idx]["filename"]
+        self.load_level_from_dict(self.loaded_levels_from_files[level_idx]["data"])
+
     def save_level_to_file(self, filename):
         # Create 'levels' directory if it doesn't exist
         levels_dir = "levels"
@@ -1772,16 +3356,45 @@ class Game:
         current_level_data_for_save = self._get_current_editor_level_data()
 
         try:
-            with open(file_path, 'w') as f:
-                json.dump(current_level_data_for_save, f, indent=4)
+            with self.level_watcher.record_own_write(f"{filename}.json"):
+                with open(file_path, 'w') as f:
+                    json.dump(current_level_data_for_save, f, indent=4)
+            self.editor_level_filename = f"{filename}.json"
             print(f"Nivel guardado exitosamente en: {file_path}")
+            try:
+                write_level_thumbnail(current_level_data_for_save, level_thumbnail_path(file_path)) # The cached one is for the old content
+            except (OSError, pygame.error) as e:
+                print(f"No se pudo generar la miniatura de '{filename}': {e}")
             self._load_levels_from_files() # Reload levels after saving to update load menu
         except IOError as e:
             print(f"Error al guardar el nivel: {e}")
 
-    def handle_events(self):
+    def _wait_for_events(self):
+        # Idle screens block here instead of spinning at FPS; the timeout keeps hot reload and the caret going
+        first_event = pygame.event.wait(IDLE_WAIT_TIMEOUT)
+        if first_event.type == pygame.NOEVENT:
+            return []
+        return [first_event] + pygame.event.get()
+
+    def _visible_input_boxes(self):
+        if self.game_state == GAME_STATE_SAVING_LEVEL_INPUT:
+            return [self.filename_input_box]
+        if self.game_state == GAME_STATE_EDITING_PROPERTIES:
+            return list(self.property_input_boxes.values())
+        return []
+
+    def _update_input_carets(self):
+        # Nothing changed but maybe the caret blink: push just the caret rects to the display
+        boxes = self._visible_input_boxes()
+        caret_phase = tuple(box.caret_visible() for box in boxes)
+        if caret_phase == self.drawn_caret_phase:
+            return
+        self.drawn_caret_phase = caret_phase
+        pygame.display.update([box.draw_caret(self.screen, self.BACKGROUND_COLOR) for box in boxes if box.active])
+
+    def handle_events(self, events=None):
         global WIDTH, HEIGHT, SCREEN # Declare global to modify
-        for event in pygame.event.get():
+        for event in (pygame.event.get() if events is None else events):
             if event.type == pygame.QUIT:
                 return False
             
@@ -1823,7 +3436,7 @@ class Game:
 
 
                 if event.type == pygame.MOUSEBUTTONDOWN:
-                    mouse_x, mouse_y = pygame.mouse.get_pos()
+                    mouse_x, mouse_y = self.input.get_mouse_pos()
                     target_x_world = mouse_x + self.camera_offset_x
                     target_y_world = mouse_y + self.camera_offset_y
                     
@@ -1856,7 +3469,7 @@ class Game:
                             self.player.start_charge(click_type="right") # Start special power-up charge
 
                 elif event.type == pygame.MOUSEBUTTONUP:
-                    mouse_x, mouse_y = pygame.mouse.get_pos()
+                    mouse_x, mouse_y = self.input.get_mouse_pos()
                     target_x_world = mouse_x + self.camera_offset_x
                     target_y_world = mouse_y + self.camera_offset_y
 
@@ -1943,38 +3556,22 @@ class Game:
                     if self.editor_panel.handle_click(event.pos):
                         return True # If click was on panel, don't process as map click
 
-                mouse_x, mouse_y = pygame.mouse.get_pos()
+                mouse_x, mouse_y = self.input.get_mouse_pos()
                 
-                # Adjust grid_x if it falls inside the panel
-                # These are screen coordinates, not world coordinates
-                if mouse_x < self.editor_panel.rect.right:
-                    grid_x_screen = self.editor_panel.rect.right
-                else:
-                    grid_x_screen = (mouse_x // self.GRID_SIZE) * self.GRID_SIZE
-                
-                grid_y_screen = (mouse_y // self.GRID_SIZE) * self.GRID_SIZE
-
-                # Convert screen coordinates to world coordinates for placement/interaction
-                grid_x_world = grid_x_screen - self.editor_camera_offset_x
-                grid_y_world = grid_y_screen - self.editor_camera_offset_y
+                # Convert screen coordinates to world coordinates (clamped to the right of the panel)
+                # and snap to the world grid, so placement lines up with the drawn grid at any zoom
+                world_x, world_y = self._editor_screen_to_world(max(mouse_x, self.editor_panel.rect.right), mouse_y)
+                grid_x_world = (world_x // self.GRID_SIZE) * self.GRID_SIZE
+                grid_y_world = (world_y // self.GRID_SIZE) * self.GRID_SIZE
 
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     # Double-click detection
-                    now = pygame.time.get_ticks()
+                    now = self.game_clock.get_ticks()
                     is_double_click = (now - self.last_click_time_editor < 300)
                     self.last_click_time_editor = now # Update last click time for next double-click check
 
-                    # Find if an existing sprite was clicked (outside the panel)
-                    clicked_sprite = None
-                    # Iterate through sprites in reverse order to click on top-most if overlapping
-                    for group in [self.level_exit, self.doors, self.keys, self.collectibles, self.obstacles, self.enemies, self.platforms]:
-                        for sprite in reversed(group.sprites()): # Iterate in reverse
-                            # Check collision with mouse position, adjusted by editor camera offset
-                            sprite_rect_screen = sprite.rect.move(self.editor_camera_offset_x, self.editor_camera_offset_y)
-                            if sprite_rect_screen.collidepoint(mouse_x, mouse_y) and sprite.rect.x >= self.editor_panel.rect.right - self.editor_camera_offset_x: # Ensure it's not in the panel area in world coords
-                                clicked_sprite = sprite
-                                break
-                        if clicked_sprite: break
+                    # Find if an existing sprite was clicked (outside the panel), top-most if overlapping
+                    clicked_sprite = self._editor_sprite_at(mouse_x, mouse_y)
                     
                     if event.button == 1: # Left click
                         if clicked_sprite and clicked_sprite != self.player: # Only editable sprites, not player
@@ -1989,10 +3586,10 @@ class Game:
 
                                 self.available_property_ids = {} # Clear for new context
                                 if isinstance(self.editing_sprite, Door):
-                                    self.available_property_ids["keys"] = sorted([k.key_id for k in self.keys])
+                                    self.available_property_ids["keys"] = self.sorted_key_ids
                                     self.available_property_ids["weapons"] = sorted(list(self.player.weapon_data.keys()))
                                 elif isinstance(self.editing_sprite, Key):
-                                    self.available_property_ids["doors"] = sorted([d.door_id for d in self.doors])
+                                    self.available_property_ids["doors"] = self.sorted_door_ids
 
                                 if properties:
                                     self.property_edit_message = f"Editar propiedades de {type(self.editing_sprite).__name__}:"
@@ -2008,7 +3605,7 @@ class Game:
                                             input_box.set_dropdown_options(["True", "False"])
                                         
                                         if prop_name == "required_key_id":
-                                            input_box.set_dropdown_options([""] + sorted([k.key_id for k in self.keys]))
+                                            input_box.set_dropdown_options([""] + self.sorted_key_ids)
                                         elif prop_name == "required_weapon_type":
                                             input_box.set_dropdown_options([""] + sorted(list(self.player.weapon_data.keys())))
 
@@ -2022,77 +3619,76 @@ class Game:
                                     self.editing_sprite = None
                                 return True # Event handled (double click)
                             else: # Single click on an existing sprite
-                                self.editor_selected_sprite = clicked_sprite # Select the clicked sprite
+                                keys_pressed = self.input.get_pressed()
+                                if keys_pressed[pygame.K_LSHIFT] or keys_pressed[pygame.K_RSHIFT]:
+                                    # Shift+click adds or removes the sprite from the selection
+                                    selection = set(self.editor_selection)
+                                    selection.symmetric_difference_update({clicked_sprite})
+                                    self._set_editor_selection(selection, clicked_sprite if clicked_sprite in selection else None)
+                                    return True
+
+                                if clicked_sprite in self.editor_selection:
+                                    self._editor_primary_sprite = clicked_sprite # Keep the group, drag it from here
+                                else:
+                                    self.editor_selected_sprite = clicked_sprite # Select the clicked sprite
                                 
-                                # Check for resizing handles (only for platforms)
-                                if isinstance(self.editor_selected_sprite, Platform) and self.editor_selected_sprite.orientation == "horizontal":
+                                # Check for resizing handles (only for a single platform)
+                                if len(self.editor_selection) == 1 and isinstance(self.editor_selected_sprite, Platform) and self.editor_selected_sprite.orientation == "horizontal":
                                     tolerance = 10
                                     # Adjust mouse_x to sprite's local coordinates for resize check
-                                    mouse_x_local = mouse_x - (self.editor_selected_sprite.rect.x + self.editor_camera_offset_x)
+                                    selected_screen_rect = self._editor_world_to_screen_rect(self.editor_selected_sprite.rect)
+                                    mouse_x_local = mouse_x - selected_screen_rect.x
                                     if abs(mouse_x_local - 0) < tolerance: # Left edge
                                         self.resizing_platform = True
                                         self.resizing_edge = "left"
                                         self.initial_mouse_pos = event.pos
                                         self.initial_platform_rect = self.editor_selected_sprite.rect.copy()
                                         return True
-                                    elif abs(mouse_x_local - self.editor_selected_sprite.rect.width) < tolerance: # Right edge
+                                    elif abs(mouse_x_local - selected_screen_rect.width) < tolerance: # Right edge
                                         self.resizing_platform = True
                                         self.resizing_edge = "right"
                                         self.initial_mouse_pos = event.pos
                                         self.initial_platform_rect = self.editor_selected_sprite.rect.copy()
                                         return True
 
-                                # If not resizing, start dragging or duplicate
-                                keys_pressed = pygame.key.get_pressed()
+                                # If not resizing, start dragging the selection, or a copy of it with Alt
+                                self.editor_dragged_sprite = clicked_sprite
                                 if keys_pressed[pygame.K_LALT] or keys_pressed[pygame.K_RALT]:
-                                    # Duplicate sprite logic (as before)
-                                    if isinstance(clicked_sprite, Platform):
-                                        new_sprite = Platform(clicked_sprite.rect.x, clicked_sprite.rect.y, clicked_sprite.rect.width, clicked_sprite.rect.height, clicked_sprite.platform_color, clicked_sprite.orientation, clicked_sprite.dies_on_touch, clicked_sprite.is_hookable)
-                                    elif isinstance(clicked_sprite, ChaserEnemy):
-                                        new_sprite = ChaserEnemy(clicked_sprite.rect.centerx, clicked_sprite.rect.centery, self.CHASER_ENEMY_COLOR)
-                                        if hasattr(clicked_sprite, 'detection_range'):
-                                            new_sprite.detection_range = clicked_sprite.detection_range
-                                    elif isinstance(clicked_sprite, PatrolEnemy):
-                                        new_sprite = PatrolEnemy(clicked_sprite.rect.centerx, clicked_sprite.rect.centery, self.PATROL_ENEMY_COLOR, clicked_sprite.patrol_range)
-                                    elif isinstance(clicked_sprite, Collectible):
-                                        new_sprite = Collectible(clicked_sprite.rect.centerx, clicked_sprite.rect.centery, clicked_sprite.type, self)
-                                    elif isinstance(clicked_sprite, Spike):
-                                        new_sprite = Spike(clicked_sprite.rect.x, clicked_sprite.rect.y, self.SPIKE_COLOR, clicked_sprite.instant_kill)
-                                    elif isinstance(clicked_sprite, Key):
-                                        new_key_id = f"key_{random.randint(1000,9999)}"
-                                        new_sprite = Key(clicked_sprite.rect.centerx, clicked_sprite.rect.centery, new_key_id, clicked_sprite.key_color)
-                                    elif isinstance(clicked_sprite, Door):
-                                        new_door_id = f"door_{random.randint(1000,9999)}"
-                                        new_sprite = Door(clicked_sprite.rect.x, clicked_sprite.rect.y, clicked_sprite.width, clicked_sprite.height, new_door_id, clicked_sprite.door_color, clicked_sprite.required_key_id, clicked_sprite.required_weapon_type, clicked_sprite.dies_on_touch, clicked_sprite.is_hookable)
-                                    elif isinstance(clicked_sprite, LevelExit):
-                                        new_sprite = None # Cannot duplicate exit
-                                        print("No se puede duplicar la salida de nivel. Se moverá el existente.")
-                                    else:
-                                        new_sprite = None
-
-                                    if new_sprite:
-                                        self.all_sprites.add(new_sprite)
-                                        if isinstance(new_sprite, Platform): self.platforms.add(new_sprite)
-                                        elif isinstance(new_sprite, (ChaserEnemy, PatrolEnemy)): self.enemies.add(new_sprite)
-                                        elif isinstance(new_sprite, Collectible): self.collectibles.add(new_sprite)
-                                        elif isinstance(new_sprite, Spike): self.obstacles.add(new_sprite)
-                                        elif isinstance(new_sprite, Key): self.keys.add(new_sprite)
-                                        elif isinstance(new_sprite, Door): self.doors.add(new_sprite)
-                                        self.editor_dragged_sprite = new_sprite
-                                        self.editor_selected_sprite = new_sprite
-                                        print(f"Elemento duplicado: {type(new_sprite).__name__}")
-                                    else:
-                                        self.editor_dragged_sprite = clicked_sprite # Fallback to just dragging
-                                else:
-                                    self.editor_dragged_sprite = clicked_sprite
-                                
+                                    clones = {}
+                                    for sprite in self.editor_selection:
+                                        new_sprite = self._clone_level_sprite(sprite)
+                                        if new_sprite:
+                                            self._add_level_sprite(new_sprite)
+                                            clones[sprite] = new_sprite
+                                        else:
+                                            print("No se puede duplicar la salida de nivel. Se moverá el existente.")
+                                    if clones:
+                                        self.editor_dragged_sprite = clones.get(clicked_sprite) or next(iter(clones.values()))
+                                        self.editor_drag_added = list(clones.values())
+                                        # The copies move, and so does the level exit, which has no copy
+                                        not_cloned = [sprite for sprite in self.editor_selection if sprite not in clones]
+                                        self._set_editor_selection(self.editor_drag_added + not_cloned, self.editor_dragged_sprite)
+                                        print(f"Elementos duplicados: {len(clones)}")
+
+                                self.editor_drag_group = list(self.editor_selection)
+                                self.editor_index.mark_dirty(self.editor_drag_group) # Zoomed-out chunks re-render without them
+                                self.editor_drag_start = self.editor_dragged_sprite.rect.topleft
                                 self.editor_dragging = True
-                                self.editor_drag_offset_x = mouse_x - (self.editor_dragged_sprite.rect.x + self.editor_camera_offset_x) # Offset relative to screen position
-                                self.editor_drag_offset_y = mouse_y - (self.editor_dragged_sprite.rect.y + self.editor_camera_offset_y) # Offset relative to screen position
+                                dragged_screen_rect = self._editor_world_to_screen_rect(self.editor_dragged_sprite.rect)
+                                self.editor_drag_offset_x = mouse_x - dragged_screen_rect.x # Offset relative to screen position
+                                self.editor_drag_offset_y = mouse_y - dragged_screen_rect.y # Offset relative to screen position
                                 return True # Consume event, started dragging
                         else: # No existing sprite clicked, attempt to place new
                             # Ensure click is outside the editor panel area for placement
                             if mouse_x >= self.editor_panel.rect.right:
+                                keys_pressed = self.input.get_pressed()
+                                if keys_pressed[pygame.K_LSHIFT] or keys_pressed[pygame.K_RSHIFT]:
+                                    # Shift-drag on empty space draws a selection box instead of placing
+                                    self.editor_box_select_start = (mouse_x, mouse_y)
+                                    self.editor_box_select_end = (mouse_x, mouse_y)
+                                    return True
+
+                                previous_exit = self.level_exit.sprite
                                 # Placement logic (as before)
                                 if self.editor_selected_tool == "player_start":
                                     # Place player at world coordinates
@@ -2101,118 +3697,99 @@ class Game:
                                 elif self.editor_selected_tool == "spike":
                                     # Spikes are placed with their base at the bottom of the grid cell
                                     new_spike = Spike(grid_x_world, grid_y_world + self.GRID_SIZE - 20, self.SPIKE_COLOR) # 20 is spike height
-                                    self.all_sprites.add(new_spike)
-                                    self.obstacles.add(new_spike)
+                                    self._add_level_sprite(new_spike)
                                     self.editor_selected_sprite = new_spike
                                     print(f"Spike añadido en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "platform":
                                     new_platform = Platform(grid_x_world, grid_y_world, self.editor_tool_size[0], self.editor_tool_size[1], self.PLATFORM_COLOR, "horizontal")
-                                    self.all_sprites.add(new_platform)
-                                    self.platforms.add(new_platform)
+                                    self._add_level_sprite(new_platform)
                                     self.editor_selected_sprite = new_platform
                                     print(f"Plataforma horizontal añadida en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "vertical_platform":
                                     new_platform = Platform(grid_x_world, grid_y_world, self.GRID_SIZE, self.GRID_SIZE * 2, self.PLATFORM_COLOR, "vertical")
-                                    self.all_sprites.add(new_platform)
-                                    self.platforms.add(new_platform)
+                                    self._add_level_sprite(new_platform)
                                     self.editor_selected_sprite = new_platform
                                     print(f"Plataforma vertical añadida en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "chaser_enemy":
                                     new_enemy = ChaserEnemy(grid_x_world + self.GRID_SIZE // 2, grid_y_world + self.GRID_SIZE // 2, self.CHASER_ENEMY_COLOR)
-                                    self.all_sprites.add(new_enemy)
-                                    self.enemies.add(new_enemy)
+                                    self._add_level_sprite(new_enemy)
                                     self.editor_selected_sprite = new_enemy
                                     print(f"Enemigo Perseguidor añadido en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "patrol_enemy":
                                     new_enemy = PatrolEnemy(grid_x_world + self.GRID_SIZE // 2, grid_y_world + self.GRID_SIZE // 2, self.PATROL_ENEMY_COLOR)
-                                    self.all_sprites.add(new_enemy)
-                                    self.enemies.add(new_enemy)
+                                    self._add_level_sprite(new_enemy)
                                     self.editor_selected_sprite = new_enemy
                                     print(f"Enemigo Patrulla añadido en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "score_collectible":
                                     new_collectible = Collectible(grid_x_world + self.GRID_SIZE // 2, grid_y_world + self.GRID_SIZE // 2, "score", self)
-                                    self.all_sprites.add(new_collectible)
-                                    self.collectibles.add(new_collectible)
+                                    self._add_level_sprite(new_collectible)
                                     self.editor_selected_sprite = new_collectible
                                     print(f"Coleccionable de Puntuación añadido en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "health_collectible":
                                     new_collectible = Collectible(grid_x_world + self.GRID_SIZE // 2, grid_y_world + self.GRID_SIZE // 2, "health", self)
-                                    self.all_sprites.add(new_collectible)
-                                    self.collectibles.add(new_collectible)
+                                    self._add_level_sprite(new_collectible)
                                     self.editor_selected_sprite = new_collectible
                                     print(f"Coleccionable de Vida añadido en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "speed_collectible":
                                     new_collectible = Collectible(grid_x_world + self.GRID_SIZE // 2, grid_y_world + self.GRID_SIZE // 2, "speed", self)
-                                    self.all_sprites.add(new_collectible)
-                                    self.collectibles.add(new_collectible)
+                                    self._add_level_sprite(new_collectible)
                                     self.editor_selected_sprite = new_collectible
                                     print(f"Coleccionable de Velocidad añadido en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "charge_powerup_collectible":
                                     new_collectible = Collectible(grid_x_world + self.GRID_SIZE // 2, grid_y_world + self.GRID_SIZE // 2, "charge_powerup", self)
-                                    self.all_sprites.add(new_collectible)
-                                    self.collectibles.add(new_collectible)
+                                    self._add_level_sprite(new_collectible)
                                     self.editor_selected_sprite = new_collectible
                                     print(f"Power-up de Carga añadido en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "blue_weapon_powerup_collectible":
                                     new_collectible = Collectible(grid_x_world + self.GRID_SIZE // 2, grid_y_world + self.GRID_SIZE // 2, "blue_weapon_powerup", self)
-                                    self.all_sprites.add(new_collectible)
-                                    self.collectibles.add(new_collectible)
+                                    self._add_level_sprite(new_collectible)
                                     self.editor_selected_sprite = new_collectible
                                     print(f"Power-up Arma Azul añadido en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "red_weapon_powerup_collectible":
                                     new_collectible = Collectible(grid_x_world + self.GRID_SIZE // 2, grid_y_world + self.GRID_SIZE // 2, "red_weapon_powerup", self)
-                                    self.all_sprites.add(new_collectible)
-                                    self.collectibles.add(new_collectible)
+                                    self._add_level_sprite(new_collectible)
                                     self.editor_selected_sprite = new_collectible
                                     print(f"Power-up Arma Roja añadido en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "purple_weapon_powerup_collectible":
                                     new_collectible = Collectible(grid_x_world + self.GRID_SIZE // 2, grid_y_world + self.GRID_SIZE // 2, "purple_weapon_powerup", self)
-                                    self.all_sprites.add(new_collectible)
-                                    self.collectibles.add(new_collectible)
+                                    self._add_level_sprite(new_collectible)
                                     self.editor_selected_sprite = new_collectible
                                     print(f"Power-up Arma Púrpura añadido en ({grid_x_world}, {grid_y_world})")
                                 elif self.editor_selected_tool == "key":
                                     new_key = Key(grid_x_world + self.GRID_SIZE // 2, grid_y_world + self.GRID_SIZE // 2, f"key_{random.randint(1000,9999)}", (random.randint(50,255), random.randint(50,255), random.randint(50,255)))
-                                    self.all_sprites.add(new_key)
-                                    self.keys.add(new_key)
+                                    self._add_level_sprite(new_key)
                                     self.editor_selected_sprite = new_key
                                     print(f"Llave añadida en ({grid_x_world}, {grid_y_world}) con ID: {new_key.key_id}")
                                 elif self.editor_selected_tool == "door":
                                     new_door = Door(grid_x_world, grid_y_world, self.GRID_SIZE, self.GRID_SIZE * 2, f"door_{random.randint(1000,9999)}", (random.randint(50,200), random.randint(50,200), random.randint(50,200)))
-                                    self.all_sprites.add(new_door)
-                                    self.doors.add(new_door)
+                                    self._add_level_sprite(new_door)
                                     self.editor_selected_sprite = new_door
                                     print(f"Puerta añadida en ({grid_x_world}, {grid_y_world}) con ID: {new_door.door_id}")
                                 elif self.editor_selected_tool == "level_exit":
                                     if self.level_exit.sprite:
-                                        self.level_exit.sprite.kill()
+                                        self._remove_level_sprite(self.level_exit.sprite)
                                         print("Salida de nivel existente eliminada.")
                                     new_exit = LevelExit(grid_x_world, grid_y_world, self.GRID_SIZE, self.GRID_SIZE, self.EXIT_COLOR)
-                                    self.all_sprites.add(new_exit)
-                                    self.level_exit.add(new_exit)
+                                    self._add_level_sprite(new_exit)
                                     self.editor_selected_sprite = new_exit
                                     print(f"Salida de nivel añadida/movida a ({grid_x_world}, {grid_y_world})")
+
+                                if self.editor_selected_tool != "player_start" and self.editor_selected_sprite:
+                                    replaced = [previous_exit] if self.editor_selected_tool == "level_exit" and previous_exit else []
+                                    self._push_editor_action(added=[self.editor_selected_sprite], removed=replaced)
                                 return True # Consume event
                     
                     elif event.button == 3: # Right click to remove
                         removed_something = False
                         # Check if click is outside the editor panel
                         if mouse_x > self.editor_panel.rect.right:
-                            # Remove from all relevant groups
-                            # Iterate in reverse order for correct removal if overlapping
-                            for group in [self.level_exit, self.doors, self.keys, self.collectibles, self.obstacles, self.enemies, self.platforms]:
-                                for sprite in reversed(group.sprites()):
-                                    # Check collision with mouse position, adjusted by editor camera offset
-                                    sprite_rect_screen = sprite.rect.move(self.editor_camera_offset_x, self.editor_camera_offset_y)
-                                    if sprite_rect_screen.collidepoint(mouse_x, mouse_y) and sprite.rect.x >= self.editor_panel.rect.right - self.editor_camera_offset_x:
-                                        sprite.kill()
-                                        removed_something = True
-                                        if self.editor_selected_sprite == sprite:
-                                            self.editor_selected_sprite = None # Deselect if removed
-                                        print(f"Elemento eliminado en ({sprite.rect.x}, {sprite.rect.y})")
-                                        break # Remove only one per click
-                                if removed_something:
-                                    break
+                            # Remove only the top-most element under the cursor
+                            sprite = self._editor_sprite_at(mouse_x, mouse_y)
+                            if sprite:
+                                self._remove_level_sprite(sprite) # Also deselects it
+                                self._push_editor_action(removed=[sprite])
+                                removed_something = True
+                                print(f"Elemento eliminado en ({sprite.rect.x}, {sprite.rect.y})")
                             if not removed_something:
                                 print("No se encontró ningún elemento para eliminar en esa posición.")
                         else:
@@ -2228,28 +3805,32 @@ class Game:
 
                 elif event.type == pygame.MOUSEMOTION:
                     if self.editor_dragging and self.editor_dragged_sprite:
-                        mouse_x, mouse_y = pygame.mouse.get_pos()
+                        mouse_x, mouse_y = self.input.get_mouse_pos()
                         
                         # Calculate new world position based on mouse and drag offset
-                        new_x_world = mouse_x - self.editor_drag_offset_x - self.editor_camera_offset_x
-                        new_y_world = mouse_y - self.editor_drag_offset_y - self.editor_camera_offset_y
+                        new_x_world, new_y_world = self._editor_screen_to_world(mouse_x - self.editor_drag_offset_x, mouse_y - self.editor_drag_offset_y)
                         
                         # Snap to grid in world coordinates
                         grid_x_world_snapped = (new_x_world // self.GRID_SIZE) * self.GRID_SIZE
                         grid_y_world_snapped = (new_y_world // self.GRID_SIZE) * self.GRID_SIZE
 
-                        # Ensure dragged sprite stays within valid area (right of panel, in world coords)
+                        # The rest of the selection follows by the same step; the index is updated once, on drop
+                        step_x = grid_x_world_snapped - self.editor_dragged_sprite.rect.x
+                        step_y = grid_y_world_snapped - self.editor_dragged_sprite.rect.y
+                        # Ensure the whole selection stays within valid area (right of panel, in world coords)
                         # The panel is fixed on screen, so its right edge in world coords changes with camera offset
-                        panel_right_world_edge = self.editor_panel.rect.right - self.editor_camera_offset_x
-                        if grid_x_world_snapped < panel_right_world_edge:
-                            grid_x_world_snapped = panel_right_world_edge
-                        
-                        self.editor_dragged_sprite.rect.x = grid_x_world_snapped
-                        self.editor_dragged_sprite.rect.y = grid_y_world_snapped
+                        panel_right_world_edge = self._editor_screen_to_world(self.editor_panel.rect.right, 0)[0]
+                        step_x = max(step_x, panel_right_world_edge - min(sprite.rect.x for sprite in self.editor_drag_group))
+                        if step_x or step_y:
+                            for sprite in self.editor_drag_group:
+                                sprite.rect.move_ip(step_x, step_y)
+
+                    elif self.editor_box_select_start:
+                        self.editor_box_select_end = event.pos
                     
                     elif self.resizing_platform and self.editor_selected_sprite and isinstance(self.editor_selected_sprite, Platform) and self.editor_selected_sprite.orientation == "horizontal":
-                        mouse_x, mouse_y = pygame.mouse.get_pos()
-                        delta_x = mouse_x - self.initial_mouse_pos[0]
+                        mouse_x, mouse_y = self.input.get_mouse_pos()
+                        delta_x = int((mouse_x - self.initial_mouse_pos[0]) / self.editor_zoom) # In world pixels
                         
                         min_width = self.GRID_SIZE # 1 cell
                         max_width = self.GRID_SIZE * 10 # 10 cells
@@ -2288,18 +3869,25 @@ class Game:
                             self.editor_selected_sprite.rect.width = new_width_snapped
                         
                         self.editor_selected_sprite._draw_image() # Redraw the platform image
+                        self._reindex_level_sprite(self.editor_selected_sprite)
                     
                     elif self.editor_panning:
-                        current_mouse_x, current_mouse_y = pygame.mouse.get_pos()
+                        current_mouse_x, current_mouse_y = self.input.get_mouse_pos()
                         delta_x = current_mouse_x - self.editor_pan_start_mouse_pos[0]
                         delta_y = current_mouse_y - self.editor_pan_start_mouse_pos[1]
                         
                         # Update camera offset
                         self.editor_camera_offset_x = self.initial_editor_camera_offset_x + delta_x
                         self.editor_camera_offset_y = self.initial_editor_camera_offset_y + delta_y
-
+                    else:
+                        self.editor_hovered_sprite = self._editor_sprite_at(*event.pos)
 
                 elif event.type == pygame.MOUSEBUTTONUP:
+                    if self.editor_dragging and self.editor_dragged_sprite:
+                        self._finish_editor_drag()
+                    if self.editor_box_select_start:
+                        self.editor_box_select_end = event.pos
+                        self._finish_editor_box_select()
                     self.editor_dragging = False
                     self.editor_dragged_sprite = None
                     self.resizing_platform = False
@@ -2312,14 +3900,31 @@ class Game:
                         print("Paneo de cámara finalizado.")
 
 
+                elif event.type == pygame.MOUSEWHEEL: # Zoom around the cursor
+                    if self.input.get_mouse_pos()[0] > self.editor_panel.rect.right:
+                        self._step_editor_zoom(-1 if event.y > 0 else 1, self.input.get_mouse_pos())
+
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_F1: # Tecla para salir del modo editor
                         self.game_state = GAME_STATE_MENU # Vuelve al menú principal
+                        self._clear_editor_history()
                         self.editor_selected_sprite = None # Clear selected sprite
                         self.resizing_platform = False # Stop resizing
-                        self.editor_camera_offset_x = 0 # Reset editor camera offset
-                        self.editor_camera_offset_y = 0
+                        self._reset_editor_camera() # Reset editor camera offset and zoom
                         print("Saliendo del modo editor y volviendo al menú principal.")
+                    elif event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+                        if event.mod & pygame.KMOD_SHIFT:
+                            self._redo_editor_action()
+                        else:
+                            self._undo_editor_action()
+                    elif event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:
+                        self._redo_editor_action()
+                    elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS): # Acercar zoom
+                        self._step_editor_zoom(-1, (self.editor_panel.rect.right + (WIDTH - self.editor_panel.rect.right) // 2, HEIGHT // 2))
+                    elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS): # Alejar zoom
+                        self._step_editor_zoom(1, (self.editor_panel.rect.right + (WIDTH - self.editor_panel.rect.right) // 2, HEIGHT // 2))
+                    elif event.key in (pygame.K_DELETE, pygame.K_BACKSPACE): # Borrar toda la selección
+                        self._delete_editor_selection()
                     elif event.key == pygame.K_s: # Guardar nivel (inicia el proceso de entrada de nombre)
                         self.game_state = GAME_STATE_SAVING_LEVEL_INPUT
                         self.filename_input_box.set_text("") # Clear previous input
@@ -2362,6 +3967,7 @@ class Game:
                             # Snap to grid after re-centering
                             platform.rect.x = (platform.rect.x // self.GRID_SIZE) * self.GRID_SIZE
                             platform.rect.y = (platform.rect.y // self.GRID_SIZE) * self.GRID_SIZE
+                            self._reindex_level_sprite(platform)
 
                             print(f"Plataforma rotada a {platform.orientation}. Nuevas dimensiones: {platform.rect.width}x{platform.rect.height}")
                         else:
@@ -2413,7 +4019,10 @@ class Game:
                         if all_valid:
                             # Check if the sprite has a set_properties method
                             if hasattr(self.editing_sprite, 'set_properties'):
+                                self._unregister_linked_ids(self.editing_sprite) # IDs may change
                                 self.editing_sprite.set_properties(updated_props)
+                                self._register_linked_ids(self.editing_sprite)
+                                self._reindex_level_sprite(self.editing_sprite) # Size properties may have changed the rect
                                 print(f"Propiedades actualizadas para {type(self.editing_sprite).__name__}.")
                             else:
                                 print(f"El elemento {type(self.editing_sprite).__name__} no tiene un método set_properties.")
@@ -2446,32 +4055,97 @@ class Game:
                         return True
                     
                     # Check level list items
-                    item_y = self.load_level_overlay_rect.y + 50
-                    for filename in self.available_levels_for_load:
-                        item_rect = pygame.Rect(self.load_level_overlay_rect.x + 10, item_y, self.load_level_overlay_rect.width - 20, 30)
+                    for filename, item_rect in self._load_level_item_rects():
                         if item_rect.collidepoint(mouse_x, mouse_y):
                             self.load_level_from_file_by_name(filename)
                             # load_level_from_file_by_name will set game_state to EDITOR
                             return True
-                        item_y += 35
+                elif event.type == pygame.MOUSEWHEEL:
+                    self._scroll_load_level_menu(-event.y)
+                elif event.type == pygame.KEYDOWN and event.key in (pygame.K_UP, pygame.K_DOWN):
+                    self._scroll_load_level_menu(-1 if event.key == pygame.K_UP else 1)
                 elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                     self.game_state = GAME_STATE_EDITOR # Cancel and go back to editor
                     print("Carga de nivel cancelada.")
                     return True
+        return True # Keep running
+
+    def _editor_grid_period(self):
+        # Screen pixels after which the grid repeats: a multiple of both GRID_SIZE and the chunk size,
+        # so it is a whole number of pixels at every zoom level
+        return round(math.lcm(self.GRID_SIZE, EDITOR_CHUNK_SIZE) * self.editor_zoom)
+
+    def _render_editor_grid_layer(self, canvas_width, canvas_height):
+        # The layer is the canvas plus one period of the pattern; panning only changes which part is blitted
+        period = self._editor_grid_period()
+        spacing = self.GRID_SIZE * self.editor_zoom
+        layer = new_surface((canvas_width + period, canvas_height + period)).convert()
+        layer.fill(self.EDITOR_BACKGROUND_COLOR)
+        for i in range(int(layer.get_width() / spacing) + 1):
+            line_x = round(i * spacing)
+            pygame.draw.line(layer, self.GRID_COLOR, (line_x, 0), (line_x, layer.get_height()), 1)
+        for i in range(int(layer.get_height() / spacing) + 1):
+            line_y = round(i * spacing)
+            pygame.draw.line(layer, self.GRID_COLOR, (0, line_y), (layer.get_width(), line_y), 1)
+        return layer
 
     def draw_grid_editor(self):
-        # Draw vertical lines
-        for x in range(self.editor_panel.rect.right, WIDTH + self.GRID_SIZE, self.GRID_SIZE):
-            # Adjust for camera offset
-            line_x = x + self.editor_camera_offset_x % self.GRID_SIZE
-            if line_x > self.editor_panel.rect.right: # Only draw grid lines to the right of the panel
-                pygame.draw.line(self.screen, self.GRID_COLOR, (line_x, 0), (line_x, HEIGHT), 1)
-        
-        # Draw horizontal lines
-        for y in range(0, HEIGHT + self.GRID_SIZE, self.GRID_SIZE):
-            # Adjust for camera offset
-            line_y = y + self.editor_camera_offset_y % self.GRID_SIZE
-            pygame.draw.line(self.screen, self.GRID_COLOR, (self.editor_panel.rect.right, line_y), (WIDTH, line_y), 1)
+        # Lines sit on world multiples of GRID_SIZE (scaled by the zoom), so they match where elements snap.
+        # The layer is only re-rendered when the window, GRID_SIZE or zoom change
+        canvas_left = self.editor_panel.rect.right
+        canvas_width, canvas_height = WIDTH - canvas_left, HEIGHT
+        layer_key = (canvas_width, canvas_height, self.GRID_SIZE, self.editor_zoom)
+        if layer_key != self.editor_grid_layer_key:
+            self.editor_grid_layer = self._render_editor_grid_layer(canvas_width, canvas_height)
+            self.editor_grid_layer_key = layer_key
+        period = self._editor_grid_period()
+        offset_x = (canvas_left - self.editor_camera_offset_x) % period
+        offset_y = -self.editor_camera_offset_y % period
+        self.screen.blit(self.editor_grid_layer, (canvas_left, 0), (offset_x, offset_y, canvas_width, canvas_height))
+
+    def _invalidate_editor_chunks(self):
+        # Drop cached chunks whose index cells changed since the last zoomed-out frame
+        dirty = self.editor_index.dirty_cells
+        if not dirty:
+            return
+        cells_per_chunk = EDITOR_CHUNK_SIZE // self.editor_index.cell_size
+        chunks = {(cell_x // cells_per_chunk, cell_y // cells_per_chunk) for cell_x, cell_y in dirty}
+        dirty.clear()
+        for key in [key for key in self.editor_chunk_cache if key[:2] in chunks]:
+            del self.editor_chunk_cache[key]
+
+    def _render_editor_chunk(self, chunk_x, chunk_y, hidden):
+        # Sprites are blitted 1:1 once and the chunk is downscaled once; the result is reused every frame
+        chunk_rect = pygame.Rect(chunk_x * EDITOR_CHUNK_SIZE, chunk_y * EDITOR_CHUNK_SIZE, EDITOR_CHUNK_SIZE, EDITOR_CHUNK_SIZE)
+        sprites = [sprite for sprite in self.editor_index.query_rect(chunk_rect) if sprite not in hidden]
+        if not sprites:
+            return None
+        surface = new_surface(chunk_rect.size, pygame.SRCALPHA)
+        for sprite in sorted(sprites, key=self.editor_index.z_key):
+            surface.blit(sprite.image, (sprite.rect.x - chunk_rect.x, sprite.rect.y - chunk_rect.y))
+        scaled_size = round(EDITOR_CHUNK_SIZE * self.editor_zoom)
+        return pygame.transform.smoothscale(surface, (scaled_size, scaled_size))
+
+    def _draw_editor_chunks(self):
+        self._invalidate_editor_chunks()
+        # Sprites being dragged are left out of the bitmaps and drawn as outlines until they are dropped
+        hidden = set(self.editor_drag_group) if self.editor_dragging else set()
+        chunk_screen_size = round(EDITOR_CHUNK_SIZE * self.editor_zoom)
+        left, top = self._editor_screen_to_world(self.editor_panel.rect.right, 0)
+        right, bottom = self._editor_screen_to_world(WIDTH, HEIGHT)
+        for chunk_x in range(left // EDITOR_CHUNK_SIZE, right // EDITOR_CHUNK_SIZE + 1):
+            for chunk_y in range(top // EDITOR_CHUNK_SIZE, bottom // EDITOR_CHUNK_SIZE + 1):
+                key = (chunk_x, chunk_y, self.editor_zoom)
+                if key not in self.editor_chunk_cache:
+                    self.editor_chunk_cache[key] = self._render_editor_chunk(chunk_x, chunk_y, hidden)
+                chunk_surface = self.editor_chunk_cache[key]
+                if chunk_surface:
+                    self.screen.blit(chunk_surface, (chunk_x * chunk_screen_size + self.editor_camera_offset_x,
+                                                     chunk_y * chunk_screen_size + self.editor_camera_offset_y))
+
+        # The player start is not a level element, so it is not in the index
+        player_rect = self._editor_world_to_screen_rect(self.player.rect)
+        self.screen.blit(pygame.transform.scale(self.player.image, player_rect.size), player_rect)
 
     def draw_hud(self):
         score_text = self.font_medium.render(f"Puntuación: {self.score}", True, self.WHITE)
@@ -2499,7 +4173,7 @@ class Game:
         # Reload Cooldown / Active Indicator
         if "reload_duration" in self.player.weapon_data[self.player.current_weapon]:
             if self.player.is_reloading:
-                time_elapsed_reload = pygame.time.get_ticks() - self.player.reload_timer
+                time_elapsed_reload = self.game_clock.get_ticks() - self.player.reload_timer
                 remaining_reload = (self.player.weapon_data[self.player.current_weapon]["reload_duration"] - time_elapsed_reload) / 1000.0
                 if remaining_reload > 0:
                     reload_text = self.font_small.render(f"Recargando: {remaining_reload:.1f}s", True, self.BULLET_COLOR)
@@ -2528,7 +4202,7 @@ class Game:
             dash_text = self.font_small.render("DASHING!", True, self.BULLET_COLOR)
             self.screen.blit(dash_text, (10, dash_y_pos))
         else:
-            time_since_last_dash = pygame.time.get_ticks() - self.player.last_dash_time
+            time_since_last_dash = self.game_clock.get_ticks() - self.player.last_dash_time
             if time_since_last_dash < DASH_COOLDOWN:
                 remaining_cooldown = (DASH_COOLDOWN - time_since_last_dash) / 1000.0
                 dash_cooldown_text = self.font_small.render(f"Dash CD: {remaining_cooldown:.1f}s", True, self.WHITE)
@@ -2540,7 +4214,7 @@ class Game:
         # Speed Boost Timer (adjusted position)
         boost_y_pos = dash_y_pos + 40
         if self.player.speed_boost_active:
-            time_elapsed_boost = pygame.time.get_ticks() - self.player.speed_boost_timer
+            time_elapsed_boost = self.game_clock.get_ticks() - self.player.speed_boost_timer
             remaining_boost = (SPEED_BOOST_DURATION - time_elapsed_boost) / 1000.0
             if remaining_boost > 0:
                 boost_text = self.font_small.render(f"Velocidad: {remaining_boost:.1f}s", True, self.BULLET_COLOR)
@@ -2641,7 +4315,9 @@ class Game:
         self.screen.blit(editor_text, editor_rect)
 
     def draw_editor_screen(self):
-        self.screen.fill((50, 50, 70)) # Un color diferente para el editor
+        # Un color diferente para el editor; the grid layer already carries the background of the canvas
+        self.screen.fill(self.EDITOR_BACKGROUND_COLOR, (0, 0, self.editor_panel.rect.right, HEIGHT))
+        self.draw_grid_editor() # Draw the grid under everything else on the canvas
         editor_title_text = self.font_large.render("MODO EDITOR", True, self.WHITE)
         exit_text = self.font_medium.render("Presiona 'F1' para Salir al Menú Principal", True, self.WHITE)
         save_text = self.font_medium.render("Presiona 'S' para Guardar Nivel", True, self.WHITE)
@@ -2663,6 +4339,9 @@ class Game:
             "Click DER en cuadrícula: Eliminar elemento",
             "Arrastrar: Mover elemento",
             "Alt + Arrastrar: Duplicar elemento",
+            "Shift + Arrastrar: Seleccionar área",
+            "Supr: Borrar selección / Ctrl+Z: Deshacer",
+            f"Rueda o +/-: Zoom ({int(self.editor_zoom * 100)}%)",
             "Doble Click IZQ: Editar propiedades",
             "Click Central: Panear cámara",
             "Seleccionar Plataforma + R: Rotar Plataforma",
@@ -2676,50 +4355,59 @@ class Game:
             y_offset += 25
 
 
-        self.draw_grid_editor() # Draw the fixed grid in editor mode
-
-        # Draw existing sprites in editor mode (with camera offset)
-        for sprite in self.all_sprites:
-            # Draw player at its editor-defined start position
-            # Ensure sprites are only drawn if they are within the visible screen area (after applying camera offset)
-            sprite_screen_rect = sprite.rect.move(self.editor_camera_offset_x, self.editor_camera_offset_y)
-            if sprite_screen_rect.right > self.editor_panel.rect.right and sprite_screen_rect.left < WIDTH and \
-               sprite_screen_rect.bottom > 0 and sprite_screen_rect.top < HEIGHT:
-                self.screen.blit(sprite.image, sprite_screen_rect)
+        if self.editor_zoom != 1.0:
+            self._draw_editor_chunks() # Zoomed out: cached downscaled bitmaps instead of every sprite
+        else:
+            # Draw existing sprites in editor mode (with camera offset)
+            for sprite in self.all_sprites:
+                # Draw player at its editor-defined start position
+                # Ensure sprites are only drawn if they are within the visible screen area (after applying camera offset)
+                sprite_screen_rect = sprite.rect.move(self.editor_camera_offset_x, self.editor_camera_offset_y)
+                if sprite_screen_rect.right > self.editor_panel.rect.right and sprite_screen_rect.left < WIDTH and \
+                   sprite_screen_rect.bottom > 0 and sprite_screen_rect.top < HEIGHT:
+                    self.screen.blit(sprite.image, sprite_screen_rect)
                 
-                # Draw labels for Doors and Keys
-                if isinstance(sprite, Door):
-                    label_text = f"Puerta: {sprite.door_id}"
-                    label_surface = self.font_tiny.render(label_text, True, self.WHITE)
-                    label_rect = label_surface.get_rect(centerx=sprite_screen_rect.centerx, bottom=sprite_screen_rect.top - 5)
-                    self.screen.blit(label_surface, label_rect)
-                elif isinstance(sprite, Key):
-                    label_text = f"Llave: {sprite.key_id}"
-                    label_surface = self.font_tiny.render(label_text, True, self.WHITE)
-                    label_rect = label_surface.get_rect(centerx=sprite_screen_rect.centerx, bottom=sprite_screen_rect.top - 5)
-                    self.screen.blit(label_surface, label_rect)
-            
-            # Draw selection border for selected sprite (always, even if partially off-screen)
-            if self.editor_selected_sprite == sprite:
-                pygame.draw.rect(self.screen, (0, 255, 0), sprite.rect.move(self.editor_camera_offset_x, self.editor_camera_offset_y), 3) # Green border
+                    # Draw labels for Doors and Keys
+                    if isinstance(sprite, Door):
+                        label_text = f"Puerta: {sprite.door_id}"
+                        label_surface = self.font_tiny.render(label_text, True, self.WHITE)
+                        label_rect = label_surface.get_rect(centerx=sprite_screen_rect.centerx, bottom=sprite_screen_rect.top - 5)
+                        self.screen.blit(label_surface, label_rect)
+                    elif isinstance(sprite, Key):
+                        label_text = f"Llave: {sprite.key_id}"
+                        label_surface = self.font_tiny.render(label_text, True, self.WHITE)
+                        label_rect = label_surface.get_rect(centerx=sprite_screen_rect.centerx, bottom=sprite_screen_rect.top - 5)
+                        self.screen.blit(label_surface, label_rect)
+
+        # Selection and hover outlines (always, even if partially off-screen)
+        for sprite in self.editor_selection:
+            pygame.draw.rect(self.screen, (0, 255, 0), self._editor_world_to_screen_rect(sprite.rect), 3) # Green border
+        if self.editor_hovered_sprite and self.editor_hovered_sprite not in self.editor_selection:
+            pygame.draw.rect(self.screen, self.WHITE, self._editor_world_to_screen_rect(self.editor_hovered_sprite.rect), 1) # Hover outline
+
+        if self.editor_box_select_start and self.editor_box_select_end:
+            start_x, start_y = self.editor_box_select_start
+            end_x, end_y = self.editor_box_select_end
+            pygame.draw.rect(self.screen, (0, 200, 255), (min(start_x, end_x), min(start_y, end_y), abs(end_x - start_x), abs(end_y - start_y)), 1)
 
         # Draw linking lines and highlight linked elements
         if self.editor_selected_sprite:
             if isinstance(self.editor_selected_sprite, Door):
                 if self.editor_selected_sprite.required_key_id:
-                    linked_key = next((k for k in self.keys if k.key_id == self.editor_selected_sprite.required_key_id), None)
+                    linked_key = self.keys_by_id.get(self.editor_selected_sprite.required_key_id)
                     if linked_key:
+                        linked_key_rect = self._editor_world_to_screen_rect(linked_key.rect)
                         pygame.draw.line(self.screen, self.LINK_HIGHLIGHT_COLOR, 
-                                         (self.editor_selected_sprite.rect.centerx + self.editor_camera_offset_x, self.editor_selected_sprite.rect.centery + self.editor_camera_offset_y), 
-                                         (linked_key.rect.centerx + self.editor_camera_offset_x, linked_key.rect.centery + self.editor_camera_offset_y), 2)
-                        pygame.draw.rect(self.screen, self.LINK_HIGHLIGHT_COLOR, linked_key.rect.move(self.editor_camera_offset_x, self.editor_camera_offset_y), 3) # Highlight linked key
+                                         self._editor_world_to_screen_rect(self.editor_selected_sprite.rect).center, 
+                                         linked_key_rect.center, 2)
+                        pygame.draw.rect(self.screen, self.LINK_HIGHLIGHT_COLOR, linked_key_rect, 3) # Highlight linked key
             elif isinstance(self.editor_selected_sprite, Key):
-                for door in self.doors:
-                    if door.required_key_id == self.editor_selected_sprite.key_id:
-                        pygame.draw.line(self.screen, self.LINK_HIGHLIGHT_COLOR, 
-                                         (self.editor_selected_sprite.rect.centerx + self.editor_camera_offset_x, self.editor_selected_sprite.rect.centery + self.editor_camera_offset_y), 
-                                         (door.rect.centerx + self.editor_camera_offset_x, door.rect.centery + self.editor_camera_offset_y), 2)
-                        pygame.draw.rect(self.screen, self.LINK_HIGHLIGHT_COLOR, door.rect.move(self.editor_camera_offset_x, self.editor_camera_offset_y), 3) # Highlight linked door
+                for door in self.doors_by_required_key.get(self.editor_selected_sprite.key_id, ()):
+                    door_rect = self._editor_world_to_screen_rect(door.rect)
+                    pygame.draw.line(self.screen, self.LINK_HIGHLIGHT_COLOR, 
+                                     self._editor_world_to_screen_rect(self.editor_selected_sprite.rect).center, 
+                                     door_rect.center, 2)
+                    pygame.draw.rect(self.screen, self.LINK_HIGHLIGHT_COLOR, door_rect, 3) # Highlight linked door
 
 
         # Draw the editor panel on top
@@ -2728,7 +4416,7 @@ class Game:
 
     def _draw_load_level_overlay(self):
         # Darken background
-        overlay_bg = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+        overlay_bg = new_surface((WIDTH, HEIGHT), pygame.SRCALPHA)
         overlay_bg.fill((0, 0, 0, 180))
         self.screen.blit(overlay_bg, (0, 0))
 
@@ -2741,12 +4429,9 @@ class Game:
         self.screen.blit(title_text, title_rect)
 
         # List levels
-        item_y = self.load_level_overlay_rect.y + 50
-        for filename in self.available_levels_for_load:
-            item_rect = pygame.Rect(self.load_level_overlay_rect.x + 10, item_y, self.load_level_overlay_rect.width - 20, 30)
-            
+        for filename, item_rect in self._load_level_item_rects():
             # Highlight on hover (for visual feedback)
-            mouse_pos = pygame.mouse.get_pos()
+            mouse_pos = self.input.get_mouse_pos()
             if item_rect.collidepoint(mouse_pos):
                 pygame.draw.rect(self.screen, (100, 100, 150), item_rect, border_radius=5)
             else:
@@ -2754,11 +4439,27 @@ class Game:
             
             pygame.draw.rect(self.screen, (150, 150, 200), item_rect, 1, border_radius=5)
 
+            # Thumbnails are rendered by generar_miniaturas.py or when the level is saved; here they are only blitted
+            text_x = item_rect.x + 10
+            thumbnail = self.load_level_thumbnails.get(filename)
+            if thumbnail:
+                thumbnail_rect = thumbnail.get_rect(midleft=(item_rect.x + 5, item_rect.centery))
+                self.screen.blit(thumbnail, thumbnail_rect)
+                text_x = thumbnail_rect.right + 10
+
             item_text = self.font_small.render(filename, True, self.WHITE)
-            item_text_rect = item_text.get_rect(midleft=(item_rect.x + 10, item_rect.centery))
+            item_text_rect = item_text.get_rect(midleft=(text_x, item_rect.centery))
             self.screen.blit(item_text, item_text_rect)
-            item_y += 35
-        
+
+        # Scroll bar when the list does not fit (mouse wheel or arrow keys)
+        total_rows, visible_rows = len(self.available_levels_for_load), self._load_level_visible_rows()
+        if total_rows > visible_rows:
+            track_rect = pygame.Rect(self.load_level_overlay_rect.right - 16, self.load_level_overlay_rect.y + 50, 6, visible_rows * LOAD_LEVEL_ITEM_HEIGHT - 5)
+            thumb_rect = pygame.Rect(track_rect.x, track_rect.y + track_rect.height * self.load_level_scroll // total_rows,
+                                     track_rect.width, max(10, track_rect.height * visible_rows // total_rows))
+            pygame.draw.rect(self.screen, (80, 80, 100), track_rect, border_radius=3)
+            pygame.draw.rect(self.screen, (150, 150, 200), thumb_rect, border_radius=3)
+
         # Cancel button
         cancel_button_rect = pygame.Rect(self.load_level_overlay_rect.centerx - 50, self.load_level_overlay_rect.bottom - 40, 100, 30)
         pygame.draw.rect(self.screen, (150, 50, 50), cancel_button_rect, border_radius=5)
@@ -2816,17 +4517,182 @@ class Game:
         self.screen.blit(confirm_text, confirm_text.get_rect(center=(WIDTH // 2, hint_y_offset + 30)))
 
 
+    def _collect(self, collectible):
+        kind = collectible.type
+        if kind == "score":
+            self.score += SCORE_PICKUP_POINTS
+            self.sound_manager.play_sound("collect")
+        elif kind == "health":
+            self.player.heal(HEALTH_PICKUP_AMOUNT)
+            self.sound_manager.play_sound("health_pickup")
+        elif kind == "speed":
+            self.player.activate_speed_boost()
+            self.sound_manager.play_sound("speed_pickup")
+        elif kind == "charge_powerup":
+            self.player.has_charge_powerup = True
+            self.sound_manager.play_sound("charge_powerup_pickup")
+        elif kind.endswith("_weapon_powerup"):
+            weapon = kind[:-len("_weapon_powerup")]
+            self.player.has_weapon_powerup[weapon] = True
+            self.player.equip_weapon(weapon, self.sound_manager) # Plays weapon_pickup
+        self.collected_pickups.add((kind, collectible.rect.center))
+        self._remove_level_sprite(collectible)
+
+    def _open_door(self, door):
+        # Leaving solid_index here is what lets the player walk through
+        door.open_door()
+        self.opened_door_ids.add(door.door_id)
+        self._remove_level_sprite(door)
+        self.sound_manager.play_sound("collect")
+        print(f"Puerta '{door.door_id}' abierta.")
+
+    def _can_open_door(self, door, weapon_type):
+        # weapon_type is what hit the door; None when the player walks into it
+        if door.required_key_id and door.required_key_id not in self.player_keys:
+            return False
+        return door.required_weapon_type == weapon_type
+
+    def _touched_triggers(self):
+        # Only the static triggers around the player; solid blocks push the player out, so touching
+        # a deadly one means being next to it, hence the one-pixel margin
+        return self.trigger_index.query_rect(self.player.rect.inflate(2, 2))
+
+    def _check_triggers(self):
+        for sprite in self._touched_triggers():
+            if not sprite.alive():
+                continue # Already handled this frame
+            if isinstance(sprite, Collectible):
+                self._collect(sprite)
+            elif isinstance(sprite, Key):
+                self.player_keys[sprite.key_id] = True
+                self._remove_level_sprite(sprite)
+                self.sound_manager.play_sound("collect")
+            elif isinstance(sprite, Spike):
+                self.sound_manager.play_sound("spike_hit")
+                if sprite.instant_kill:
+                    self.player.health = 0
+                    return self._player_died()
+                if self.player.take_damage(SPIKE_DAMAGE, self.sound_manager):
+                    return self._player_died()
+            elif isinstance(sprite, LevelExit):
+                return self._level_completed()
+            elif sprite.dies_on_touch: # Deadly platform or door
+                self.player.health = 0
+                return self._player_died()
+
+        # Doors that only need a key open when the player walks into them; closed doors are all in solid_index
+        for door in self.solid_index.query_rect(self.player.rect.inflate(2, 2)):
+            if isinstance(door, Door) and not door.dies_on_touch and self._can_open_door(door, None):
+                self._open_door(door)
+
+    def _explode_projectile(self, projectile):
+        # Area damage from one query per index, then the shrapnel burst as a single batch
+        self.sound_manager.play_sound("explosion")
+        x, y = projectile.rect.center
+        projectile.kill()
+        blast_rect = pygame.Rect(0, 0, PURPLE_EXPLOSION_RADIUS * 2, PURPLE_EXPLOSION_RADIUS * 2)
+        blast_rect.center = (x, y)
+
+        for enemy in self.enemy_index.query_rect(blast_rect):
+            # Closest point of the enemy to the blast, and walls in between shield it
+            closest_x = min(max(x, enemy.rect.left), enemy.rect.right)
+            closest_y = min(max(y, enemy.rect.top), enemy.rect.bottom)
+            distance = math.hypot(closest_x - x, closest_y - y)
+            if distance > PURPLE_EXPLOSION_RADIUS:
+                continue
+            if distance > 1 and self.solid_index.raycast((x, y), (closest_x - x, closest_y - y), distance - 1):
+                continue
+            if enemy.alive() and enemy.take_damage(PURPLE_EXPLOSION_DAMAGE):
+                self._remove_level_sprite(enemy)
+                self.score += ENEMY_KILL_POINTS
+
+        for door in self.solid_index.query_rect(blast_rect):
+            if isinstance(door, Door) and door.alive() and self._can_open_door(door, "purple"):
+                self._open_door(door)
+
+        self._emit_shrapnel(x, y)
+
+    def _emit_shrapnel(self, x, y):
+        burst = []
+        for vel_x, vel_y in PURPLE_SHRAPNEL_VELOCITIES:
+            shrapnel = self.shrapnel_pool.pop() if self.shrapnel_pool else Bullet(x, y, 0, 0, "shrapnel", game_instance=self)
+            shrapnel.rearm(x, y, vel_x, vel_y)
+            burst.append(shrapnel)
+        self.all_sprites.add(burst)
+        self.bullets.add(burst)
+
+    def _player_died(self):
+        self.sound_manager.play_sound("game_over")
+        if self.game_state == GAME_STATE_PLAYING_FROM_EDITOR:
+            print("Has muerto. Volviendo al editor.")
+            self._restore_editor_state()
+        else:
+            self.game_state = GAME_STATE_GAME_OVER
+
+    def _level_completed(self):
+        self.sound_manager.play_sound("level_complete")
+        if self.game_state == GAME_STATE_PLAYING_FROM_EDITOR:
+            print("¡Nivel completado! Volviendo al editor.")
+            self._restore_editor_state()
+        elif self.current_level_idx + 1 < len(self.loaded_levels_from_files):
+            self._start_level(self.current_level_idx + 1)
+            print(f"Nivel {self.current_level_idx + 1} iniciado.")
+        else:
+            self.game_state = GAME_STATE_WIN
+
+    def _bullet_enemy_hits(self):
+        # {bullet: enemies it overlaps}; each bullet only looks at the enemy grid cells under it
+        hits = {}
+        for bullet in self.bullets:
+            enemies = self.enemy_index.query_rect(bullet.rect)
+            if enemies:
+                hits[bullet] = enemies
+        return hits
+
+    def update(self):
+        self.player.update(self.solid_index)
+        for enemy in self.enemies:
+            enemy.update(self.player.rect, self.platforms)
+            self.enemy_index.update(enemy)
+        for bullet in list(self.bullets):
+            action = bullet.update(self.solid_index)
+            door = bullet.hit_sprite
+            if isinstance(door, Door) and door.alive() and self._can_open_door(door, bullet.weapon_type):
+                self._open_door(door)
+            if action == "explode":
+                self._explode_projectile(bullet)
+
+        # Bullets against enemies
+        for bullet, enemies in self._bullet_enemy_hits().items():
+            if bullet.is_explosive:
+                self._explode_projectile(bullet)
+                continue
+            bullet.kill()
+            for enemy in enemies:
+                if enemy.alive() and enemy.take_damage(bullet.damage):
+                    self._remove_level_sprite(enemy)
+                    self.score += ENEMY_KILL_POINTS
+        # Touching an enemy hurts
+        if self.enemy_index.query_rect(self.player.rect):
+            if self.player.take_damage(ENEMY_CONTACT_DAMAGE, self.sound_manager):
+                return self._player_died()
+
+        self._check_triggers()
+
+    def _update_camera(self):
+        # Calculate camera offset to center player
+        self.camera_offset_x = self.player.rect.centerx - WIDTH // 2
+        self.camera_offset_y = self.player.rect.centery - HEIGHT // 2
+
+        # CORRECCIÓN: Eliminar el clamping de la cámara para que siga al jugador sin límites
+        # self.camera_offset_x = max(0, min(self.camera_offset_x, self.level_width - WIDTH))
+        # self.camera_offset_y = max(0, min(self.camera_offset_y, self.level_height - HEIGHT))
+
     def draw(self):
         self.screen.fill(self.BACKGROUND_COLOR)
 
         if self.game_state == GAME_STATE_PLAYING or self.game_state == GAME_STATE_PLAYING_FROM_EDITOR:
-            # Calculate camera offset to center player
-            self.camera_offset_x = self.player.rect.centerx - WIDTH // 2
-            self.camera_offset_y = self.player.rect.centery - HEIGHT // 2
-
-            # CORRECCIÓN: Eliminar el clamping de la cámara para que siga al jugador sin límites
-            # self.camera_offset_x = max(0, min(self.camera_offset_x, self.level_width - WIDTH))
-            # self.camera_offset_y = max(0, min(self.camera_offset_y, self.level_height - HEIGHT))
+            self._update_camera()
 
             # DO NOT draw grid in play mode
 
@@ -2835,7 +4701,7 @@ class Game:
 
             # Draw player aiming cone only when charging AND has powerup (right click)
             if self.player.is_charging_powerup_shot and self.player.has_charge_powerup:
-                mouse_x, mouse_y = pygame.mouse.get_pos()
+                mouse_x, mouse_y = self.input.get_mouse_pos()
                 player_screen_x = self.player.rect.centerx - self.camera_offset_x
                 player_screen_y = self.player.rect.centery - self.camera_offset_y
 
@@ -2860,11 +4726,11 @@ class Game:
 
                 cone_points = [p1, p2, p3]
 
-                cone_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+                cone_surface = new_surface((WIDTH, HEIGHT), pygame.SRCALPHA)
                 
                 current_cone_color = self.AIM_CONE_COLOR
                 if self.player.charge_powerup_level == 1.0:
-                    now = pygame.time.get_ticks()
+                    now = self.game_clock.get_ticks()
                     if (now // AIM_CONE_BLINK_INTERVAL) % 2 == 0:
                         current_cone_color = (255, 255, 0, 150)
                     else:
@@ -2875,7 +4741,7 @@ class Game:
             
             # Draw red weapon aiming cone only when charging (left click)
             if self.player.current_weapon == "red" and self.player.is_charging_red_weapon:
-                mouse_x, mouse_y = pygame.mouse.get_pos()
+                mouse_x, mouse_y = self.input.get_mouse_pos()
                 player_screen_x = self.player.rect.centerx - self.camera_offset_x
                 player_screen_y = self.player.rect.centery - self.camera_offset_y
 
@@ -2900,11 +4766,11 @@ class Game:
 
                 cone_points = [p1, p2, p3]
 
-                cone_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+                cone_surface = new_surface((WIDTH, HEIGHT), pygame.SRCALPHA)
                 
                 current_cone_color = (255, 50, 0, 100) # Red weapon cone color
                 if self.player.red_charge_level == 1.0:
-                    now = pygame.time.get_ticks()
+                    now = self.game_clock.get_ticks()
                     if (now // AIM_CONE_BLINK_INTERVAL) % 2 == 0:
                         current_cone_color = (255, 255, 0, 150) # Yellowish blink
                     else:
@@ -2915,7 +4781,7 @@ class Game:
 
             # Draw purple weapon arc trajectory when charging (left click)
             if self.player.current_weapon == "purple" and self.player.is_charging_purple_shot:
-                mouse_x, mouse_y = pygame.mouse.get_pos()
+                mouse_x, mouse_y = self.input.get_mouse_pos()
                 player_screen_x = self.player.rect.centerx - self.camera_offset_x
                 player_screen_y = self.player.rect.centery - self.camera_offset_y
 
@@ -2963,7 +4829,7 @@ class Game:
                     pygame.draw.line(self.screen, self.PURPLE_HOOK_COLOR, (player_screen_x, player_screen_y), (target_screen_x, target_screen_y), 3)
                 else:
                     # Draw line towards mouse, limited by hook range
-                    mouse_x, mouse_y = pygame.mouse.get_pos()
+                    mouse_x, mouse_y = self.input.get_mouse_pos()
                     player_center_screen = pygame.math.Vector2(player_screen_x, player_screen_y)
                     mouse_screen_vec = pygame.math.Vector2(mouse_x, mouse_y)
                     
@@ -2978,8 +4844,9 @@ class Game:
                     # Draw a small circle at the end of the hook line to indicate potential attachment point
                     pygame.draw.circle(self.screen, self.PURPLE_HOOK_COLOR, (int(hook_end_point_screen.x), int(hook_end_point_screen.y)), 5)
 
-
+            self.frame_phases.mark("draw")
             self.draw_hud()
+            self.frame_phases.mark("hud")
         
         elif self.game_state == GAME_STATE_GAME_OVER:
             self.draw_game_over_screen()
@@ -3003,8 +4870,12 @@ class Game:
             self.draw_editor_screen() # Draw editor as background
             self._draw_load_level_overlay() # Draw overlay on top
 
-
+        self.frame_phases.mark("draw")
+        if self.perf_overlay.visible:
+            self.perf_overlay.draw(self.screen)
+            self.frame_phases.mark("overlay")
         pygame.display.flip()
+        self.frame_phases.mark("flip")
 
     def reset_game(self):
         self.score = 0
@@ -3012,75 +4883,240 @@ class Game:
         self.game_state = GAME_STATE_PLAYING # Start playing the first level again
         # Reload the first level from the loaded files
         if self.loaded_levels_from_files:
-            self.load_level_from_dict(self.loaded_levels_from_files[0]["data"])
+            self._start_level(0)
         else:
             print("No hay niveles cargados para reiniciar. Volviendo al menú.")
             self.game_state = GAME_STATE_MENU # Fallback to menu if no levels
 
-    def run(self):
+    def step(self, events):
+        # One tick of input and simulation, no drawing; Game.run and play_replay both go through it. False once the game should quit
+        if not self.replaying: # Replays run on the levels they were recorded with, see play_replay_file
+            self._apply_level_file_changes()
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3: # Performance overlay, on every screen
+                self.perf_overlay.toggle()
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F4: # Profile the next frames, or stop early
+                self.toggle_profile()
+
+        if self.game_state == GAME_STATE_MENU:
+            for event in events:
+                if event.type == pygame.QUIT:
+                    return False
+                if event.type == pygame.VIDEORESIZE: # Handle resize in menu too
+                    global WIDTH, HEIGHT, SCREEN
+                    WIDTH, HEIGHT = event.w, event.h
+                    SCREEN = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE | pygame.SCALED)
+                    # Reajustar la posición del panel del editor y otros elementos de la interfaz si es necesario
+                    self.editor_panel.rect.height = HEIGHT - 20
+                    self.filename_input_box.rect.center = (WIDTH // 2, HEIGHT // 2 - 25)
+                    self.load_level_overlay_rect.center = (WIDTH // 2, HEIGHT // 2)
+                    print(f"Ventana redimensionada a: {WIDTH}x{HEIGHT}")
+                if event.type == pygame.KEYDOWN: 
+                    if event.key == pygame.K_p: # Press P to Play
+                        self.game_state = GAME_STATE_PLAYING
+                        # Start from the first level loaded from files
+                        if self.loaded_levels_from_files:
+                            self._start_level(0) # Reset level index for playing
+                        else:
+                            print("No hay niveles cargados. Volviendo al menú.")
+                            self.game_state = GAME_STATE_MENU # Go back to menu if no levels
+                    if event.key == pygame.K_e: # Press E for Editor
+                        self.game_state = GAME_STATE_EDITOR
+                        # When entering editor, clear existing sprites and load a blank canvas
+                        self._clear_all_sprites()
+                        self._clear_editor_history()
+                        self.editor_level_filename = None # New, unsaved canvas
+                        # Place player at a fixed world coordinate, not screen coordinate
+                        self.player.rect.center = (250, 250) # Example fixed world coordinate
+                        self.editor_selected_sprite = None # Clear selected sprite
+                        self.resizing_platform = False # Stop resizing
+                        self._reset_editor_camera()
+                        # Set default level dimensions for a new editor level
+                        self.level_width = WIDTH * 2
+                        self.level_height = HEIGHT * 2
+                        print("Modo editor iniciado. Canvas limpio.")
+            self.frame_phases.mark("handle_events")
+        else: # All other game states
+            if not self.handle_events(events):
+                return False
+            self.frame_phases.mark("handle_events")
+
+            if self.game_state == GAME_STATE_PLAYING or self.game_state == GAME_STATE_PLAYING_FROM_EDITOR:
+                self.update()
+                self.frame_phases.mark("update")
+            # Editor, save-name, property and load screens have no update logic: they only change on input
+
+        if self.game_state == GAME_STATE_PLAYING or self.game_state == GAME_STATE_PLAYING_FROM_EDITOR:
+            # Mouse aiming in the next tick converts screen to world with this, drawn or not
+            self._update_camera()
+        if self.memory_diagnostics:
+            self.memory_diagnostics.check_session(self)
+        return True
+
+    def start_recording(self, path, seed):
+        # seed is what random was seeded with before this Game was built; play_replay_file seeds at the same point
+        if not self.loaded_levels_from_files: # Fast start loads them after the first frame; the header needs them now
+            self._load_levels_from_files()
+        self.replay_recorder = ReplayRecorder(path, seed, (WIDTH, HEIGHT), levels_digest(self.loaded_levels_from_files))
+        print(f"Grabando la entrada en '{path}'.")
+
+    def start_metrics(self, path, every=1):
+        self.metrics_sink = MetricsSink(self, path, every)
+        print(f"Guardando métricas cada {self.metrics_sink.every} ticks en '{path}'.")
+
+    def toggle_profile(self, frames=PROFILE_FRAMES):
+        if self.profile_capture:
+            self._finish_profile()
+        else:
+            self.profile_capture = ProfileCapture(frames)
+            print(f"Perfilando los próximos {frames} fotogramas (F4 para parar antes).")
+
+    def _finish_profile(self):
+        path = self.profile_capture.finish()
+        print(f"Perfil de {self.profile_capture.frames} fotogramas guardado en '{path}' (resumen en '{path[:-5]}.txt').")
+        self.profile_capture = None
+
+    def _end_frame(self):
+        frame = self.frame_phases.end()
+        if self.metrics_sink:
+            self.metrics_sink.record(frame)
+        if self.profile_capture and self.profile_capture.frame_done():
+            self._finish_profile()
+
+    def play_replay(self, replay_input, draw=False):
+        # Feeds a recorded input stream through step() as fast as possible; returns the ticks played
+        self.input = replay_input
+        self.replaying = True
+        ticks = 0
+        while True:
+            tick = replay_input.next_tick()
+            if tick is None:
+                break
+            ms, events = tick
+            self.game_clock.advance(ms - self.game_clock.get_ticks())
+            ticks += 1
+            self.frame_phases.begin()
+            if not self.step(events):
+                break
+            if draw:
+                self.draw()
+            self._end_frame()
+        self.input = LiveInput()
+        self.replaying = False
+        return ticks
+
+    def run(self, show_startup_times=False):
+        self.draw() # First menu frame
+        self.startup.mark("primer fotograma del menú")
+        if self.startup_deferred:
+            self._finish_startup()
+        if show_startup_times:
+            self.startup.report()
+
         running = True
+        frame_start = pygame.time.get_ticks()
         while running:
-            if self.game_state == GAME_STATE_MENU:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        running = False
-                    if event.type == pygame.VIDEORESIZE: # Handle resize in menu too
-                        global WIDTH, HEIGHT, SCREEN
-                        WIDTH, HEIGHT = event.w, event.h
-                        SCREEN = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE | pygame.SCALED)
-                        # Reajustar la posición del panel del editor y otros elementos de la interfaz si es necesario
-                        self.editor_panel.rect.height = HEIGHT - 20
-                        self.filename_input_box.rect.center = (WIDTH // 2, HEIGHT // 2 - 25)
-                        self.load_level_overlay_rect.center = (WIDTH // 2, HEIGHT // 2)
-                        print(f"Ventana redimensionada a: {WIDTH}x{HEIGHT}")
-                    if event.type == pygame.KEYDOWN: 
-                        if event.key == pygame.K_p: # Press P to Play
-                            self.game_state = GAME_STATE_PLAYING
-                            # Start from the first level loaded from files
-                            if self.loaded_levels_from_files:
-                                self.load_level_from_dict(self.loaded_levels_from_files[0]["data"])
-                                self.current_level_idx = 0 # Reset level index for playing
-                            else:
-                                print("No hay niveles cargados. Volviendo al menú.")
-                                self.game_state = GAME_STATE_MENU # Go back to menu if no levels
-                        if event.key == pygame.K_e: # Press E for Editor
-                            self.game_state = GAME_STATE_EDITOR
-                            # When entering editor, clear existing sprites and load a blank canvas
-                            self._clear_all_sprites()
-                            # Place player at a fixed world coordinate, not screen coordinate
-                            self.player.rect.center = (250, 250) # Example fixed world coordinate
-                            self.editor_selected_sprite = None # Clear selected sprite
-                            self.resizing_platform = False # Stop resizing
-                            self.editor_camera_offset_x = 0
-                            self.editor_camera_offset_y = 0
-                            # Set default level dimensions for a new editor level
-                            self.level_width = WIDTH * 2
-                            self.level_height = HEIGHT * 2
-                            print("Modo editor iniciado. Canvas limpio.")
-            
-            else: # All other game states
-                running = self.handle_events()
-                if not running: break
-
-                if self.game_state == GAME_STATE_PLAYING or self.game_state == GAME_STATE_PLAYING_FROM_EDITOR:
-                    self.update()
-                elif self.game_state == GAME_STATE_EDITOR:
-                    self.update() # Llama a la lógica de actualización del editor (actualmente vacía)
-                elif self.game_state == GAME_STATE_SAVING_LEVEL_INPUT:
-                    self.update() # No update logic, just waiting for input
-                elif self.game_state == GAME_STATE_EDITING_PROPERTIES:
-                    self.update() # No update logic, just waiting for input
-                elif self.game_state == GAME_STATE_LOAD_LEVEL_MENU:
-                    self.update() # No update logic, just waiting for input
-
-            self.draw()
-            self.clock.tick(self.FPS)
+            # Game time only moves here, by the wall time the last frame took
+            now = pygame.time.get_ticks()
+            self.game_clock.advance(now - frame_start)
+            frame_start = now
+            idle = self.game_state in IDLE_GAME_STATES
+            events = self._wait_for_events() if idle else pygame.event.get()
+            self.frame_phases.begin() # Waiting for events above is idle time, not frame time
+            if self.replay_recorder:
+                self.replay_recorder.record_tick(self.game_clock.get_ticks(), self.input.get_pressed(), self.input.get_mouse_pos(), events)
+
+            running = self.step(events)
+            if not running: break
+
+            if events or self.needs_redraw or self.game_state not in IDLE_GAME_STATES:
+                self.draw()
+                self.needs_redraw = False
+                self.drawn_caret_phase = tuple(box.caret_visible() for box in self._visible_input_boxes())
+                self._end_frame()
+                self.clock.tick(self.FPS) # Caps redraws at FPS, also while input floods in
+            else:
+                self._update_input_carets()
+                self._end_frame()
         
+        if self.replay_recorder:
+            self.replay_recorder.close()
+            print(f"Repetición guardada: {self.replay_recorder.ticks} ticks en '{self.replay_recorder.path}'.")
+        if self.metrics_sink:
+            self.metrics_sink.close()
+            print(f"Métricas guardadas: {self.metrics_sink.records} registros en '{self.metrics_sink.path}'.")
+        if self.profile_capture:
+            self._finish_profile()
+        if self.memory_diagnostics:
+            self.memory_diagnostics.stop()
+        self.level_watcher.stop()
         pygame.quit()
         sys.exit()
 
+def play_replay_file(path, draw=False, metrics_path=None, metrics_every=1, profile_frames=None, memory=False):
+    # Plays a --grabar replay headless and at full speed; returns (game, ticks played)
+    global WIDTH, HEIGHT
+    replay_input = ReplayInput(path)
+    WIDTH, HEIGHT = replay_input.size # Camera and UI layout depend on the window size
+    random.seed(replay_input.seed)
+    game = Game(headless=True, game_clock=VirtualClock())
+    if levels_digest(game.loaded_levels_from_files) != replay_input.levels_hash:
+        raise ValueError(f"'{path}' se grabó con otros niveles; la repetición no sería la misma.")
+    if memory:
+        game.memory_diagnostics = MemoryDiagnostics()
+    if metrics_path:
+        game.start_metrics(metrics_path, metrics_every)
+    if profile_frames:
+        game.toggle_profile(profile_frames)
+    ticks = game.play_replay(replay_input, draw)
+    if game.metrics_sink:
+        game.metrics_sink.close()
+    if game.profile_capture: # The replay ended first
+        game._finish_profile()
+    if game.memory_diagnostics:
+        game.memory_diagnostics.stop()
+    return game, ticks
+
 # --- Main Game Loop Execution ---
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    import argparse
+    parser = argparse.ArgumentParser(description=WINDOW_TITLE)
+    parser.add_argument("--grabar", metavar="ARCHIVO", help="Graba la entrada de cada tick en un archivo de repetición")
+    parser.add_argument("--reproducir", metavar="ARCHIVO", help="Reproduce una repetición sin ventana y a máxima velocidad")
+    parser.add_argument("--metricas", metavar="ARCHIVO", help="Añade a este archivo JSON Lines las métricas de cada tick")
+    parser.add_argument("--metricas-cada", type=int, default=1, metavar="N", help="Un registro de métricas cada N ticks")
+    parser.add_argument("--memoria", action="store_true", help="Informes de memoria (tracemalloc) en cargas de nivel, partidas y limpiezas de sprites")
+    parser.add_argument("--arranque-completo", action="store_true", help="Prepara todo (sonidos, niveles, editor) antes de mostrar el menú")
+    parser.add_argument("--tiempos-arranque", action="store_true", help="Muestra cuánto tarda cada etapa del arranque")
+    parser.add_argument("--perfilar", type=int, metavar="N", help=f"Perfila con cProfile los primeros N fotogramas (en partida, F4 perfila {PROFILE_FRAMES})")
+    args = parser.parse_args()
+
+    if args.reproducir:
+        start = time.perf_counter()
+        try:
+            game, ticks = play_replay_file(args.reproducir, metrics_path=args.metricas, metrics_every=args.metricas_cada, profile_frames=args.perfilar, memory=args.memoria)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo reproducir: {e}")
+            sys.exit(1)
+        elapsed = time.perf_counter() - start
+        print(f"{ticks} ticks ({game.game_clock.get_ticks() / 1000:.1f} s de juego) en {elapsed:.2f} s, {ticks / elapsed:.0f} ticks/s")
+        print(f"Estado {game.game_state}, nivel {game.current_level_idx}, puntuación {game.score}, "
+              f"vida {game.player.health}, posición {game.player.rect.topleft}")
+        pygame.quit()
+        sys.exit(0)
+
+    if args.grabar:
+        # Seeded before the Game is built, as play_replay_file does, so the same random calls follow on replay
+        seed = random.randrange(2 ** 32)
+        random.seed(seed)
+    game = Game(fast_start=not args.arranque_completo)
+    if args.memoria:
+        game.memory_diagnostics = MemoryDiagnostics()
+    if args.grabar:
+        game.start_recording(args.grabar, seed)
+    if args.metricas:
+        game.start_metrics(args.metricas, args.metricas_cada)
+    if args.perfilar:
+        game.toggle_profile(args.perfilar)
+    game.run(show_startup_times=args.tiempos_arranque)
 
@@ -0,0 +1,100 @@
+"""Prueba de humo de SpatialHash: sus consultas contra una búsqueda por fuerza bruta.
+
+Rectángulos, consultas, rayos y barridos aleatorios (con semilla fija), en rejillas de varios
+tamaños de celda. Cada resultado tiene que coincidir con el de recorrer todos los sprites, y en
+el mismo orden: el de inserción.
+
+Uso:
+    python -m pytest -q test_indice_espacial.py
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # No window and no sound device needed
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import math
+import random
+
+import pygame
+import pytest
+
+import juego_simple as juego
+
+TRIALS = 200
+CELL_SIZES = [16, 50, 64, 200]
+
+
+class Box(pygame.sprite.Sprite):
+    def __init__(self, rect):
+        super().__init__()
+        self.rect = rect
+
+
+def random_rect(rng, spread=400, max_size=120):
+    return pygame.Rect(rng.randint(-spread, spread), rng.randint(-spread, spread), rng.randint(1, max_size), rng.randint(1, max_size))
+
+
+def random_index(rng, cell_size):
+    """An index over a few dozen random boxes, and the boxes in insertion order."""
+    index = juego.SpatialHash(cell_size)
+    boxes = [Box(random_rect(rng)) for _ in range(rng.randint(0, 60))]
+    for box in boxes:
+        index.insert(box)
+    # Move and remove some of them, as the game does every tick
+    for box in rng.sample(boxes, len(boxes) // 4):
+        box.rect.move_ip(rng.randint(-150, 150), rng.randint(-150, 150))
+        index.update(box)
+    for box in rng.sample(boxes, len(boxes) // 5):
+        index.remove(box)
+        boxes.remove(box)
+    return index, boxes
+
+
+@pytest.mark.parametrize("cell_size", CELL_SIZES)
+def test_query_rect_and_point_match_brute_force(cell_size):
+    rng = random.Random(cell_size)
+    for _ in range(TRIALS):
+        index, boxes = random_index(rng, cell_size)
+        rect = random_rect(rng, max_size=rng.choice([10, 300, 1500]))
+        assert index.query_rect(rect) == [box for box in boxes if box.rect.colliderect(rect)]
+        x, y = rng.randint(-450, 450), rng.randint(-450, 450)
+        assert index.query_point(x, y) == [box for box in boxes if box.rect.collidepoint(x, y)]
+
+
+@pytest.mark.parametrize("cell_size", CELL_SIZES)
+def test_sweep_matches_single_bucket_index(cell_size):
+    # With one huge cell every candidate comes from the same bucket, so the broad phase cannot miss anything
+    rng = random.Random(cell_size)
+    for _ in range(TRIALS):
+        index, boxes = random_index(rng, cell_size)
+        everything = juego.SpatialHash(10 ** 6)
+        for box in boxes:
+            everything.insert(box)
+        rect = random_rect(rng, max_size=40)
+        dx, dy = rng.choice([0, rng.uniform(-500, 500)]), rng.choice([0, rng.uniform(-500, 500)])
+        assert index.sweep(rect, dx, dy) == everything.sweep(rect, dx, dy)
+
+
+@pytest.mark.parametrize("cell_size", CELL_SIZES)
+@pytest.mark.parametrize("radius", [0, 15, 70])
+def test_raycast_matches_brute_force(cell_size, radius):
+    rng = random.Random(cell_size + radius)
+    for _ in range(TRIALS):
+        index, boxes = random_index(rng, cell_size)
+        origin = (rng.uniform(-400, 400), rng.uniform(-400, 400))
+        direction = rng.choice([(rng.uniform(-1, 1), rng.uniform(-1, 1)), (rng.choice([-1, 1]), 0), (0, rng.choice([-1, 1]))])
+        max_distance = rng.uniform(0, 700)
+        accept = rng.choice([None, lambda box: box.rect.width > 30])
+
+        length = math.hypot(*direction)
+        dir_x, dir_y = direction[0] / length, direction[1] / length
+        expected = None
+        for box in boxes: # Already in insertion order, so the first of equal distances is kept
+            if accept is not None and not accept(box):
+                continue
+            distance = juego.SpatialHash._ray_entry(origin[0], origin[1], dir_x, dir_y, box.rect.inflate(2 * radius, 2 * radius))
+            if distance is not None and distance <= max_distance and (expected is None or distance < expected[0]):
+                expected = (distance, box)
+
+        hit = index.raycast(origin, direction, max_distance, accept=accept, radius=radius)
+        assert (hit and hit[:2]) == expected
@@ -0,0 +1,417 @@
+"""Validador de niveles por línea de comandos (sin ventana).
+
+Carga cada nivel de la carpeta 'levels' con el mismo esquema que Game.load_level_from_dict
+(normalize_level_data) y comprueba:
+  - enlaces llave/puerta (required_key_id sin Key, armas desconocidas, IDs repetidos),
+  - alcanzabilidad de la salida, llaves y coleccionables desde player_start sobre una
+    cuadrícula con saltos (JUMP_FORCE, GRAVITY, MAX_JUMPS) y, en cuanto el arma violeta es
+    alcanzable, con el gancho hasta las superficies enganchables a PURPLE_HOOK_RANGE_CELLS;
+    una salida o una llave necesaria inalcanzable es un error; coleccionables y llaves que no
+    abren nada, sólo advertencias (el dash no se modela),
+  - plataformas mortales solapadas con otra geometría.
+Cada nivel se analiza en un proceso del pool y el resultado es un informe JSON.
+
+Uso:
+    python validar_niveles.py [--carpeta levels] [--salida informe.json] [--procesos N] [--celda 50]
+"""
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1") # Keep stdout clean for the JSON report
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pygame
+
+import juego_simple as juego
+
+PLAYER_WIDTH = juego.Player.WIDTH
+PLAYER_HEIGHT = juego.Player.HEIGHT
+PLAYER_SPEED = juego.Player.SPEED
+SUPPORT_PROBE = 10 # Pixels below the feet that count as "standing on" a surface
+DEFAULT_CELL_SIZE = 50 # Same as Game.GRID_SIZE
+# The hook range is in game grid cells, whatever --celda is, and its detection box reaches half its size further
+HOOK_RANGE = juego.PURPLE_HOOK_RANGE_CELLS * DEFAULT_CELL_SIZE + juego.PURPLE_HOOK_DETECTION_SIZE // 2
+
+
+def jump_envelope(cell_size, max_fall):
+    """Horizontal reach of a full jump chain, as {row offset of the feet: max column offset}.
+
+    Simulates Player.update physics with every extra jump triggered at the apex. Negative row
+    offsets are above the take-off row. A landing row is reachable only while falling through it.
+    """
+    x, y, velocity_y, jumps = 0.0, 0.0, float(juego.JUMP_FORCE), 1
+    reach = {}
+    while y < max_fall:
+        previous_y = y
+        velocity_y += juego.GRAVITY
+        y += velocity_y
+        x += PLAYER_SPEED
+        if velocity_y >= 0 and jumps < juego.MAX_JUMPS:
+            velocity_y = float(juego.JUMP_FORCE)
+            jumps += 1
+            continue
+        if velocity_y > 0:
+            # Every row boundary crossed while falling this frame is a possible landing row
+            row = int(previous_y // cell_size) + 1
+            while row * cell_size <= y:
+                reach[row] = max(reach.get(row, 0), int(x // cell_size))
+                row += 1
+    return reach
+
+
+class ReachabilityGrid:
+    """Grid of player-sized cells over one level, with doors treated as open or closed."""
+    def __init__(self, level, cell_size, open_doors):
+        self.cell_size = cell_size
+        self.solids = []
+        self.hazards = []
+        self.hookables = []
+        for p in level["platforms"]:
+            rect = pygame.Rect(p[0], p[1], p[2], p[3])
+            self.solids.append(rect)
+            if p[5]:
+                self.hazards.append(rect)
+            if p[6]:
+                self.hookables.append(rect)
+        for i, d in enumerate(level["doors"]):
+            if i in open_doors:
+                continue
+            rect = pygame.Rect(d["pos"])
+            self.solids.append(rect)
+            if d["dies_on_touch"]:
+                self.hazards.append(rect)
+            if d["is_hookable"]:
+                self.hookables.append(rect)
+
+        # Bounds: everything in the level plus a margin so the player can walk around the edges
+        extents = [pygame.Rect(level["player_start"], (1, 1))] + self.solids
+        if level["exit"]:
+            extents.append(pygame.Rect(level["exit"]))
+        bounds = extents[0].unionall(extents[1:])
+        self.col_min = bounds.left // cell_size - 2
+        self.col_max = bounds.right // cell_size + 2
+        self.row_min = bounds.top // cell_size - 2
+        self.row_max = bounds.bottom // cell_size + 2
+
+        self._buckets = {}
+        for i, rect in enumerate(self.solids):
+            for cell in self.cells_for_rect(rect):
+                self._buckets.setdefault(cell, []).append(i)
+        self._free = {}
+        self._standable = {}
+
+    def cells_for_rect(self, rect):
+        size = self.cell_size
+        for col in range(rect.left // size, (rect.right - 1) // size + 1):
+            for row in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield (col, row)
+
+    def in_bounds(self, col, row):
+        return self.col_min <= col <= self.col_max and self.row_min <= row <= self.row_max
+
+    def player_box(self, col, row):
+        # Player centered horizontally in the cell, feet on the bottom edge of the cell
+        size = self.cell_size
+        return pygame.Rect(col * size + (size - PLAYER_WIDTH) // 2, (row + 1) * size - PLAYER_HEIGHT, PLAYER_WIDTH, PLAYER_HEIGHT)
+
+    def _colliding(self, rect):
+        seen = set()
+        for cell in self.cells_for_rect(rect):
+            for i in self._buckets.get(cell, ()):
+                if i not in seen:
+                    seen.add(i)
+                    if rect.colliderect(self.solids[i]):
+                        yield self.solids[i]
+
+    def is_free(self, col, row):
+        cell = (col, row)
+        if cell not in self._free:
+            self._free[cell] = self.in_bounds(col, row) and next(self._colliding(self.player_box(col, row)), None) is None
+        return self._free[cell]
+
+    def is_standable(self, col, row):
+        cell = (col, row)
+        if cell not in self._standable:
+            standable = False
+            if self.is_free(col, row):
+                box = self.player_box(col, row)
+                probe = pygame.Rect(box.left, box.bottom, box.width, SUPPORT_PROBE)
+                supports = list(self._colliding(probe))
+                # Standing on a death surface is not a place the player can use
+                standable = bool(supports) and not any(s in self.hazards for s in supports)
+            self._standable[cell] = standable
+        return self._standable[cell]
+
+    def fall_from(self, col, row, touched):
+        """Drops straight down from a free cell; returns the landing cell or None if it falls out."""
+        while self.in_bounds(col, row) and self.is_free(col, row):
+            touched.add((col, row))
+            if self.is_standable(col, row):
+                return (col, row)
+            row += 1
+        return None
+
+    def _clear_path(self, cells):
+        return all(self.is_free(col, row) for col, row in cells)
+
+    def jump_path(self, start, target, max_rise):
+        """Cells of an up-across-down path from start to target, or None if every apex is blocked."""
+        (c0, r0), (c1, r1) = start, target
+        step = 1 if c1 >= c0 else -1
+        for apex in range(min(r0, r1), r0 - max_rise - 1, -1):
+            path = [(c0, r) for r in range(r0, apex - 1, -1)]
+            path += [(c, apex) for c in range(c0 + step, c1 + step, step)]
+            path += [(c1, r) for r in range(apex + 1, r1 + 1)]
+            if self._clear_path(path):
+                return path
+        return None
+
+    def hook_targets(self, cell, hook_range, touched):
+        """Standable cells the grappling hook gets the player to from `cell`.
+
+        The hook pulls the player to any hookable surface whose nearest point is within range.
+        From there the player either lets go and falls, or, still holding the jumps it had on the
+        ground, climbs onto the top of that surface.
+        """
+        size = self.cell_size
+        center_x, center_y = self.player_box(*cell).center
+        targets = []
+        for rect in self.hookables:
+            attach_x = min(max(center_x, rect.left), rect.right - 1)
+            attach_y = min(max(center_y, rect.top), rect.bottom - 1)
+            if (attach_x - center_x) ** 2 + (attach_y - center_y) ** 2 > hook_range ** 2:
+                continue
+            col, row = attach_x // size, attach_y // size
+            for dc, dr in ((0, 1), (0, -1), (-1, 0), (1, 0)): # Next to the surface, on whichever side is free
+                if self.is_free(col + dc, row + dr):
+                    landing = self.fall_from(col + dc, row + dr, touched)
+                    if landing:
+                        targets.append(landing)
+            top_row = rect.top // size - 1
+            for col in range(rect.left // size, (rect.right - 1) // size + 1):
+                for row in (top_row, top_row + 1):
+                    if self.is_standable(col, row):
+                        targets.append((col, row))
+        return targets
+
+    def explore(self, start_pos, envelope, hook_range=0):
+        """BFS over standable cells, with the grappling hook if `hook_range`. Returns every cell the player can pass through."""
+        touched = set()
+        col = start_pos[0] // self.cell_size
+        row = start_pos[1] // self.cell_size # Cell holding the player's center; collisions push the feet onto its floor
+        start = self.fall_from(col, row, touched) if self.is_free(col, row) else None
+        if start is None:
+            return touched
+
+        max_rise = max(0, -min(envelope)) if envelope else 0
+        visited = {start}
+        pending = deque([start])
+        while pending:
+            c0, r0 = pending.popleft()
+            touched.add((c0, r0))
+            targets = []
+            # Jumping in place reaches everything straight above, up to the jump height
+            apex = r0
+            for r in range(r0 - 1, r0 - max_rise - 1, -1):
+                if not self.is_free(c0, r):
+                    break
+                touched.add((c0, r))
+                apex = r
+            # Walking, and walking off ledges
+            for dc in (-1, 1):
+                if self.is_free(c0 + dc, r0):
+                    landing = self.fall_from(c0 + dc, r0, touched)
+                    if landing:
+                        targets.append((landing, None))
+            # Jumps within the envelope
+            for dr, max_dc in envelope.items():
+                r1 = r0 + dr
+                if r1 < self.row_min or r1 > self.row_max:
+                    continue
+                for dc in range(-max_dc, max_dc + 1):
+                    target = (c0 + dc, r1)
+                    if target in visited or not self.is_free(*target):
+                        continue
+                    standable = self.is_standable(*target)
+                    if not standable and target in touched:
+                        continue
+                    path = self.jump_path((c0, r0), target, max_rise)
+                    if not path:
+                        continue
+                    if standable:
+                        targets.append((target, path))
+                    else:
+                        touched.update(path) # Passing through in mid-air still touches what is there
+            if hook_range: # From the ground, or at the top of a jump
+                for cell in {(c0, r0), (c0, apex)}:
+                    targets += [(target, None) for target in self.hook_targets(cell, hook_range, touched)]
+            for target, path in targets:
+                if path:
+                    touched.update(path)
+                if target not in visited:
+                    visited.add(target)
+                    pending.append(target)
+        return touched
+
+    def touches(self, rect, touched):
+        return any(cell in touched for cell in self.cells_for_rect(rect))
+
+
+def _overlapping_death_geometry(level):
+    """Sort-and-sweep over x: pairs where a death platform/door overlaps other geometry."""
+    shapes = []
+    for p in level["platforms"]:
+        shapes.append((pygame.Rect(p[0], p[1], p[2], p[3]), bool(p[5]), f"plataforma en ({p[0]}, {p[1]})"))
+    for d in level["doors"]:
+        shapes.append((pygame.Rect(d["pos"]), bool(d["dies_on_touch"]), f"puerta '{d['id']}'"))
+    shapes.sort(key=lambda shape: shape[0].left)
+
+    overlaps = []
+    active = []
+    for rect, deadly, label in shapes:
+        active = [shape for shape in active if shape[0].right > rect.left]
+        for other_rect, other_deadly, other_label in active:
+            if (deadly or other_deadly) and rect.colliderect(other_rect):
+                overlaps.append((other_label, label))
+        active.append((rect, deadly, label))
+    return overlaps
+
+
+def validate_level(name, raw_level, cell_size=DEFAULT_CELL_SIZE):
+    started = time.perf_counter()
+    report = {"file": name, "ok": True, "errors": [], "warnings": [], "stats": {}}
+
+    def error(code, message):
+        report["errors"].append({"code": code, "message": message})
+        report["ok"] = False
+
+    def warning(code, message):
+        report["warnings"].append({"code": code, "message": message})
+
+    try:
+        level = juego.normalize_level_data(raw_level)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        error("schema", f"El nivel no sigue el formato de LEVEL_DATA: {e!r}")
+        return report
+
+    # --- Key/door linkage ---
+    key_ids = [k["id"] for k in level["keys"]]
+    door_ids = [d["id"] for d in level["doors"]]
+    for key_id in sorted({k for k in key_ids if key_ids.count(k) > 1}):
+        warning("duplicate_key_id", f"ID de llave repetido: '{key_id}'")
+    for door_id in sorted({d for d in door_ids if door_ids.count(d) > 1}, key=str):
+        warning("duplicate_door_id", f"ID de puerta repetido: '{door_id}'")
+    required_keys = set()
+    for d in level["doors"]:
+        if d["required_key_id"]:
+            required_keys.add(d["required_key_id"])
+            if d["required_key_id"] not in key_ids:
+                error("door_missing_key", f"La puerta '{d['id']}' requiere la llave '{d['required_key_id']}', que no existe")
+        if d["required_weapon_type"] and d["required_weapon_type"] not in juego.WEAPON_TYPES:
+            error("door_unknown_weapon", f"La puerta '{d['id']}' requiere el arma desconocida '{d['required_weapon_type']}'")
+    for key_id in sorted(set(key_ids) - required_keys):
+        warning("unused_key", f"La llave '{key_id}' no abre ninguna puerta")
+
+    if level["exit"] is None:
+        error("missing_exit", "El nivel no tiene salida")
+
+    for first, second in _overlapping_death_geometry(level):
+        error("overlapping_death_platform", f"Geometría mortal solapada: {first} y {second}")
+
+    # --- Reachability, opening doors and using the hook as their key/weapon becomes reachable ---
+    # An exit or a needed key out of reach is a shipped defect; dash is not modelled, so the rest only warns
+    max_fall = (level["level_height"] + 4 * cell_size) * 2
+    envelope = jump_envelope(cell_size, max_fall)
+    open_doors = set()
+    hook = False
+    while True:
+        grid = ReachabilityGrid(level, cell_size, open_doors)
+        touched = grid.explore(level["player_start"], envelope, HOOK_RANGE if hook else 0)
+        reached_keys = {k["id"] for k in level["keys"] if grid.touches(pygame.Rect(0, 0, 20, 20).move(k["pos"][0] - 10, k["pos"][1] - 10), touched)}
+        weapons = {"normal"} | {c["type"][:-len("_weapon_powerup")] for c in level["collectibles"]
+                                if c["type"].endswith("_weapon_powerup") and grid.touches(pygame.Rect(c["pos"][0] - 12, c["pos"][1] - 12, 25, 25), touched)}
+        openable = {i for i, d in enumerate(level["doors"])
+                    if (not d["required_key_id"] or d["required_key_id"] in reached_keys)
+                    and (not d["required_weapon_type"] or d["required_weapon_type"] in weapons)}
+        if openable <= open_doors and hook == ("purple" in weapons):
+            break
+        open_doors |= openable
+        hook = "purple" in weapons
+
+    if not touched:
+        error("bad_player_start", f"player_start {level['player_start']} está dentro de geometría sólida o fuera del nivel")
+    if level["exit"] is not None and not grid.touches(pygame.Rect(level["exit"]), touched):
+        error("unreachable_exit", f"La salida en {level['exit'][:2]} no es alcanzable desde player_start")
+    for k in level["keys"]:
+        if k["id"] not in reached_keys:
+            if k["id"] in required_keys:
+                error("unreachable_key", f"La llave '{k['id']}' en {k['pos']} no es alcanzable")
+            else:
+                warning("unreachable_unused_key", f"La llave '{k['id']}' en {k['pos']} no es alcanzable")
+    for c in level["collectibles"]:
+        if not grid.touches(pygame.Rect(c["pos"][0] - 12, c["pos"][1] - 12, 25, 25), touched):
+            warning("unreachable_collectible", f"Coleccionable '{c['type']}' en {c['pos']} no es alcanzable")
+
+    report["stats"] = {
+        "platforms": len(level["platforms"]),
+        "doors": len(level["doors"]),
+        "keys": len(level["keys"]),
+        "reachable_cells": len(touched),
+        "doors_openable": len(open_doors),
+        "hook": hook,
+        "seconds": round(time.perf_counter() - started, 4)
+    }
+    return report
+
+
+def validate_level_file(path, cell_size=DEFAULT_CELL_SIZE):
+    name = os.path.basename(path)
+    try:
+        with open(path, 'r') as f:
+            raw_level = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        return {"file": name, "ok": False, "errors": [{"code": "unreadable", "message": str(e)}], "warnings": [], "stats": {}}
+    return validate_level(name, raw_level, cell_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valida los niveles de la carpeta 'levels' sin abrir el juego.")
+    parser.add_argument("--carpeta", default="levels", help="Carpeta con los niveles .json")
+    parser.add_argument("--salida", help="Archivo donde escribir el informe JSON (por defecto, salida estándar)")
+    parser.add_argument("--procesos", type=int, default=None, help="Número de procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument("--celda", type=int, default=DEFAULT_CELL_SIZE, help="Tamaño de celda de la cuadrícula de alcanzabilidad")
+    args = parser.parse_args(argv)
+
+    filenames = sorted(f for f in os.listdir(args.carpeta) if f.endswith('.json')) if os.path.isdir(args.carpeta) else []
+    with ProcessPoolExecutor(max_workers=args.procesos) as pool:
+        if filenames:
+            futures = [pool.submit(validate_level_file, os.path.join(args.carpeta, f), args.celda) for f in filenames]
+        else:
+            # Same fallback as the game: validate the built-in levels
+            futures = [pool.submit(validate_level, f"default_level_{i+1}.json", data, args.celda) for i, data in enumerate(juego.LEVEL_DATA)]
+        levels = [future.result() for future in futures]
+
+    report = {
+        "levels": levels,
+        "summary": {
+            "total": len(levels),
+            "ok": sum(1 for level in levels if level["ok"]),
+            "errors": sum(len(level["errors"]) for level in levels),
+            "warnings": sum(len(level["warnings"]) for level in levels)
+        }
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0 if report["summary"]["ok"] == report["summary"]["total"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())